@@ -0,0 +1,49 @@
+"""
+HTTP Range header parsing (RFC 9110, section 14) for responses served from memory.
+
+Only a single byte range is served. A Range header that cannot be honoured that way (another
+unit, invalid syntax, or several ranges, which would need a multipart response) is ignored,
+and the whole representation is sent with 200. Only a valid single range that selects no byte
+of the representation is answered with 416.
+"""
+import re
+from typing import Optional, Tuple
+
+_RANGE_SPEC = re.compile(r"(\d*)-(\d*)")
+
+
+class RangeNotSatisfiable(ValueError):
+    """
+    A valid byte range that lies outside the representation; answered with 416.
+    """
+
+
+def parse_byte_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a Range header into inclusive (start, end) offsets of a representation of `size` bytes.
+    Returns None if the header should be ignored. Raises RangeNotSatisfiable for a valid range
+    that does not overlap the representation.
+    """
+    unit, separator, range_set = range_header.partition("=")
+    if not separator or unit.strip().lower() != "bytes":
+        return None
+    specs = [spec.strip() for spec in range_set.split(",") if spec.strip()]
+    if len(specs) != 1:
+        return None
+    match = _RANGE_SPEC.fullmatch(specs[0])
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    start_str, end_str = match.groups()
+    if start_str == "":
+        # Suffix range: the last N bytes
+        length = int(end_str)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable(f"bytes=-{length} of a {size} byte representation")
+        return max(0, size - length), size - 1
+    start = int(start_str)
+    if end_str and int(end_str) < start:
+        return None # last-pos before first-pos makes the range invalid, not unsatisfiable
+    if start >= size:
+        raise RangeNotSatisfiable(f"bytes={start}- of a {size} byte representation")
+    end = min(int(end_str), size - 1) if end_str else size - 1
+    return start, end
@@ -0,0 +1,56 @@
+"""
+Retrieval helpers for trimming chat prompts.
+
+Long context (resume text, scraped portfolio) is split into overlapping word chunks. For each
+question only the chunks most similar to it are kept, up to a token budget, and put back in
+their original order so the prompt still reads naturally. Token counts are estimated (about
+4 characters per token), which is close enough for budgeting without a tokenizer.
+"""
+from typing import List, Sequence
+
+import numpy as np
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def chunk_text(text: str, chunk_tokens: int = 200, overlap_tokens: int = 40) -> List[str]:
+    """
+    Splits text into chunks of roughly chunk_tokens tokens that overlap by overlap_tokens.
+    """
+    words = text.split()
+    if not words:
+        return []
+    # ~0.75 words per token for English text
+    chunk_words = max(1, int(chunk_tokens * 0.75))
+    step = max(1, chunk_words - int(overlap_tokens * 0.75))
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+def select_chunks(chunk_vectors: np.ndarray, query_vector: Sequence[float], chunk_token_counts: Sequence[int], token_budget: int) -> List[int]:
+    """
+    Indices of the chunks to keep: most similar to the query first, skipping chunks that no
+    longer fit the budget, returned in original order. The best chunk is always kept.
+    """
+    if len(chunk_token_counts) == 0:
+        return []
+    query = np.asarray(query_vector, dtype=np.float32)
+    norms = np.linalg.norm(chunk_vectors, axis=1) * np.linalg.norm(query)
+    scores = np.divide(chunk_vectors @ query, norms, out=np.zeros(len(chunk_vectors), dtype=np.float32), where=norms != 0)
+
+    selected, used = [], 0
+    for index in np.argsort(-scores):
+        tokens = chunk_token_counts[index]
+        if selected and used + tokens > token_budget:
+            continue
+        selected.append(int(index))
+        used += tokens
+    return sorted(selected)
@@ -0,0 +1,47 @@
+"""
+Opaque keyset pagination cursors for application listings.
+
+A cursor holds the sort key of the last row of a page (its id, plus match_score when sorting by
+score) as base64url-encoded JSON. Clients pass it back unchanged; decoding validates it against
+the requested sort so a malformed or edited cursor is rejected before it reaches a query.
+"""
+import base64
+import json
+import math
+
+
+class InvalidCursor(ValueError):
+    """
+    The cursor is not one this module produced for the requested sort.
+    """
+
+
+def application_cursor(row: dict, sort: str) -> dict:
+    cursor = {"id": row["id"]}
+    if sort == "match_score":
+        cursor["match_score"] = row.get("match_score") or 0
+    return cursor
+
+
+def encode_application_cursor(row: dict, sort: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps(application_cursor(row, sort)).encode("utf-8")).decode("ascii")
+
+
+def decode_application_cursor(after: str, sort: str) -> dict:
+    """
+    Decodes and validates an 'after' cursor for the given sort. Raises InvalidCursor.
+    """
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(after.encode("ascii")))
+        if not isinstance(raw["id"], int) or isinstance(raw["id"], bool):
+            raise ValueError("id is not an integer")
+        cursor = {"id": raw["id"]}
+        if sort == "match_score":
+            if not isinstance(raw["match_score"], (int, float)) or isinstance(raw["match_score"], bool):
+                raise ValueError("match_score is not a number")
+            cursor["match_score"] = float(raw["match_score"])
+            if not math.isfinite(cursor["match_score"]):
+                raise ValueError("match_score is not finite")
+        return cursor
+    except Exception as e:
+        raise InvalidCursor(f"Invalid 'after' cursor: {e}") from e
@@ -0,0 +1,305 @@
+"""
+Per job role dashboard aggregates, maintained incrementally as applications are written.
+
+Each RoleDashboardAggregate holds everything /api/dashboard_data needs (match score buckets,
+running sum for the average, spam count, education counts, per-day counts and the top 10),
+so a dashboard read costs the same for 50 or 50,000 applicants. Aggregates live in process
+memory; they are built from the database on first read and can be rebuilt on demand.
+
+Every worker process has its own aggregates, and applications can also be written by other
+workers or directly in the database. A trigger (see schema.sql) bumps job_role.applications_version
+once per statement that writes a role's applications. An aggregate remembers the version it
+reflects and advances it for each write statement it applies itself, so a read that finds a
+different version in the database knows that someone else wrote and rebuilds.
+"""
+import heapq
+import threading
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+MATCH_SCORE_BINS = [0, 20, 40, 60, 80, 101] # Bins up to 101 to include 100
+MATCH_SCORE_LABELS = ["0-20%", "21-40%", "41-60%", "61-80%", "81-100%"]
+SPAM_SCORE_THRESHOLD = 70
+TOP_APPLICANTS = 10
+# Columns of job_applications the aggregates depend on
+DASHBOARD_COLUMNS = (
+    "id", "Name", "Education", "Education_Similarity", "Experience_Similarity",
+    "Skill_Similarity", "Level_Similarity", "spam_probability", "created_at",
+)
+
+
+def match_score_bucket(score: float) -> Optional[int]:
+    """
+    Index of the [low, high) bucket the score falls in, or None if it is out of range.
+    """
+    for i in range(len(MATCH_SCORE_LABELS)):
+        if MATCH_SCORE_BINS[i] <= score < MATCH_SCORE_BINS[i + 1]:
+            return i
+    return None
+
+
+def application_day(created_at) -> Optional[str]:
+    if not created_at:
+        return None
+    return str(created_at)[:10] # ISO timestamp -> "YYYY-MM-DD"
+
+
+class RoleDashboardAggregate:
+    """
+    Running dashboard totals for one job role. add() and update() are O(1) apart from the
+    rare case where an application in the top 10 loses score.
+    """
+
+    def __init__(self, match_score_fn: Callable[[dict], float], education_fn: Callable[[str], str]):
+        self.match_score_fn = match_score_fn
+        self.education_fn = education_fn
+        self.total = 0
+        self.match_score_sum = 0.0
+        self.spam_count = 0
+        self.bucket_counts = [0] * len(MATCH_SCORE_LABELS)
+        self.education_counts: Counter = Counter()
+        self.daily_counts: Counter = Counter()
+        self._top: List[tuple] = [] # min-heap of (match_score, id)
+        self.version: Optional[int] = None # job_role.applications_version this aggregate reflects
+        self._sources: Dict[int, dict] = {} # id -> DASHBOARD_COLUMNS of every counted application
+        # id -> contribution of that application; rows added by load() get theirs on first update
+        self._rows: Dict[int, dict] = {}
+
+    def _contribution(self, row: dict, match_score: Optional[float] = None, education: Optional[str] = None) -> dict:
+        spam_probability = row.get("spam_probability")
+        return {
+            "name": str(row.get("Name")),
+            "match_score": float(self.match_score_fn(row) if match_score is None else match_score),
+            "is_spam": (spam_probability or 0) * 100 > SPAM_SCORE_THRESHOLD,
+            "education": self.education_fn(row.get("Education")) if education is None else education,
+            "day": application_day(row.get("created_at")),
+        }
+
+    def _apply(self, contribution: dict, sign: int):
+        self.total += sign
+        self.match_score_sum += sign * contribution["match_score"]
+        self.spam_count += sign * int(contribution["is_spam"])
+        bucket = match_score_bucket(contribution["match_score"])
+        if bucket is not None:
+            self.bucket_counts[bucket] += sign
+        self.education_counts[contribution["education"]] += sign
+        if self.education_counts[contribution["education"]] <= 0:
+            del self.education_counts[contribution["education"]]
+        if contribution["day"]:
+            self.daily_counts[contribution["day"]] += sign
+            if self.daily_counts[contribution["day"]] <= 0:
+                del self.daily_counts[contribution["day"]]
+
+    def _offer_top(self, row_id: int, score: float):
+        entry = (score, row_id)
+        if len(self._top) < TOP_APPLICANTS:
+            heapq.heappush(self._top, entry)
+        elif entry > self._top[0]:
+            heapq.heapreplace(self._top, entry)
+
+    def _contribution_of(self, row_id: int) -> dict:
+        contribution = self._rows.get(row_id)
+        if contribution is None:
+            contribution = self._rows[row_id] = self._contribution(self._sources[row_id])
+        return contribution
+
+    def _rebuild_top(self):
+        self._top = heapq.nlargest(
+            TOP_APPLICANTS, ((self._contribution_of(row_id)["match_score"], row_id) for row_id in self._sources)
+        )
+        heapq.heapify(self._top)
+
+    def load(self, rows: List[dict], applications_df: "pd.DataFrame", match_scores: np.ndarray, education: np.ndarray):
+        """
+        Fills an empty aggregate with a role's applications in bulk: totals come from column
+        operations instead of one add() per row. rows are the DASHBOARD_COLUMNS of each
+        application, in the same order as applications_df, match_scores and education.
+        """
+        import pandas as pd
+
+        ids = applications_df["id"].to_numpy(dtype=np.int64)
+        match_scores = np.asarray(match_scores, dtype=np.float64)
+        spam = pd.to_numeric(applications_df["spam_probability"], errors="coerce").fillna(0).to_numpy() * 100 > SPAM_SCORE_THRESHOLD
+        days = applications_df["created_at"].astype("string").str[:10]
+
+        self.total = len(ids)
+        self.match_score_sum = float(match_scores.sum())
+        self.spam_count = int(spam.sum())
+        buckets = np.digitize(match_scores, MATCH_SCORE_BINS) - 1
+        in_range = (buckets >= 0) & (buckets < len(MATCH_SCORE_LABELS))
+        self.bucket_counts = np.bincount(buckets[in_range], minlength=len(MATCH_SCORE_LABELS)).tolist()
+        self.education_counts = Counter(pd.Series(education).value_counts().to_dict())
+        self.daily_counts = Counter(days[days.notna() & (days != "")].value_counts().to_dict())
+        top = np.lexsort((ids, match_scores))[-TOP_APPLICANTS:] # same order as (match_score, id) tuples
+        self._top = [(float(match_scores[i]), int(ids[i])) for i in top]
+        heapq.heapify(self._top)
+        self._sources = dict(zip(ids.tolist(), rows))
+        self._rows = {}
+
+    def add(self, row: dict, match_score: Optional[float] = None, education: Optional[str] = None):
+        """
+        Adds an application row. Adding an id that is already counted updates it instead.
+        match_score and education can be passed in when they were already computed in bulk.
+        """
+        row_id = int(row["id"])
+        if row_id in self._sources:
+            self.update(row_id, row)
+            return
+        contribution = self._contribution(row, match_score, education)
+        self._rows[row_id] = contribution
+        self._sources[row_id] = {column: row.get(column) for column in DASHBOARD_COLUMNS}
+        self._apply(contribution, +1)
+        self._offer_top(row_id, contribution["match_score"])
+
+    def update(self, row_id: int, changes: dict):
+        """
+        Applies changed columns of an application that is already counted.
+        """
+        if row_id not in self._sources:
+            return
+        old = self._contribution_of(row_id)
+        source = {**self._sources[row_id], **{k: v for k, v in changes.items() if k in DASHBOARD_COLUMNS}}
+        new = self._contribution(source)
+        self._apply(old, -1)
+        self._apply(new, +1)
+        self._rows[row_id] = new
+        self._sources[row_id] = source
+
+        if new["match_score"] != old["match_score"]:
+            if any(top_id == row_id for _, top_id in self._top):
+                self._rebuild_top()
+            else:
+                self._offer_top(row_id, new["match_score"])
+
+    def snapshot(self) -> dict:
+        """
+        Dashboard values in the shape of DashboardDataResponse.
+        """
+        if self.total == 0:
+            return {
+                "total_applicants": 0,
+                "average_match_score": 0.0,
+                "potential_spam_count": 0,
+                "match_score_distribution": [],
+                "education_breakdown": [],
+                "applications_over_time": [],
+                "top_10_applicants": [],
+            }
+        top = sorted(self._top, reverse=True)
+        return {
+            "total_applicants": self.total,
+            "average_match_score": round(self.match_score_sum / self.total, 2),
+            "potential_spam_count": self.spam_count,
+            "match_score_distribution": [
+                {"range": label, "count": count} for label, count in zip(MATCH_SCORE_LABELS, self.bucket_counts)
+            ],
+            "education_breakdown": [
+                {"category": category, "count": count} for category, count in self.education_counts.most_common()
+            ],
+            "applications_over_time": [
+                {"date": day, "count": count} for day, count in sorted(self.daily_counts.items())
+            ],
+            "top_10_applicants": [
+                {"id": row_id, "name": str(self._sources[row_id].get("Name")), "match_score": score} for score, row_id in top
+            ],
+        }
+
+
+class DashboardAggregates:
+    """
+    Registry of RoleDashboardAggregate per job_role_id.
+
+    Writes for a role whose aggregate has not been built yet are ignored (the first read
+    builds it from the database). Writes that arrive while a role is being rebuilt are
+    replayed onto the rebuilt aggregate so they are not lost. Rebuilds of the same role are
+    serialized with a per-role lock.
+    """
+
+    def __init__(self, match_score_fn: Callable[[dict], float], education_fn: Callable[[str], str]):
+        self.match_score_fn = match_score_fn
+        self.education_fn = education_fn
+        self._aggregates: Dict[int, RoleDashboardAggregate] = {}
+        self._pending: Dict[int, List[tuple]] = {} # role id -> writes seen during a rebuild
+        self._rebuild_locks: Dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def new_aggregate(self) -> RoleDashboardAggregate:
+        return RoleDashboardAggregate(self.match_score_fn, self.education_fn)
+
+    def get(self, job_role_id: int) -> Optional[RoleDashboardAggregate]:
+        with self._lock:
+            return self._aggregates.get(job_role_id)
+
+    def rebuild_lock(self, job_role_id: int) -> threading.Lock:
+        """
+        Lock to hold from begin_rebuild() to finish_rebuild() / cancel_rebuild() of a role.
+        """
+        with self._lock:
+            return self._rebuild_locks.setdefault(job_role_id, threading.Lock())
+
+    def begin_rebuild(self, job_role_id: int):
+        with self._lock:
+            self._pending[job_role_id] = []
+
+    def cancel_rebuild(self, job_role_id: int):
+        with self._lock:
+            self._pending.pop(job_role_id, None)
+
+    def finish_rebuild(self, job_role_id: int, aggregate: RoleDashboardAggregate, version: int):
+        """
+        Installs a rebuilt aggregate. version is the applications_version read before the rows were fetched.
+        """
+        with self._lock:
+            # Replayed writes may already be in the fetched rows, so they do not advance the version;
+            # if they came after it, the next read sees a newer version and rebuilds again
+            for op, args in self._pending.pop(job_role_id, []):
+                getattr(aggregate, op)(*args)
+            aggregate.version = version
+            self._aggregates[job_role_id] = aggregate
+
+    def _record_statement(self, ops: List[tuple]):
+        """
+        Applies the (job_role_id, op, args) changes of one database write statement. The
+        version of every role it touched advances by one, matching the statement trigger.
+        """
+        with self._lock:
+            touched = set()
+            for job_role_id, op, args in ops:
+                if job_role_id in self._pending:
+                    self._pending[job_role_id].append((op, args))
+                aggregate = self._aggregates.get(job_role_id)
+                if aggregate is not None:
+                    getattr(aggregate, op)(*args)
+                    touched.add(job_role_id)
+            for job_role_id in touched:
+                aggregate = self._aggregates[job_role_id]
+                if aggregate.version is not None:
+                    aggregate.version += 1
+
+    def add_application(self, row: dict):
+        self._record_statement([(int(row["job_role_id"]), "add", (row,))])
+
+    def update_application(self, job_role_id: int, row_id: int, changes: dict):
+        self.update_applications([(job_role_id, row_id, changes)])
+
+    def update_applications(self, updates: Iterable[tuple]):
+        """
+        Applies (job_role_id, row_id, changes) updates that were written in one statement.
+        """
+        self._record_statement([(int(job_role_id), "update", (int(row_id), changes)) for job_role_id, row_id, changes in updates])
+
+    def snapshot(self, job_role_id: int, version: Optional[int] = None) -> Optional[dict]:
+        """
+        The role's dashboard values, or None if it has no aggregate or, when version is
+        given, its aggregate does not reflect that applications_version.
+        """
+        with self._lock:
+            aggregate = self._aggregates.get(job_role_id)
+            if aggregate is None or (version is not None and aggregate.version != version):
+                return None
+            return aggregate.snapshot()
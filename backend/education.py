@@ -0,0 +1,87 @@
+"""
+Keyword classification of an applicant's education into the dashboard categories.
+
+Categories have a priority: text that mentions keywords of several categories gets the first
+of them in EDUCATION_CATEGORIES order, wherever the keywords occur in the text. All keywords
+are compiled into one alternation in that order, so most values are classified by a single
+search: the leftmost keyword found is then only checked against later keywords of
+higher-priority categories. classify_education_series does this once per distinct value.
+"""
+import re
+from typing import TYPE_CHECKING, Dict
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Predefined keywords for education categories. More sophisticated NLP could be used.
+EDUCATION_CATEGORIES = {
+    "Computer Science": ["computer science", "informatics", "software engineering", "artificial intelligence", "data science", "information system"],
+    "Engineering": ["engineering", "electrical", "network", "telecommunications", "mechanical", "civil"], # Add more engineering fields
+    "Business": ["business", "management", "mba", "marketing", "finance", "accounting"],
+    "Mathematics & Statistics": ["mathematics", "statistics", "actuarial"],
+    # Add more categories as needed
+}
+
+OTHER_EDUCATION_CATEGORY = "Other / Not Specified"
+
+# Category names by index, with Other last
+_CATEGORY_NAMES = np.array([*EDUCATION_CATEGORIES, OTHER_EDUCATION_CATEGORY], dtype=object)
+_OTHER_INDEX = len(EDUCATION_CATEGORIES)
+
+
+def _keyword_categories() -> Dict[str, int]:
+    """
+    Priority index of each keyword, in priority order. A keyword listed twice keeps its first category.
+    """
+    categories: Dict[str, int] = {}
+    for index, keywords in enumerate(EDUCATION_CATEGORIES.values()):
+        for keyword in keywords:
+            categories.setdefault(keyword, index)
+    return categories
+
+
+_KEYWORD_CATEGORY = _keyword_categories()
+
+# Plain alternations without groups, so re keeps its literal-prefix fast path. At any one position
+# the first alternative wins, so keywords are listed in priority order.
+_ANY_KEYWORD = re.compile("|".join(re.escape(keyword) for keyword in _KEYWORD_CATEGORY))
+# _HIGHER_PRIORITY_KEYWORDS[i] matches the keywords of the categories before category i
+_HIGHER_PRIORITY_KEYWORDS = [
+    re.compile("|".join(re.escape(keyword) for keyword, index in _KEYWORD_CATEGORY.items() if index < category) or "(?!)")
+    for category in range(len(EDUCATION_CATEGORIES))
+]
+
+
+def _category_index(education_text) -> int:
+    if not education_text or not isinstance(education_text, str):
+        return _OTHER_INDEX
+    text = education_text.lower()
+    match = _ANY_KEYWORD.search(text)
+    if match is None:
+        return _OTHER_INDEX
+    index = _KEYWORD_CATEGORY[match.group()]
+    # No keyword starts before the leftmost one, so only a higher-priority keyword further on can win
+    while index:
+        higher = _HIGHER_PRIORITY_KEYWORDS[index].search(text, match.start() + 1)
+        if higher is None:
+            break
+        match = _ANY_KEYWORD.search(text, higher.start())
+        index = _KEYWORD_CATEGORY[match.group()]
+    return index
+
+
+def classify_education(education_text: str) -> str:
+    return _CATEGORY_NAMES[_category_index(education_text)]
+
+
+def classify_education_series(education: "pd.Series") -> np.ndarray:
+    """
+    Columnar classify_education. Education values repeat heavily across applicants, so each
+    distinct value is classified once and the categories are mapped back by factorize codes.
+    """
+    import pandas as pd
+    codes, uniques = pd.factorize(education) # missing values get code -1
+    indexes = np.fromiter((_category_index(value) for value in uniques), dtype=np.intp, count=len(uniques))
+    return _CATEGORY_NAMES[np.append(indexes, _OTHER_INDEX)[codes]]
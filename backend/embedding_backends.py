@@ -0,0 +1,224 @@
+"""
+Pluggable embedding backends for the resume/job matcher model.
+
+Every backend exposes the langchain-style embed_documents / embed_query interface, so it can
+sit behind CachedEmbeddings or run inside the CPU process pool. Select one with the
+EMBEDDING_BACKEND setting:
+
+- "torch"     HuggingFaceEmbeddings on full PyTorch (the original behaviour)
+- "onnx"      the same model exported to ONNX and run with ONNX Runtime
+- "onnx-int8" the ONNX model with dynamically int8-quantized weights
+
+The ONNX files are exported (and quantized) once into ONNX_MODEL_DIR and reused afterwards.
+Run `python embedding_backends.py onnx-int8` to check cosine-score parity against torch.
+
+Heavy libraries are imported inside the backends, because this module is also imported by
+the process-pool workers.
+"""
+import json
+import os
+import sys
+import uuid
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0")) # 0 lets ONNX Runtime decide
+DEFAULT_MAX_SEQ_LENGTH = 256
+ONNX_BATCH_SIZE = 32
+
+
+class TorchEmbeddingBackend:
+    def __init__(self, model_name: str):
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        self.model_name = model_name
+        self._embeddings = HuggingFaceEmbeddings(model_name=model_name)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embeddings.embed_query(text)
+
+
+def _max_seq_length(model_name: str) -> int:
+    """
+    The sentence-transformers max_seq_length of the model, so ONNX truncates like torch does.
+    """
+    try:
+        from huggingface_hub import hf_hub_download
+
+        with open(hf_hub_download(model_name, "sentence_bert_config.json")) as f:
+            return int(json.load(f).get("max_seq_length", DEFAULT_MAX_SEQ_LENGTH))
+    except Exception:
+        return DEFAULT_MAX_SEQ_LENGTH
+
+
+def onnx_model_paths(model_name: str) -> Tuple[str, str]:
+    base = os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "__"))
+    return os.path.join(base, "model.onnx"), os.path.join(base, "model.int8.onnx")
+
+
+def _write_atomically(path: str, write: Callable[[str], None]):
+    """
+    Calls write(tmp_path) with a temp file unique to this call, then renames it to path.
+    Workers exporting at the same time each write their own file, and readers only ever see a complete one.
+    """
+    root, extension = os.path.splitext(path)
+    tmp_path = f"{root}.{os.getpid()}-{uuid.uuid4().hex}.tmp{extension}" # keeps the .onnx extension
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def export_onnx_model(model_name: str, quantized: bool) -> str:
+    """
+    Exports the transformer to ONNX (and an int8 copy if asked) unless it was already exported.
+    Returns the path of the requested file.
+    """
+    fp32_path, int8_path = onnx_model_paths(model_name)
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        os.makedirs(os.path.dirname(fp32_path), exist_ok=True)
+        model = AutoModel.from_pretrained(model_name).eval()
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        def export(tmp_path: str):
+            with torch.no_grad():
+                torch.onnx.export(
+                    model,
+                    tuple(sample[name] for name in input_names),
+                    tmp_path,
+                    input_names=input_names,
+                    output_names=["last_hidden_state"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=14,
+                )
+
+        _write_atomically(fp32_path, export)
+
+    if quantized and not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        _write_atomically(int8_path, lambda tmp_path: quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8))
+
+    return int8_path if quantized else fp32_path
+
+
+class OnnxEmbeddingBackend:
+    """
+    Runs the model with ONNX Runtime and applies the same mean pooling as sentence-transformers.
+    Vectors are L2-normalized, which leaves cosine similarities unchanged.
+    """
+
+    def __init__(self, model_name: str, quantized: bool = False):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantized = quantized
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.max_seq_length = _max_seq_length(model_name)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_INTRA_OP_THREADS:
+            options.intra_op_num_threads = ONNX_INTRA_OP_THREADS
+        self.session = ort.InferenceSession(
+            export_onnx_model(model_name, quantized), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np"
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(["last_hidden_state"], feeds)[0]
+
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Same preprocessing as HuggingFaceEmbeddings
+        texts = [text.replace("\n", " ") for text in texts]
+        vectors = [
+            self._embed_batch(texts[start:start + ONNX_BATCH_SIZE])
+            for start in range(0, len(texts), ONNX_BATCH_SIZE)
+        ]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def create_embedding_backend(backend: str, model_name: str):
+    if backend == "torch":
+        return TorchEmbeddingBackend(model_name)
+    if backend == "onnx":
+        return OnnxEmbeddingBackend(model_name, quantized=False)
+    if backend == "onnx-int8":
+        return OnnxEmbeddingBackend(model_name, quantized=True)
+    raise ValueError(f"Unknown embedding backend '{backend}'. Expected one of {EMBEDDING_BACKENDS}.")
+
+
+# --- Parity check ---
+
+PARITY_SAMPLE_PAIRS = [
+    ("Bachelor of Computer Science, majoring in artificial intelligence",
+     "Degree in Computer Science, Software Engineering or a related field"),
+    ("Built REST APIs with FastAPI and PostgreSQL, deployed services on AWS with Docker",
+     "Design, build and maintain backend services and APIs in Python"),
+    ("Python, PyTorch, scikit-learn, SQL, Tableau, Git",
+     "Experience with machine learning frameworks, SQL and data visualisation tools"),
+    ("Internship", "Senior level"),
+    ("Managed a team of five accountants and prepared quarterly financial statements",
+     "Develop React front-end components and write unit tests"),
+]
+
+
+def parity_check(reference, candidate, pairs: Sequence[Tuple[str, str]] = PARITY_SAMPLE_PAIRS, tolerance: float = 0.02) -> dict:
+    """
+    Compares the cosine scores of text pairs under two backends.
+    Returns the per-pair scores, the largest absolute difference and whether it is within tolerance.
+    """
+    def cosine_scores(backend) -> np.ndarray:
+        vectors = np.asarray(backend.embed_documents([a for a, _ in pairs] + [b for _, b in pairs]), dtype=np.float64)
+        left, right = vectors[:len(pairs)], vectors[len(pairs):]
+        return (left * right).sum(axis=1) / (np.linalg.norm(left, axis=1) * np.linalg.norm(right, axis=1))
+
+    reference_scores = cosine_scores(reference)
+    candidate_scores = cosine_scores(candidate)
+    max_abs_diff = float(np.max(np.abs(reference_scores - candidate_scores)))
+    return {
+        "reference_scores": reference_scores.tolist(),
+        "candidate_scores": candidate_scores.tolist(),
+        "max_abs_diff": max_abs_diff,
+        "tolerance": tolerance,
+        "within_tolerance": max_abs_diff <= tolerance,
+    }
+
+
+if __name__ == "__main__":
+    candidate_backend = sys.argv[1] if len(sys.argv) > 1 else "onnx"
+    model_name = sys.argv[2] if len(sys.argv) > 2 else "anass1209/resume-job-matcher-all-MiniLM-L6-v2"
+    report = parity_check(
+        create_embedding_backend("torch", model_name),
+        create_embedding_backend(candidate_backend, model_name),
+    )
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["within_tolerance"] else 1)
@@ -0,0 +1,186 @@
+"""
+Dynamic micro-batching in front of an embedding model.
+
+Concurrent embed calls (uploads, re-scores, chat) each ask for a handful of texts. Instead of
+sending each of them to the model on its own, callers enqueue their texts and get a future
+back; a dispatcher thread groups queued requests into one batch, capped by a maximum number
+of texts and a maximum wait after the first request, runs a single forward pass and resolves
+every caller's future with its own slice of the result.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List
+
+from metrics import Histogram, histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+QUEUE_LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+EMBEDDING_PASS_SECONDS = histogram(
+    "embedding_pass_duration_seconds", "Duration of one embedding forward pass (one micro-batch)", ("outcome",)
+)
+EMBEDDING_PASS_TEXTS = histogram(
+    "embedding_pass_texts", "Texts per embedding forward pass", buckets=BATCH_SIZE_BUCKETS
+)
+EMBEDDING_QUEUE_SECONDS = histogram(
+    "embedding_queue_wait_seconds", "Time an embed request waited for its micro-batch to start",
+    buckets=tuple(ms / 1000 for ms in QUEUE_LATENCY_BUCKETS_MS),
+)
+
+
+@dataclass
+class _EmbedRequest:
+    texts: List[str]
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class MicroBatchingEmbeddings:
+    """
+    Langchain-style embeddings object that merges concurrent calls into micro-batches.
+
+    A batch is closed when it holds max_batch_size texts or max_wait_ms has passed since its
+    first request. A single request larger than max_batch_size is never split. Up to
+    max_concurrent_batches batches run at once (use the CPU pool size when the wrapped model
+    runs in the process pool); while all of them are busy, new requests keep accumulating so
+    batches grow with load. embed_documents blocks, so call it from the I/O pool, not the event loop.
+    """
+
+    def __init__(self, embeddings, max_batch_size: int = 64, max_wait_ms: float = 5.0, max_concurrent_batches: int = 1):
+        self.embeddings = embeddings
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_latency_histogram = Histogram(QUEUE_LATENCY_BUCKETS_MS)
+        self.batches = 0
+        self.requests = 0
+        self.failed_batches = 0
+        self._stats_lock = threading.Lock()
+
+        self._queue: "queue.Queue[_EmbedRequest]" = queue.Queue()
+        self._carry: List[_EmbedRequest] = [] # request that did not fit the previous batch (dispatcher thread only)
+        self._slots = threading.Semaphore(self.max_concurrent_batches)
+        self._runner = ThreadPoolExecutor(max_workers=self.max_concurrent_batches, thread_name_prefix="embed-batch")
+        self._dispatcher = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def loaded(self) -> bool:
+        return bool(getattr(self.embeddings, "loaded", True))
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None:
+            with self._start_lock:
+                if self._dispatcher is None:
+                    self._dispatcher = threading.Thread(target=self._dispatch_loop, name="embed-batcher", daemon=True)
+                    self._dispatcher.start()
+
+    def _next_request(self, timeout=None):
+        if self._carry:
+            return self._carry.pop()
+        return self._queue.get(timeout=timeout)
+
+    def _dispatch_loop(self):
+        while True:
+            self._slots.acquire() # Only start collecting once a batch can actually run
+            first = self._next_request()
+            if first is None:
+                self._slots.release()
+                return
+
+            batch, size = [first], len(first.texts)
+            deadline = first.enqueued_at + self.max_wait
+            while size < self.max_batch_size:
+                try:
+                    request = self._next_request(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None) # Finish this batch, then stop
+                    break
+                if size + len(request.texts) > self.max_batch_size:
+                    self._carry.append(request)
+                    break
+                batch.append(request)
+                size += len(request.texts)
+
+            self._runner.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[_EmbedRequest]):
+        try:
+            started_at = time.monotonic()
+            texts = [text for request in batch for text in request.texts]
+            for request in batch:
+                self.queue_latency_histogram.observe((started_at - request.enqueued_at) * 1000)
+                EMBEDDING_QUEUE_SECONDS.labels().observe(started_at - request.enqueued_at)
+            self.batch_size_histogram.observe(len(texts))
+            EMBEDDING_PASS_TEXTS.labels().observe(len(texts))
+            with self._stats_lock:
+                self.batches += 1
+
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+                if len(vectors) != len(texts):
+                    raise RuntimeError(f"Embedding model returned {len(vectors)} vectors for {len(texts)} texts")
+            except Exception as e:
+                EMBEDDING_PASS_SECONDS.labels(outcome="error").observe(time.monotonic() - started_at)
+                with self._stats_lock:
+                    self.failed_batches += 1
+                for request in batch:
+                    request.future.set_exception(e)
+                return
+
+            EMBEDDING_PASS_SECONDS.labels(outcome="ok").observe(time.monotonic() - started_at)
+            offset = 0
+            for request in batch:
+                request.future.set_result(vectors[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+        finally:
+            self._slots.release()
+
+    # --- Public interface ---
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Queues texts for the next batch and returns a future of their vectors.
+        """
+        if self._closed:
+            raise RuntimeError("Embedding batcher has been shut down")
+        request = _EmbedRequest(list(texts))
+        if not request.texts:
+            request.future.set_result([])
+            return request.future
+        self._ensure_dispatcher()
+        with self._stats_lock:
+            self.requests += 1
+        self._queue.put(request)
+        return request.future
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.submit(texts).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_concurrent_batches": self.max_concurrent_batches,
+            "queued_requests": self._queue.qsize(),
+            "requests": self.requests,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_latency_ms": self.queue_latency_histogram.snapshot(),
+        }
+
+    def shutdown(self):
+        self._closed = True
+        self._queue.put(None)
+        self._runner.shutdown(wait=False)
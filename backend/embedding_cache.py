@@ -0,0 +1,132 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes text before hashing so that whitespace-only differences share a cache entry.
+    The tokenizer splits on whitespace anyway, so this does not change the embedding.
+    """
+    return " ".join(str(text).split())
+
+
+def embedding_cache_key(text: str, model_name: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings:
+    """
+    Content-addressed cache in front of a langchain embeddings object.
+
+    Vectors are keyed by sha256(model name + normalized text). Lookups go to a bounded
+    in-memory LRU first, then to an optional SQLite store that survives restarts, and only
+    the remaining misses are sent to the wrapped model (in a single embed_documents batch).
+    Exposes the same embed_documents / embed_query interface as the wrapped object.
+    """
+
+    def __init__(self, embeddings, model_name: str, max_entries: int = 4096, db_path: Optional[str] = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    # --- LRU / persistent store helpers (callers hold self._lock) ---
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def _lookup(self, key: str) -> Optional[np.ndarray]:
+        vector = self._lru.get(key)
+        if vector is not None:
+            self._lru.move_to_end(key)
+            self.memory_hits += 1
+            return vector
+
+        if self._db is not None:
+            row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self._remember(key, vector)
+                self.disk_hits += 1
+                return vector
+        return None
+
+    def _persist(self, items: Dict[str, np.ndarray]):
+        if self._db is None or not items:
+            return
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+            [(key, self.model_name, vector.tobytes()) for key, vector in items.items()],
+        )
+        self._db.commit()
+
+    # --- Public interface ---
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_cache_key(text, self.model_name) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {} # key -> text, deduplicated within the batch
+
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in found or key in missing:
+                    continue
+                vector = self._lookup(key)
+                if vector is None:
+                    missing[key] = text
+                else:
+                    found[key] = vector
+            self.misses += len(missing)
+
+        if missing:
+            # Model call happens outside the lock so concurrent hits are not blocked by it
+            computed = self.embeddings.embed_documents(list(missing.values()))
+            new_vectors = {key: np.asarray(vec, dtype=np.float32) for key, vec in zip(missing.keys(), computed)}
+            with self._lock:
+                for key, vector in new_vectors.items():
+                    self._remember(key, vector)
+                self._persist(new_vectors)
+            found.update(new_vectors)
+
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "model_name": self.model_name,
+                "entries": len(self._lru),
+                "max_entries": self.max_entries,
+                "persistent": self._db is not None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+            }
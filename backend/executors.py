@@ -0,0 +1,225 @@
+"""
+Execution layer for blocking work called from async endpoints.
+
+CPU-bound work (PDF parsing, embedding) goes to a process pool so concurrent uploads use
+several cores instead of holding the GIL in the server process. Blocking network I/O
+(Supabase, Gemini) goes to a thread pool. Both pools have a configurable size and expose
+queue-depth counters.
+
+This module is re-imported by every process-pool worker, so it must stay cheap to import:
+heavy libraries are only imported inside the worker functions.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List
+
+from metrics import histogram
+
+EXECUTOR_TASK_SECONDS = histogram(
+    "executor_task_duration_seconds", "Time from submitting a task to a pool until it finished, queue wait included",
+    ("pool", "function", "outcome"),
+)
+
+
+def _task_name(fn) -> str:
+    fn = getattr(fn, "func", fn) # unwrap functools.partial
+    return getattr(fn, "__qualname__", None) or type(fn).__name__
+
+
+class InstrumentedExecutor:
+    """
+    Wraps a concurrent.futures executor and counts submitted, in-flight, queued and finished tasks.
+    """
+
+    def __init__(self, name: str, executor: Executor, max_workers: int):
+        self.name = name
+        self.executor = executor
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_in_flight = 0
+
+    def _on_done(self, future, function: str, submitted_at: float):
+        failed = future.cancelled() or future.exception() is not None
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+        EXECUTOR_TASK_SECONDS.labels(pool=self.name, function=function, outcome="error" if failed else "ok").observe(
+            time.perf_counter() - submitted_at
+        )
+
+    def submit(self, fn, *args, **kwargs):
+        submitted_at = time.perf_counter()
+        future = self.executor.submit(fn, *args, **kwargs)
+        with self._lock:
+            self.submitted += 1
+            self.max_in_flight = max(self.max_in_flight, self.submitted - self.completed - self.failed)
+        future.add_done_callback(functools.partial(self._on_done, function=_task_name(fn), submitted_at=submitted_at))
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on the pool and awaits the result without blocking the event loop.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = self.submitted - self.completed - self.failed
+            return {
+                "max_workers": self.max_workers,
+                "in_flight": in_flight,
+                "queue_depth": max(0, in_flight - self.max_workers),
+                "max_in_flight": self.max_in_flight,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- CPU-bound worker functions (run inside the process pool) ---
+
+_worker_embeddings = {}
+
+
+def extract_pdf_text(pdf_bytes: bytes) -> str:
+    """
+    Extracts the text of a PDF with pdfminer, with newlines flattened to spaces.
+    """
+    from io import BytesIO
+    from pdfminer.high_level import extract_text
+
+    return extract_text(BytesIO(pdf_bytes)).replace("\n", " ")
+
+
+def embed_documents(model_name: str, texts: List[str], backend: str = "torch") -> List[List[float]]:
+    """
+    Embeds texts with an embedding backend (see embedding_backends.py) that is loaded once per worker process.
+    """
+    embeddings = _worker_embeddings.get((backend, model_name))
+    if embeddings is None:
+        from embedding_backends import create_embedding_backend
+
+        embeddings = create_embedding_backend(backend, model_name)
+        _worker_embeddings[(backend, model_name)] = embeddings
+    return embeddings.embed_documents(texts)
+
+
+def warm_embedding_worker(model_name: str, backend: str, barrier) -> None:
+    """
+    Loads the embedding model in this worker, then waits at the barrier until every worker has
+    one warmup task, so no worker can pick up a second one while another stays cold.
+    """
+    try:
+        embed_documents(model_name, ["warmup"], backend)
+    finally:
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass # Another worker failed or the wait timed out; this one is warm anyway
+
+
+_worker_markdown_converter = None
+
+
+def convert_pdf_to_markdown(pdf_bytes: bytes) -> str:
+    """
+    Converts PDF bytes to Markdown text with a MarkItDown converter that is created once per worker process.
+    """
+    global _worker_markdown_converter
+    from io import BytesIO
+    from markitdown import MarkItDown, StreamInfo
+
+    if _worker_markdown_converter is None:
+        _worker_markdown_converter = MarkItDown()
+    result = _worker_markdown_converter.convert_stream(
+        BytesIO(pdf_bytes), stream_info=StreamInfo(extension=".pdf", mimetype="application/pdf")
+    )
+    return result.text_content
+
+
+class ProcessPoolEmbeddings:
+    """
+    Langchain-style embeddings object whose forward passes run in the CPU pool.
+    embed_documents blocks the calling thread, so call it from the I/O pool, not the event loop.
+    """
+
+    def __init__(self, pool: InstrumentedExecutor, model_name: str, backend: str = "torch"):
+        self.pool = pool
+        self.model_name = model_name
+        self.backend = backend
+        self.loaded = False # True once a worker has loaded the model and embedded something
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.pool.submit(embed_documents, self.model_name, list(texts), self.backend).result()
+        self.loaded = True
+        return vectors
+
+    def warmup(self, timeout_seconds: float = 300):
+        """
+        Makes the pool start its workers and load the model in each of them. The warmup tasks
+        meet at a barrier, which pins exactly one of them to each worker.
+        """
+        workers = self.pool.max_workers
+        with multiprocessing.get_context("spawn").Manager() as manager:
+            barrier = manager.Barrier(workers, timeout=timeout_seconds)
+            futures = [self.pool.submit(warm_embedding_worker, self.model_name, self.backend, barrier) for _ in range(workers)]
+            for future in futures:
+                future.result()
+        self.loaded = True
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+# --- Pools ---
+
+CPU_POOL_SIZE = int(os.getenv("CPU_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+IO_POOL_SIZE = int(os.getenv("IO_POOL_SIZE", "32"))
+
+# spawn rather than fork: forking a process that already has torch/onnxruntime and client threads loaded is unsafe
+cpu_pool = InstrumentedExecutor(
+    "cpu",
+    ProcessPoolExecutor(max_workers=CPU_POOL_SIZE, mp_context=multiprocessing.get_context("spawn")),
+    CPU_POOL_SIZE,
+)
+io_pool = InstrumentedExecutor(
+    "io",
+    ThreadPoolExecutor(max_workers=IO_POOL_SIZE, thread_name_prefix="io"),
+    IO_POOL_SIZE,
+)
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """
+    Runs a CPU-bound, picklable top-level function in the process pool.
+    """
+    return await cpu_pool.run(fn, *args, **kwargs)
+
+
+async def run_io(fn, *args, **kwargs):
+    """
+    Runs a blocking I/O call in the thread pool.
+    """
+    return await io_pool.run(functools.partial(fn, *args, **kwargs))
+
+
+def executor_stats() -> dict:
+    return {"cpu": cpu_pool.stats(), "io": io_pool.stats()}
+
+
+def shutdown_executors():
+    cpu_pool.shutdown()
+    io_pool.shutdown()
@@ -0,0 +1,36 @@
+import threading
+from typing import Any, Callable
+
+
+class LazyObject:
+    """
+    Proxy that creates the wrapped object (and imports whatever it needs) on first use.
+
+    Attribute access is forwarded to the real object, so module-level clients such as
+    `supabase` or `model` can be declared at import time without paying for them until a
+    request actually needs them. Creation is thread-safe and happens once.
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: str):
+        self._factory = factory
+        self._name = name
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def load(self) -> Any:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyObject {self._name} ({state})>"
@@ -0,0 +1,313 @@
+"""
+Single async entry point for Gemini calls.
+
+Every call goes through the same limits: a global concurrency cap, a token-bucket request
+rate limit, a per-call timeout, and retries with full-jitter exponential backoff on 429 / 5xx
+/ timeouts, so bursts queue up here instead of failing at the API. Responses can be parsed
+as JSON (code fences stripped, required fields checked) and optionally cached by prompt hash.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Optional, Sequence
+
+from metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+LLM_REQUEST_SECONDS = histogram(
+    "llm_request_duration_seconds", "Duration of one Gemini API attempt, until the response (or first chunk) arrived",
+    ("operation", "outcome"),
+)
+LLM_RETRIES = counter("llm_retries_total", "Gemini calls retried after a retryable error", ("operation",))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# google.api_core / grpc error names for the same conditions, for errors without an HTTP code
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "InternalServerError", "BadGateway",
+    "ServiceUnavailable", "GatewayTimeout", "DeadlineExceeded",
+    "RESOURCE_EXHAUSTED", "UNAVAILABLE", "INTERNAL", "DEADLINE_EXCEEDED",
+}
+
+
+class LLMResponseError(ValueError):
+    """
+    The model returned no text, or text that is not the JSON that was asked for.
+    """
+
+
+def strip_code_fences(text: str) -> str:
+    text = re.sub(r"^```(?:json)?\s*", "", text.strip(), flags=re.MULTILINE)
+    text = re.sub(r"\s*```$", "", text, flags=re.MULTILINE)
+    return text.strip()
+
+
+def parse_json_response(text: str, required_fields: Optional[Sequence[str]] = None) -> Any:
+    """
+    Parses a JSON answer that may be wrapped in a Markdown code block.
+    Raises LLMResponseError if it is empty, invalid or missing a required field.
+    """
+    cleaned = strip_code_fences(text)
+    if not cleaned:
+        raise LLMResponseError("Empty response from model")
+    try:
+        data = json.loads(cleaned)
+    except json.JSONDecodeError as e:
+        raise LLMResponseError(f"Invalid JSON from model: {e}. Raw text: {cleaned[:500]!r}")
+    if required_fields:
+        missing = [name for name in required_fields if not isinstance(data, dict) or name not in data]
+        if missing:
+            raise LLMResponseError(f"Missing required fields in model response: {missing}")
+    return data
+
+
+def response_text(response) -> str:
+    """
+    Text of a Gemini response or stream chunk; empty if it has none (e.g. the prompt was blocked).
+    """
+    if response.candidates and response.candidates[0].content.parts:
+        return "".join(getattr(part, "text", "") or "" for part in response.candidates[0].content.parts)
+    return ""
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    code = getattr(error, "code", None)
+    if callable(code): # grpc errors expose code() returning a StatusCode
+        try:
+            code = code()
+        except Exception:
+            code = None
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS_CODES
+    if code is not None and getattr(code, "name", None) in RETRYABLE_ERROR_NAMES:
+        return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+class TokenBucket:
+    """
+    Allows rate_per_second acquisitions on average with bursts up to capacity. Waiters are served in order.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class LLMGateway:
+    """
+    Async wrapper around a google.generativeai GenerativeModel (or a LazyObject of one).
+    requests_per_minute <= 0 disables the rate limit. burst is how many calls may start at once
+    before the rate applies (default: a minute's quota), so concurrent callers are not spaced
+    out while under quota. cache_size 0 disables the response cache.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_concurrency: int = 8,
+        requests_per_minute: float = 60,
+        burst: Optional[float] = None,
+        timeout_seconds: float = 60,
+        max_retries: int = 4,
+        base_backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 30.0,
+        cache_size: int = 512,
+    ):
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.cache_size = cache_size
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._bucket = (
+            TokenBucket(requests_per_minute / 60, requests_per_minute if burst is None else burst)
+            if requests_per_minute > 0 else None
+        )
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.cache_hits = 0
+
+    # --- Response cache ---
+
+    def _cache_key(self, kind: str, prompt: str) -> str:
+        return hashlib.sha256(f"{kind}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str):
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+        return value
+
+    def _cache_put(self, key: str, value):
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # --- Calls ---
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: concurrent callers that failed together do not retry together
+        return random.uniform(0, min(self.max_backoff_seconds, self.base_backoff_seconds * 2 ** attempt))
+
+    async def _acquire_rate(self):
+        if self._bucket is not None:
+            await self._bucket.acquire()
+
+    async def generate(self, prompt: str, **kwargs):
+        """
+        Returns the raw Gemini response, retrying retryable errors.
+        """
+        attempt = 0
+        while True:
+            await self._acquire_rate()
+            async with self._semaphore:
+                self.in_flight += 1
+                self.calls += 1
+                started_at = time.perf_counter()
+                try:
+                    response = await asyncio.wait_for(
+                        self.model.generate_content_async(prompt, **kwargs), timeout=self.timeout_seconds
+                    )
+                    LLM_REQUEST_SECONDS.labels(operation="generate", outcome="ok").observe(time.perf_counter() - started_at)
+                    return response
+                except Exception as e:
+                    LLM_REQUEST_SECONDS.labels(operation="generate", outcome="error").observe(time.perf_counter() - started_at)
+                    error = e
+                finally:
+                    self.in_flight -= 1
+            if attempt >= self.max_retries or not is_retryable(error):
+                self.failures += 1
+                raise error
+            delay = self._backoff(attempt)
+            attempt += 1
+            self.retries += 1
+            LLM_RETRIES.labels(operation="generate").inc()
+            logger.warning(
+                "LLM call failed (%s: %s); retry %d/%d in %.1fs", type(error).__name__, error, attempt, self.max_retries, delay,
+                extra={"retry_attempt": attempt, "retry_delay_seconds": round(delay, 3)},
+            )
+            await asyncio.sleep(delay)
+
+    async def generate_text(self, prompt: str, cache: bool = False) -> str:
+        """
+        Returns the response text. Raises LLMResponseError if the model returned none.
+        """
+        key = self._cache_key("text", prompt)
+        if cache:
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+        response = await self.generate(prompt)
+        text = response_text(response).strip()
+        if not text:
+            feedback = getattr(response, "prompt_feedback", None)
+            raise LLMResponseError(f"Empty response from model{f' ({feedback})' if feedback else ''}")
+        if cache:
+            self._cache_put(key, text)
+        return text
+
+    async def generate_json(self, prompt: str, required_fields: Optional[Sequence[str]] = None, cache: bool = False) -> Any:
+        """
+        Returns the response parsed as JSON. With cache=True an answer cached for the same
+        prompt is returned; only successfully parsed answers are cached.
+        """
+        key = self._cache_key("json", prompt)
+        if cache:
+            cached = self._cache_get(key)
+            if cached is not None:
+                return json.loads(cached) # Copy, so callers can mutate the result
+        data = parse_json_response(await self.generate_text(prompt), required_fields)
+        if cache:
+            self._cache_put(key, json.dumps(data))
+        return data
+
+    async def stream(self, prompt: str) -> AsyncIterator[Any]:
+        """
+        Yields response chunks as they are generated. Only the initial request is retried;
+        once chunks have been yielded an error is raised to the caller. If the consumer stops
+        early (e.g. the client disconnected) the upstream generation is cancelled.
+        """
+        attempt = 0
+        while True:
+            await self._acquire_rate()
+            await self._semaphore.acquire()
+            self.in_flight += 1
+            self.calls += 1
+            started_at = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt, stream=True), timeout=self.timeout_seconds
+                )
+                LLM_REQUEST_SECONDS.labels(operation="stream", outcome="ok").observe(time.perf_counter() - started_at)
+                break
+            except BaseException as e:
+                # BaseException: a cancelled request (e.g. the SSE client went away) must free its slot too
+                LLM_REQUEST_SECONDS.labels(operation="stream", outcome="error").observe(time.perf_counter() - started_at)
+                self.in_flight -= 1
+                self._semaphore.release()
+                if not isinstance(e, Exception):
+                    raise
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self.failures += 1
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                self.retries += 1
+                LLM_RETRIES.labels(operation="stream").inc()
+                logger.warning(
+                    "LLM stream failed (%s: %s); retry %d/%d in %.1fs", type(e).__name__, e, attempt, self.max_retries, delay,
+                    extra={"retry_attempt": attempt, "retry_delay_seconds": round(delay, 3)},
+                )
+                await asyncio.sleep(delay)
+
+        try:
+            async for chunk in response:
+                yield chunk
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            iterator = getattr(response, "_iterator", None)
+            if iterator is not None and hasattr(iterator, "cancel"):
+                iterator.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "cache_entries": len(self._cache),
+            "cache_hits": self.cache_hits,
+        }
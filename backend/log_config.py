@@ -0,0 +1,49 @@
+"""
+Leveled, structured logging for the backend.
+
+Records are written to stderr one per line: as JSON by default, so log fields (timings, IDs)
+can be queried, or as plain text with LOG_FORMAT=text for local development. Fields passed
+with logger.info(..., extra={...}) are added to the JSON object. LOG_LEVEL sets the threshold
+(default INFO; DEBUG also shows the diagnostic messages that used to be printed).
+"""
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else on a record came from extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """
+    Installs the stderr handler on the root logger. Safe to call more than once.
+    """
+    handler = logging.StreamHandler(sys.stderr)
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    for existing in [h for h in root.handlers if getattr(h, "_backend_handler", False)]:
+        root.removeHandler(existing)
+    handler._backend_handler = True
+    root.addHandler(handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
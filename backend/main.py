@@ -1,43 +1,111 @@
 from fastapi import FastAPI, UploadFile, File
 from fastapi.responses import JSONResponse
 from io import BytesIO
-from pdfminer.high_level import extract_text
 import os
-import google.generativeai as genai
 from dotenv import load_dotenv
-import re
 import json
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain.utils.math import cosine_similarity
+import hashlib
+import importlib
+import logging
+import threading
+import time
 import numpy as np
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi.concurrency import run_in_threadpool # For running sync code in async endpoint
-from supabase import create_client, Client
-from fastapi import FastAPI, File, UploadFile, HTTPException
-import shutil
-import pandas as pd
-from google import genai as gi
-from markitdown import MarkItDown
-import requests
-from firecrawl import FirecrawlApp, JsonConfig
-from typing import List, Optional
-
-
+from fastapi.responses import StreamingResponse
+import httpx
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+import zipfile
+import zlib
+from cachetools import LRUCache
+import asyncio
+import contextlib
+from embedding_cache import CachedEmbeddings
+from embedding_backends import EMBEDDING_BACKENDS, create_embedding_backend
+from embedding_batcher import MicroBatchingEmbeddings
+from byte_ranges import RangeNotSatisfiable, parse_byte_range
+from cursors import InvalidCursor, application_cursor, decode_application_cursor, encode_application_cursor
+from dashboard_aggregates import DASHBOARD_COLUMNS, DashboardAggregates, RoleDashboardAggregate
+from education import classify_education, classify_education_series
+from pipeline import Stage, run_pipeline, timed
+from lazy import LazyObject
+from llm_gateway import LLMGateway, LLMResponseError, response_text
+from portfolio_enrichment import PortfolioEnricher, normalize_portfolio_link
+from chat_context import chunk_text, estimate_tokens, select_chunks
+from vector_index import CandidateVectorIndex
+from log_config import configure_logging
+from metrics import CONTENT_TYPE, REGISTRY, counter, histogram
+from profiling import ProfilingMiddleware
+from executors import CPU_POOL_SIZE, ProcessPoolEmbeddings, convert_pdf_to_markdown, cpu_pool, executor_stats, extract_pdf_text, run_cpu, run_io, shutdown_executors
+
+# Heavy dependencies (torch/transformers via langchain, pandas, the Gemini, Supabase and
+# Firecrawl SDKs) are imported on first use, so the process starts serving quickly.
+if TYPE_CHECKING:
+    import pandas as pd
 
 
+load_dotenv("api_keys.env")
 
-# Load embedding model
-embedding_model = HuggingFaceEmbeddings(model_name="anass1209/resume-job-matcher-all-MiniLM-L6-v2")
+# Leveled JSON logs on stderr; LOG_LEVEL=DEBUG for diagnostics, LOG_FORMAT=text for local runs (see log_config.py)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Load embedding model behind a content-addressed cache, so unchanged texts (e.g. the job side
+# of every similarity) are embedded once. Set EMBEDDING_CACHE_PATH to persist vectors in SQLite.
+# With EMBED_IN_PROCESS_POOL (the default) forward passes run in the CPU process pool.
+# EMBEDDING_BACKEND picks the runtime: torch, onnx or onnx-int8 (see embedding_backends.py).
+EMBEDDING_MODEL_NAME = "anass1209/resume-job-matcher-all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+if EMBEDDING_BACKEND not in EMBEDDING_BACKENDS:
+    raise ValueError(f"EMBEDDING_BACKEND must be one of {EMBEDDING_BACKENDS}, got '{EMBEDDING_BACKEND}'")
+# Vectors from different backends are close but not identical, so cached and stored vectors
+# are keyed by model and backend. torch keeps the bare model name used by existing rows.
+EMBEDDING_MODEL_ID = EMBEDDING_MODEL_NAME if EMBEDDING_BACKEND == "torch" else f"{EMBEDDING_MODEL_NAME}#{EMBEDDING_BACKEND}"
+EMBED_IN_PROCESS_POOL = os.getenv("EMBED_IN_PROCESS_POOL", "true").lower() == "true"
+
+def _create_local_embeddings():
+    return create_embedding_backend(EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME)
+
+# Cache misses from concurrent requests are merged into micro-batches before the forward pass
+# (see embedding_batcher.py); one batch per CPU worker can run at a time.
+embedding_batcher = MicroBatchingEmbeddings(
+    ProcessPoolEmbeddings(cpu_pool, EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND) if EMBED_IN_PROCESS_POOL
+    else LazyObject(_create_local_embeddings, "embedding model"),
+    max_batch_size=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64")),
+    max_wait_ms=float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5")),
+    max_concurrent_batches=CPU_POOL_SIZE if EMBED_IN_PROCESS_POOL else 1,
+)
+embedding_model = CachedEmbeddings(
+    embedding_batcher,
+    model_name=EMBEDDING_MODEL_ID,
+    max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+    db_path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+)
 
-load_dotenv("api_keys.env")
 api_key = os.getenv("GEMINI_API_KEY")
-# Configure the Gemini API
-genai.configure(api_key=api_key)
 
-# Use the Gemini Pro model (text-only)
-model = genai.GenerativeModel("gemini-2.5-flash-preview-05-20")
+def _create_gemini_model():
+    import google.generativeai as genai
+    # Configure the Gemini API
+    genai.configure(api_key=api_key)
+    # Use the Gemini Pro model (text-only)
+    return genai.GenerativeModel("gemini-2.5-flash-preview-05-20")
+
+model = LazyObject(_create_gemini_model, "Gemini model")
+
+# All Gemini calls go through one gateway: shared concurrency cap, rate limit, timeout,
+# retries on 429/5xx and a prompt-hash response cache (see llm_gateway.py)
+llm = LLMGateway(
+    model,
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60")),
+    burst=float(os.getenv("LLM_BURST")) if os.getenv("LLM_BURST") else None, # default: a minute's quota
+    timeout_seconds=float(os.getenv("LLM_TIMEOUT_SECONDS", "60")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+    cache_size=int(os.getenv("LLM_CACHE_SIZE", "512")),
+)
 
 app = FastAPI()
 
@@ -56,25 +124,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Profile-File", "X-Profile-Skipped"],
 )
 
-def find_similarity(text1:str, text2:str):
-    # Get embeddings
-    emb1 = embedding_model.embed_query(text1)
-    emb2 = embedding_model.embed_query(text2)
-
-    # Convert to NumPy arrays
-    vec1 = np.array(emb1).reshape(1, -1)
-    vec2 = np.array(emb2).reshape(1, -1)
-
-    # Cosine similarity
-    cos_sim = cosine_similarity(vec1, vec2)[0][0]
-
-    # Euclidean distance
-    #euclidean_dist = np.linalg.norm(vec1 - vec2)
-    return cos_sim
+# Per-request profiling: with PROFILING_ENABLED, a request sent with an `X-Profile: 1` header or
+# `?profile=1` is profiled and its profile saved to PROFILE_DIR (see profiling.py). The
+# middleware is not installed otherwise, so there is no overhead when it is off.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+if PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        output_dir=os.getenv("PROFILE_DIR", "profiles"),
+        default_mode=os.getenv("PROFILE_MODE", "cprofile").lower(),
+        sample_interval_ms=float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")),
+    )
 
-load_dotenv("api_keys.env")
 SUPABASE_URL = "https://lpfoskbcrtqzooatpann.supabase.co"
 SUPABASE_KEY = os.getenv("SUPABASE_API_KEY")
 BUCKET_NAME = "pdf-files"
@@ -82,9 +146,64 @@ BUCKET_NAME = "pdf-files"
 if not SUPABASE_KEY:
     raise ValueError("SUPABASE_API_KEY not found in api_keys.env")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+SUPABASE_REQUEST_SECONDS = histogram(
+    "supabase_request_duration_seconds", "Duration of Supabase HTTP requests, including reading the body",
+    ("service", "operation", "target", "status"),
+)
 
-from pydantic import BaseModel, Field
+_POSTGREST_OPERATIONS = {"GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+_STORAGE_OPERATIONS = {"GET": "download", "POST": "upload", "PUT": "update", "DELETE": "remove"}
+
+def _supabase_request_labels(service: str, request) -> dict:
+    # Labels name the table or bucket, never the row or file, to keep the number of series bounded
+    parts = request.url.path.strip("/").split("/")
+    if service == "postgrest":
+        operation = _POSTGREST_OPERATIONS.get(request.method, request.method.lower())
+        if request.method == "POST" and "merge-duplicates" in request.headers.get("prefer", ""):
+            operation = "upsert"
+        target = parts[2] if len(parts) > 2 else ""
+    else:
+        operation = _STORAGE_OPERATIONS.get(request.method, request.method.lower())
+        # /storage/v1/object/<bucket>/<path>
+        target = parts[3] if len(parts) > 3 and parts[2] == "object" else (parts[2] if len(parts) > 2 else "")
+    return {"service": service, "operation": operation, "target": target}
+
+def _instrument_httpx_client(http_client, service: str):
+    """
+    Records SUPABASE_REQUEST_SECONDS for every request sent through an httpx.Client.
+    """
+    def on_request(request):
+        request.extensions["metrics_started_at"] = time.perf_counter()
+
+    def on_response(response):
+        response.read() # The hook runs before the body is read; include the transfer in the duration
+        started_at = response.request.extensions.get("metrics_started_at")
+        if started_at is not None:
+            labels = _supabase_request_labels(service, response.request)
+            SUPABASE_REQUEST_SECONDS.labels(status=response.status_code, **labels).observe(time.perf_counter() - started_at)
+
+    hooks = http_client.event_hooks
+    hooks["request"] = [*hooks.get("request", []), on_request]
+    hooks["response"] = [*hooks.get("response", []), on_response]
+    http_client.event_hooks = hooks
+
+def _create_supabase_client():
+    from supabase import create_client
+    client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    # Table queries and storage transfers each use their own httpx client
+    for service, http_client in (
+        ("postgrest", getattr(client.postgrest, "session", None)),
+        ("storage", getattr(client.storage, "_client", None)),
+    ):
+        if isinstance(http_client, httpx.Client):
+            _instrument_httpx_client(http_client, service)
+        else:
+            logger.warning("Supabase %s client is not an httpx.Client; its requests are not timed", service)
+    return client
+
+supabase = LazyObject(_create_supabase_client, "Supabase client")
+
+from pydantic import BaseModel, Field, PrivateAttr
 
 class ChatRequest(BaseModel):
     input: str = Field(..., description="The HR user's question about the candidate.")
@@ -106,6 +225,8 @@ class JobFrontendFormat(BaseModel):
     description: str # A concise description extracted by the LLM
     requirements: List[str] = []
     benefits: List[str] = []
+    # Set on the fallback objects returned when LLM parsing fails, so they are not cached
+    _parse_failed: bool = PrivateAttr(default=False)
 
 # You might also want a model for the raw data from Supabase for type hinting
 class JobRoleDB(BaseModel):
@@ -115,96 +236,400 @@ class JobRoleDB(BaseModel):
     required_skills: Optional[str] # As per your CSV
 
 
+def _create_firecrawl_app():
+    from firecrawl import FirecrawlApp
+    return FirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"))
+
+firecrawl_app = LazyObject(_create_firecrawl_app, "Firecrawl client")
+
 def portfolio_scraper(portfolio_str):
-    FIRECRAWL_API_KEY = os.getenv("FIRECRAWL_API_KEY")
-    app = FirecrawlApp(api_key=FIRECRAWL_API_KEY)
+    """
+    Scrapes a portfolio site with Firecrawl and returns the extracted data as JSON text.
+    Blocking; call it through portfolio_enricher, which caches and deduplicates scrapes.
+    """
+    response = firecrawl_app.extract([
+    portfolio_str
+    ], prompt='Extract the applicants name and email, their projects, experiences and top skills. For projects and experiences, include their name and description. Then for skills in project and experience, include into top skills')
+    return json.dumps(response.data, indent=4)
+
+# Portfolio scrapes are cached per link for PORTFOLIO_CACHE_TTL seconds, shared between
+# concurrent requests and bounded by PORTFOLIO_SCRAPE_TIMEOUT (see portfolio_enrichment.py).
+# With PORTFOLIO_PREFETCH, links are scraped in the background as soon as an application is stored.
+PORTFOLIO_PREFETCH = os.getenv("PORTFOLIO_PREFETCH", "false").lower() == "true"
+
+async def _scrape_portfolio(link: str) -> str:
+    return await run_io(portfolio_scraper, link)
+
+portfolio_enricher = PortfolioEnricher(
+    _scrape_portfolio,
+    ttl_seconds=float(os.getenv("PORTFOLIO_CACHE_TTL", str(24 * 3600))),
+    timeout_seconds=float(os.getenv("PORTFOLIO_SCRAPE_TIMEOUT", "30")),
+    max_entries=int(os.getenv("PORTFOLIO_CACHE_SIZE", "1024")),
+)
+
+def prefetch_portfolio(application: dict):
+    if PORTFOLIO_PREFETCH and normalize_portfolio_link(application.get("Portfolio_link")):
+        portfolio_enricher.prefetch(application["Portfolio_link"])
+
+# --- AI-Generated Content Detection Worker ---
+# Works through unanalyzed applications in bounded batches (ordered by id). Each batch runs
+# download -> markdown conversion -> detection as an overlapping pipeline with a bounded
+# number of detections in flight, then writes its results back in one bulk update. The
+# is_analyzed flag is the checkpoint: a crashed run never redoes rows that were written.
+
+SAPLING_API_URL = "https://api.sapling.ai/api/v1/aidetect"
+AI_DETECTION_BATCH_SIZE = int(os.getenv("AI_DETECTION_BATCH_SIZE", "100"))
+AI_DETECTION_CONCURRENCY = int(os.getenv("AI_DETECTION_CONCURRENCY", "8"))
+AI_DETECTION_TIMEOUT = float(os.getenv("AI_DETECTION_TIMEOUT", "60"))
+
+ai_detection_status = {
+    "running": False,
+    "started_at": None,
+    "finished_at": None,
+    "batches": 0,
+    "analyzed": 0,
+    "failed": 0,
+    "last_id": None,
+    "error": None,
+}
+
+@dataclass
+class AIDetectionItem:
+    row: dict
+    pdf_bytes: bytes = b""
+    text: str = ""
+    score: Optional[float] = None
+
+def fetch_unanalyzed_batch(after_id: Optional[int], batch_size: int) -> List[dict]:
+    query = (
+        supabase.table("job_applications")
+        .select("id, ResumeID, job_role_id")
+        .eq("is_analyzed", False)
+        .order("id")
+        .limit(batch_size)
+    )
+    if after_id is not None:
+        query = query.gt("id", after_id)
+    return query.execute().data or []
+
+def write_ai_detection_results(items: List[AIDetectionItem]):
+    """
+    Writes the detection scores of a batch back in one UPDATE statement (see schema.sql).
+    Applications deleted in the meantime are skipped, not re-inserted.
+    """
+    ids = [item.row["id"] for item in items]
+    scores = [item.score * 100 for item in items]
+    response = supabase.rpc("set_ai_detection_scores", {"ids": ids, "scores": scores}).execute()
+    updated = {row["id"] for row in response.data or []}
+    dashboard_aggregates.update_applications(
+        (item.row["job_role_id"], item.row["id"], {"is_analyzed": True, "ai_generated_score": score})
+        for item, score in zip(items, scores)
+        if item.row["id"] in updated
+    )
 
-    try :
-        response = app.extract([
-        portfolio_str
-        ], prompt='Extract the applicants name and email, their projects, experiences and top skills. For projects and experiences, include their name and description. Then for skills in project and experience, include into top skills')
-        return json.dumps(response.data, indent=4)
-    except :
-        return "error"
+async def ai_detection(batch_size: int = AI_DETECTION_BATCH_SIZE, concurrency: int = AI_DETECTION_CONCURRENCY):
+    """
+    Scores every unanalyzed application for AI-generated content. Rows that fail stay
+    unanalyzed and are picked up again by the next run.
+    """
+    sapling_api_key = os.getenv("SAPLING_API_KEY")
+    if not sapling_api_key:
+        raise ValueError("SAPLING_API_KEY not found in api_keys.env")
+
+    async with httpx.AsyncClient(timeout=AI_DETECTION_TIMEOUT) as http_client:
+
+        async def download_stage(item: AIDetectionItem):
+            pdf_name = str(item.row["ResumeID"]) + ".pdf"
+            item.pdf_bytes = await run_io(supabase.storage.from_(BUCKET_NAME).download, pdf_name)
+
+        async def convert_stage(item: AIDetectionItem):
+            item.text = await run_cpu(convert_pdf_to_markdown, item.pdf_bytes)
+            item.pdf_bytes = b"" # Not needed any more; keep batch memory bounded
+
+        async def detect_stage(item: AIDetectionItem):
+            response = await http_client.post(SAPLING_API_URL, json={"key": sapling_api_key, "text": item.text})
+            response.raise_for_status()
+            # Extract only the top-level "score"
+            item.score = float(response.json()["score"])
+
+        stages = [
+            Stage("download", download_stage, concurrency),
+            Stage("convert", convert_stage, cpu_pool.max_workers),
+            Stage("detect", detect_stage, concurrency),
+        ]
 
-def ai_detection():
-    gemini_client =  gi.Client(api_key="EnterAPI")
+        def on_event(item: AIDetectionItem, stage: str, status: str, error: Optional[str]):
+            if status == "failed":
+                ai_detection_status["failed"] += 1
+                logger.warning("AI detection failed for application %s at %s: %s", item.row["id"], stage, error)
+
+        last_id = None
+        while True:
+            rows = await run_io(fetch_unanalyzed_batch, last_id, batch_size)
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+
+            completed = await run_pipeline([AIDetectionItem(row=row) for row in rows], stages, on_event)
+            if completed:
+                await run_io(write_ai_detection_results, completed)
+
+            ai_detection_status["batches"] += 1
+            ai_detection_status["analyzed"] += len(completed)
+            ai_detection_status["last_id"] = last_id
+
+async def _run_ai_detection_job():
+    ai_detection_status.update({
+        "running": True, "started_at": datetime.now(timezone.utc).isoformat(), "finished_at": None,
+        "batches": 0, "analyzed": 0, "failed": 0, "last_id": None, "error": None,
+    })
+    try:
+        await ai_detection()
+    except Exception as e:
+        logger.exception("Error in AI detection worker")
+        ai_detection_status["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        ai_detection_status["running"] = False
+        ai_detection_status["finished_at"] = datetime.now(timezone.utc).isoformat()
 
-    results = supabase.table("job_applications").select("*").eq("is_analyzed", False).execute()
+# --- Helper Functions ---
+def find_similarity(text1:str, text2:str) -> float: # Added type hint for return
+    return find_similarities([text1], [text2])[0]
+
+# Resume field -> (job description field, job_applications column) used for scoring
+SIMILARITY_FIELDS = [
+    ("Experience", "Experience", "Experience_Similarity"),
+    ("Education", "Education", "Education_Similarity"),
+    ("Skills", "Skills", "Skill_Similarity"),
+    ("Level", "Level", "Level_Similarity"),
+]
 
-    rows = results.data
+def cosine_similarities(vecs1, vecs2) -> List[float]:
+    """
+    Row-wise cosine similarity of two (n, dim) arrays; zero vectors score 0 like langchain's cosine_similarity.
+    """
+    vecs1 = np.asarray(vecs1, dtype=np.float64)
+    vecs2 = np.asarray(vecs2, dtype=np.float64)
+    norms = np.linalg.norm(vecs1, axis=1) * np.linalg.norm(vecs2, axis=1)
+    dots = np.einsum("ij,ij->i", vecs1, vecs2)
+    cos_sims = np.divide(dots, norms, out=np.zeros_like(dots), where=norms != 0)
+    return [float(s) for s in cos_sims]
+
+def find_similarities(texts1: List[str], texts2: List[str]) -> List[float]:
+    """
+    Batched version of find_similarity: embeds every text in a single embed_documents call
+    and returns the cosine similarity of texts1[i] against texts2[i] for each i.
+    """
+    if len(texts1) != len(texts2):
+        raise ValueError("find_similarities expects two lists of the same length")
+    if not texts1:
+        return []
 
-    for row in rows:
+    embeddings = embedding_model.embed_documents(list(texts1) + list(texts2))
+    return cosine_similarities(embeddings[:len(texts1)], embeddings[len(texts1):])
 
-        pdf_name = str(row["ResumeID"])+ ".pdf"
-        print(pdf_name)
+def score_resume_against_job(resume_json: dict, job_desc_json: dict, job_vectors: Optional[dict] = None) -> Tuple[dict, dict]:
+    """
+    Scores the extracted resume fields against the parsed job description fields in one
+    embedding pass. Returns the *_Similarity columns ready to merge into the application row,
+    and the resume field vectors (stored for candidate search, see store_resume_embeddings).
+    If the role's requirement vectors are passed in (see get_job_requirements), only the
+    resume side is embedded.
+    """
+    resume_texts = [resume_json[resume_field] for resume_field, _, _ in SIMILARITY_FIELDS]
+    if job_vectors:
+        resume_vectors = embedding_model.embed_documents(resume_texts)
+        job_side = [job_vectors[job_field] for _, job_field, _ in SIMILARITY_FIELDS]
+    else:
+        job_texts = [job_desc_json[job_field] for _, job_field, _ in SIMILARITY_FIELDS]
+        embeddings = embedding_model.embed_documents(resume_texts + job_texts)
+        resume_vectors, job_side = embeddings[:len(resume_texts)], embeddings[len(resume_texts):]
+    similarities = cosine_similarities(resume_vectors, job_side)
+    return (
+        {column: sim for (_, _, column), sim in zip(SIMILARITY_FIELDS, similarities)},
+        {resume_field: vector for (resume_field, _, _), vector in zip(SIMILARITY_FIELDS, resume_vectors)},
+    )
 
-        signed_url_data = supabase.storage.from_("pdf-files").download(pdf_name)
+# --- Job Requirement Precompute ---
+# The Education/Experience/Skills/Level requirements of a role, and their embeddings, are
+# parsed once and stored on the job_role row (see schema.sql). They are only recomputed
+# when the hash of the role's title + description changes.
 
-        with open(pdf_name, "wb") as f:
-            f.write(signed_url_data)
-        
+JOB_REQUIREMENT_FIELDS = ["Education", "Experience", "Skills", "Level"]
+
+def job_description_hash(job_role: str, job_description: str) -> str:
+    return hashlib.sha256(f"{job_role}\0{job_description}".encode("utf-8")).hexdigest()
+
+async def parse_job_requirements(job_role: str, job_desc: str, cache: bool = True) -> dict:
+    """
+    Uses Gemini to extract the Education/Experience/Skills/Level requirements of a job description.
+    Raises ValueError (LLMResponseError) if the response cannot be parsed. cache=False always asks the model.
+    """
+    return await llm.generate_json(
+    f"""
+    You are a Job Description parser that will extract information about job description,
+    Job Title : {job_role}
+    Job Description ; {job_desc}
+    
+    Your job is to extract the Education required, What the candidate is expected to do on the job and the education required.
+    Return ONLY a valid JSON object in this exact format, with no additional text or formatting:
+    {{
+        "Education": "string",
+        "Experience": "string",
+        "Skills": "string",
+        "Level": "string"
+    }}
+    """,
+    required_fields=JOB_REQUIREMENT_FIELDS,
+    cache=cache,
+    )
 
-        md = MarkItDown(llm_client=gemini_client, llm_model="gemini-2.5-flash-preview-05-20")
-        result = md.convert(pdf_name)
+async def get_job_requirements(job_row: dict, force: bool = False):
+    """
+    Returns (parsed requirements, requirement embeddings) for a job_role row.
+    Uses the values stored on the row when its description hash is unchanged, otherwise
+    parses and embeds the description and writes the results back to the row.
+    """
+    desc_hash = job_description_hash(job_row.get("job_role", ""), job_row.get("job_description", ""))
+    stored_parsed = job_row.get("parsed_job_desc")
+    stored_embeddings = job_row.get("requirement_embeddings") or {}
+
+    description_unchanged = not force and stored_parsed and job_row.get("job_description_hash") == desc_hash
+    if description_unchanged and stored_embeddings.get("model") == EMBEDDING_MODEL_ID:
+        return stored_parsed, stored_embeddings["vectors"]
 
-        response = requests.post(
-        "https://api.sapling.ai/api/v1/aidetect",
-        json={
-            "key": "ENTER API KEY",
-            "text": result.text_content
-        })
+    # Only re-embed (not re-parse) when just the embedding backend changed
+    parsed = stored_parsed if description_unchanged else await parse_job_requirements(job_row["job_role"], job_row["job_description"], cache=not force)
+    vectors = await run_io(embedding_model.embed_documents, [parsed[field] for field in JOB_REQUIREMENT_FIELDS])
+    job_vectors = dict(zip(JOB_REQUIREMENT_FIELDS, vectors))
 
-        decoded = response.content.decode('utf-8')
-        json_data = json.loads(decoded)
-    # Extract only the top-level "score"
-        main_score = json_data["score"]
+    await run_io(supabase.table("job_role").update({
+        "job_description_hash": desc_hash,
+        "parsed_job_desc": parsed,
+        "requirement_embeddings": {"model": EMBEDDING_MODEL_ID, "vectors": job_vectors},
+    }).eq("id", job_row["id"]).execute)
 
-        update_data = {
-        "is_analyzed": True,
-        "ai_generated_score": main_score * 100  # Replace with your calculated score
-        }
+    return parsed, job_vectors
 
-    # Perform the update
-        response = supabase.table("job_applications").update(update_data).eq("id", row['id']).execute()
+def allocate_resume_id() -> int:
+    """
+    Allocates the next ResumeID from the resume_id_seq database sequence (see schema.sql).
+    Concurrent callers always get distinct IDs.
+    """
+    response = supabase.rpc("next_resume_id").execute()
+    return int(response.data)
 
-        if os.path.exists(pdf_name):
-            os.remove(pdf_name)
+# --- Resume Text Store ---
+# Extracted resume text is stored once per ResumeID in the resume_texts table (see schema.sql),
+# together with the sha256 of the PDF it came from, and kept in a local LRU in front of it.
+# Chat reads it from here instead of downloading and re-parsing the PDF on every message.
+# Whenever the PDF itself is downloaded (e.g. by /get_resume_pdf) its hash is checked against
+# the stored one, and text extracted from a since-replaced PDF is dropped and re-extracted.
+
+RESUME_TEXT_CACHE_SIZE = int(os.getenv("RESUME_TEXT_CACHE_SIZE", "256"))
+_resume_text_lru: LRUCache = LRUCache(maxsize=RESUME_TEXT_CACHE_SIZE) # ResumeID -> (pdf_sha256, text)
+_resume_text_lock = threading.Lock()
+
+def pdf_content_hash(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+def store_resume_text(resume_id, pdf_bytes: bytes, full_text: str):
+    """
+    Saves the extracted text of a resume PDF to the resume text store and the local LRU.
+    """
+    pdf_hash = pdf_content_hash(pdf_bytes)
+    supabase.table("resume_texts").upsert({
+        "ResumeID": int(resume_id),
+        "pdf_sha256": pdf_hash,
+        "full_text": full_text,
+    }).execute()
+    with _resume_text_lock:
+        _resume_text_lru[str(resume_id)] = (pdf_hash, full_text)
+
+def _fetch_stored_resume_text(resume_id_str: str) -> Optional[str]:
+    response = (
+        supabase.table("resume_texts")
+        .select("pdf_sha256, full_text")
+        .eq("ResumeID", int(resume_id_str))
+        .limit(1)
+        .execute()
+    )
+    if not response.data:
+        return None
+    row = response.data[0]
+    with _resume_text_lock:
+        _resume_text_lru[resume_id_str] = (row["pdf_sha256"], row["full_text"])
+    return row["full_text"]
+
+def invalidate_stale_resume_text(resume_id_str: str, pdf_hash: str) -> bool:
+    """
+    Drops the stored text of a resume if it was extracted from a different PDF than the one
+    with pdf_hash, so the next load_resume_text() re-extracts it. Returns True if it was dropped.
+    """
+    with _resume_text_lock:
+        cached = _resume_text_lru.get(resume_id_str)
+    stored_hash = cached[0] if cached is not None else None
+    if stored_hash is None:
+        response = (
+            supabase.table("resume_texts")
+            .select("pdf_sha256")
+            .eq("ResumeID", int(resume_id_str))
+            .limit(1)
+            .execute()
+        )
+        if not response.data:
+            return False
+        stored_hash = response.data[0]["pdf_sha256"]
+    if stored_hash == pdf_hash:
+        return False
+
+    # Only delete the row we compared against, not text a concurrent re-extraction just stored
+    supabase.table("resume_texts").delete().eq("ResumeID", int(resume_id_str)).eq("pdf_sha256", stored_hash).execute()
+    with _resume_text_lock:
+        _resume_text_lru.pop(resume_id_str, None)
+    logger.info("Stored text of resume %s came from a different PDF; it will be re-extracted", resume_id_str)
+    return True
+
+async def load_resume_text(resume_id_str: str) -> str:
+    """
+    Returns the extracted text of the resume stored as resume_id_str.pdf.
+    Checks the local LRU, then the resume text store, and only downloads and parses the PDF
+    (backfilling the store) for resumes ingested before the store existed.
+    """
+    with _resume_text_lock:
+        cached = _resume_text_lru.get(resume_id_str)
+    if cached is not None:
+        return cached[1]
 
-async def upload_pdf_from_bytes(file_content: bytes, save_as: str = "temp_file.pdf"):
     try:
-        with open(save_as, "wb") as buffer:
-            buffer.write(file_content)
-        return {"message": f"File saved as {save_as}"}
+        stored_text = await run_io(_fetch_stored_resume_text, resume_id_str)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
- 
-# --- Helper Functions ---
-def find_similarity(text1:str, text2:str) -> float: # Added type hint for return
-    emb1 = embedding_model.embed_query(text1)
-    emb2 = embedding_model.embed_query(text2)
-    vec1 = np.array(emb1).reshape(1, -1)
-    vec2 = np.array(emb2).reshape(1, -1)
-    cos_sim = cosine_similarity(vec1, vec2)[0][0]
-    return float(cos_sim) # Ensure it's a float
+        logger.warning("Error reading resume text store for %s: %s - %s", resume_id_str, type(e).__name__, e)
+        stored_text = None
+    if stored_text is not None:
+        return stored_text
+
+    pdf_filename_on_storage = f"{resume_id_str}.pdf"
+    pdf_bytes = await run_io(supabase.storage.from_(BUCKET_NAME).download, pdf_filename_on_storage)
+    if not pdf_bytes: # Check if download returned None or empty bytes
+        raise FileNotFoundError(f"PDF {pdf_filename_on_storage} not found or empty in Supabase storage.")
+
+    full_text = await run_cpu(extract_pdf_text, pdf_bytes)
+    full_text = full_text.strip() # extract_pdf_text already flattens newlines
+    try:
+        await run_io(store_resume_text, resume_id_str, pdf_bytes, full_text)
+    except Exception as e:
+        logger.warning("Error saving resume text for %s: %s - %s", resume_id_str, type(e).__name__, e)
+    return full_text
 
 async def get_resume_full_text(resume_id_str: str) -> str:
     """
-    Downloads a resume PDF from Supabase (named as resume_id_str.pdf) and extracts its full text.
+    Returns the full text of the resume PDF stored as resume_id_str.pdf.
     """
-    pdf_filename_on_storage = f"{resume_id_str}.pdf"
     try:
-        # print(f"Attempting to download: {pdf_filename_on_storage} from bucket: {BUCKET_NAME}")
-        pdf_bytes = await run_in_threadpool(supabase.storage.from_(BUCKET_NAME).download, pdf_filename_on_storage)
-
-        if not pdf_bytes: # Check if download returned None or empty bytes
-            raise FileNotFoundError(f"PDF {pdf_filename_on_storage} not found or empty in Supabase storage.")
-
-        pdf_stream = BytesIO(pdf_bytes)
-        full_text = await run_in_threadpool(extract_text, pdf_stream)
-        return full_text.replace("\n", " ").strip() # Normalize newlines and strip whitespace
+        return await load_resume_text(resume_id_str)
     except Exception as e: # Catching a broader exception from supabase download
-        print(f"Error getting full text for resume {resume_id_str}: {type(e).__name__} - {e}")
+        logger.exception("Error getting full text for resume %s", resume_id_str)
         # Supabase download might raise different errors, not just FileNotFoundError
         # Check message for common indicators of "not found"
         if "The resource was not found" in str(e) or "NotFound" in str(e) or "does not exist" in str(e).lower():
@@ -254,51 +679,77 @@ JSON Output:
     """
 
     try:
-        # print(f"--- Sending to Gemini for JD Parsing ({job_title}) ---")
-        # print(prompt)
-        # print("-----------------------------------------------------")
-        response = await run_in_threadpool(model.generate_content, prompt)
-
-        if response.candidates and response.candidates[0].content.parts:
-            raw_json_text = response.candidates[0].content.parts[0].text.strip()
-            # print(f"--- Raw JSON from Gemini ({job_title}) ---")
-            # print(raw_json_text)
-            # print("-------------------------------------------")
-
-            # Clean up potential markdown code block
-            cleaned_json_text = re.sub(r"^```json\s*", "", raw_json_text, flags=re.MULTILINE)
-            cleaned_json_text = re.sub(r"\s*```$", "", cleaned_json_text, flags=re.MULTILINE).strip()
-
-            parsed_data = json.loads(cleaned_json_text)
-
-            # Validate and construct the JobFrontendFormat object
-            # Provide defaults directly in the model, but can also do here
-            return JobFrontendFormat(
-                id="temp", # Will be replaced by DB ID
-                title=job_title,
-                company=parsed_data.get("company", "Not specified"),
-                location=parsed_data.get("location", "Not specified"),
-                type=parsed_data.get("type", "Not specified"),
-                experience=parsed_data.get("experience", "Not specified"),
-                salary=parsed_data.get("salary", "Not specified"),
-                description=parsed_data.get("description", "No specific summary provided."),
-                requirements=parsed_data.get("requirements", []),
-                benefits=parsed_data.get("benefits", [])
-            )
-        else:
-            error_reason = "No response from LLM"
-            if response.prompt_feedback:
-                error_reason = f"LLM prompt feedback: {response.prompt_feedback}"
-            print(f"Could not parse job description for '{job_title}': {error_reason}")
-            # Return a default structure indicating failure for this specific job
-            return JobFrontendFormat(id="temp", title=job_title, description=f"Could not parse job details: {error_reason}")
-
-    except json.JSONDecodeError as e:
-        print(f"JSONDecodeError for '{job_title}': {e}. Raw text: '{cleaned_json_text if 'cleaned_json_text' in locals() else raw_json_text if 'raw_json_text' in locals() else 'N/A'}'")
-        return JobFrontendFormat(id="temp", title=job_title, description=f"Error parsing LLM response (JSON format issue).")
+        # Fence stripping and JSON parsing happen in the gateway; answers are cached by prompt
+        parsed_data = await llm.generate_json(prompt, cache=True)
+
+        # Validate and construct the JobFrontendFormat object
+        # Provide defaults directly in the model, but can also do here
+        return JobFrontendFormat(
+            id="temp", # Will be replaced by DB ID
+            title=job_title,
+            company=parsed_data.get("company", "Not specified"),
+            location=parsed_data.get("location", "Not specified"),
+            type=parsed_data.get("type", "Not specified"),
+            experience=parsed_data.get("experience", "Not specified"),
+            salary=parsed_data.get("salary", "Not specified"),
+            description=parsed_data.get("description", "No specific summary provided."),
+            requirements=parsed_data.get("requirements", []),
+            benefits=parsed_data.get("benefits", [])
+        )
+
+    except LLMResponseError as e:
+        logger.warning("Could not parse job description for %r: %s", job_title, e)
+        # Return a default structure indicating failure for this specific job
+        failed_job = JobFrontendFormat(id="temp", title=job_title, description="Error parsing LLM response (empty or not valid JSON).")
     except Exception as e:
-        print(f"Exception parsing job description for '{job_title}': {type(e).__name__} - {e}")
-        return JobFrontendFormat(id="temp", title=job_title, description=f"An unexpected error occurred during parsing: {str(e)}")
+        logger.exception("Exception parsing job description for %r", job_title)
+        failed_job = JobFrontendFormat(id="temp", title=job_title, description=f"An unexpected error occurred during parsing: {str(e)}")
+
+    failed_job._parse_failed = True
+    return failed_job
+
+
+# --- Structured Job Role Cache ---
+# Parsed JobFrontendFormat per job id, stored with the hash of the description it was parsed
+# from. A changed description no longer matches the hash and is parsed again.
+STRUCTURED_JOB_PARSE_CONCURRENCY = int(os.getenv("STRUCTURED_JOB_PARSE_CONCURRENCY", "8"))
+_structured_job_cache: Dict[str, Tuple[str, JobFrontendFormat]] = {}
+_structured_job_inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+_structured_job_semaphore = asyncio.Semaphore(STRUCTURED_JOB_PARSE_CONCURRENCY)
+
+async def _parse_structured_job_bounded(job_title: str, raw_description: str) -> JobFrontendFormat:
+    async with _structured_job_semaphore:
+        return await parse_job_description_to_structured_format(job_title, raw_description)
+
+async def get_structured_job(db_id_str: str, job_title: str, raw_description: str) -> JobFrontendFormat:
+    """
+    Returns the structured format of a job role, parsing it with the LLM only on a cache miss.
+    Concurrent misses for the same (id, description) share one parse.
+    """
+    desc_hash = job_description_hash(job_title, raw_description)
+    cached = _structured_job_cache.get(db_id_str)
+    if cached and cached[0] == desc_hash:
+        return cached[1].model_copy()
+
+    inflight_key = (db_id_str, desc_hash)
+    task = _structured_job_inflight.get(inflight_key)
+    if task is None:
+        task = asyncio.create_task(_parse_structured_job_bounded(job_title, raw_description))
+        _structured_job_inflight[inflight_key] = task
+    try:
+        parsed_job_details = await asyncio.shield(task)
+    finally:
+        if task.done():
+            _structured_job_inflight.pop(inflight_key, None)
+
+    # Update the id and title from the database record, as parsing focuses on other fields
+    parsed_job_details = parsed_job_details.model_copy()
+    parsed_job_details.id = db_id_str
+    parsed_job_details.title = job_title # Ensure DB title is used
+
+    if not parsed_job_details._parse_failed:
+        _structured_job_cache[db_id_str] = (desc_hash, parsed_job_details.model_copy())
+    return parsed_job_details
 
 
 @app.get("/api/structured-job-roles", response_model=List[JobFrontendFormat])
@@ -307,177 +758,239 @@ async def get_structured_job_roles():
     Fetches all job roles from the database, parses their descriptions using an LLM,
     and returns them in a structured format suitable for the frontend.
     """
-    formatted_jobs: List[JobFrontendFormat] = []
     try:
-        db_response = await run_in_threadpool(
+        db_response = await run_io(
             supabase.table("job_role").select("id, job_role, job_description").execute
         )
 
         if not db_response.data:
+            _structured_job_cache.clear()
             return [] # No jobs found
 
-        for job_from_db in db_response.data:
+        async def format_job(job_from_db: dict) -> JobFrontendFormat:
             db_id_str = str(job_from_db.get("id"))
             job_title = job_from_db.get("job_role", "Untitled Job")
             raw_description = job_from_db.get("job_description", "")
 
             if not raw_description:
                 # Handle cases with no description
-                formatted_job = JobFrontendFormat(
+                return JobFrontendFormat(
                     id=db_id_str,
                     title=job_title,
                     description="No job description provided."
                 )
-                formatted_jobs.append(formatted_job)
-                continue
-
-            # Parse the raw description
-            parsed_job_details = await parse_job_description_to_structured_format(job_title, raw_description)
+            return await get_structured_job(db_id_str, job_title, raw_description)
 
-            # Update the id and title from the database record, as parsing focuses on other fields
-            parsed_job_details.id = db_id_str
-            parsed_job_details.title = job_title # Ensure DB title is used
+        # Cache misses are parsed concurrently (bounded by STRUCTURED_JOB_PARSE_CONCURRENCY)
+        formatted_jobs: List[JobFrontendFormat] = await asyncio.gather(
+            *(format_job(job_from_db) for job_from_db in db_response.data)
+        )
 
-            formatted_jobs.append(parsed_job_details)
+        # Forget roles that were deleted
+        live_ids = {job.id for job in formatted_jobs}
+        for stale_id in set(_structured_job_cache) - live_ids:
+            _structured_job_cache.pop(stale_id, None)
 
         return formatted_jobs
 
-    except Exception as e:
-        print(f"Error in /api/structured-job-roles: {type(e).__name__} - {e}")
+    except Exception:
+        logger.exception("Error in /api/structured-job-roles")
         raise HTTPException(status_code=500, detail="Failed to fetch or process job roles.")
 
-@app.post("/api/chat", response_model=ChatResponse)
-async def resume_chat(request: ChatRequest):
+@app.post("/api/job_roles/{job_role_id}/precompute")
+async def precompute_job_role(job_role_id: int, force: bool = False):
     """
-    Handles chat interaction with an AI assistant about a specific resume.
+    Parses and embeds a job role's requirements. Call this when a role is created or its
+    description is edited; it is a no-op if the stored values are already up to date.
     """
+    response = await run_io(
+        supabase.table("job_role").select("*").eq("id", job_role_id).execute
+    )
+    if not response.data:
+        raise HTTPException(status_code=404, detail=f"Job role {job_role_id} not found.")
     try:
-        try:
-            # ResumeID is an integer in the database, but comes as string from request
-            resume_id_int = int(request.resume_id)
-        except ValueError:
-            raise HTTPException(status_code=400, detail=f"Invalid ResumeID format. Must be a number: '{request.resume_id}'")
-
-        # 1. Fetch application data from Supabase based on ResumeID (integer)
-        db_response = await run_in_threadpool(
-            supabase.table("job_applications")
-            .select("*")
-            .eq("id", resume_id_int)
-            .maybe_single() # Expects 0 or 1 row
-            .execute
-        )
-
-        
-
-
-        if not db_response.data:
-            raise HTTPException(status_code=404, detail=f"Candidate data for ResumeID '{request.resume_id}' not found.")
-
-        candidate_data = db_response.data # This is a dictionary for the single row
-
-
-        portfolio_info = "None"
-        if("folio" in request.input):
-            portfolio_info = portfolio_scraper(candidate_data["Portfolio_link"])
-            print(portfolio_info)
-        # 2. Get full resume text (using the original string resume_id for filename)
-        # full_resume_text = await get_resume_full_text(request.resume_id)
-        # if not full_resume_text: # Add a check here just in case
-        #     full_resume_text = "Resume text could not be extracted."
-
-        # 2. Get full resume text
-        resume_text_for_prompt: str
-
-        # --- Construct filename for Supabase Storage based on SCENARIO A ---
-        # ResumeID column in the database stores a base identifier (e.g., 7, 123).
-        # Files in storage are named like "7.pdf", "123.pdf".
-        if "ResumeID" not in candidate_data or candidate_data["ResumeID"] is None:
-            raise HTTPException(status_code=500, detail=f"ResumeID field is missing or null for candidate {resume_id_int}. Cannot locate PDF.")
-
-        # Ensure ResumeID is treated as a string for filename construction
-        base_resume_id_for_filename = str(candidate_data["ResumeID"])
-        resume_filename_in_storage = base_resume_id_for_filename + ".pdf"
-        # --- End Scenario A filename construction ---
+        parsed, _ = await get_job_requirements(response.data[0], force)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to parse job description: {e}")
+    return {"job_role_id": job_role_id, "requirements": parsed}
+
+# --- Chat Context Retrieval ---
+# Resume text and scraped portfolio are split into chunks that are embedded once (chunk
+# vectors are cached by content, on top of the embedding cache). Each chat question keeps only
+# the chunks most relevant to it, within CHAT_CONTEXT_TOKEN_BUDGET, instead of the whole text.
+
+CHAT_RETRIEVAL_ENABLED = os.getenv("CHAT_RETRIEVAL_ENABLED", "true").lower() == "true"
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "1500"))
+CHAT_CHUNK_TOKENS = int(os.getenv("CHAT_CHUNK_TOKENS", "200"))
+CHAT_CHUNK_OVERLAP_TOKENS = int(os.getenv("CHAT_CHUNK_OVERLAP_TOKENS", "40"))
+_chat_chunk_cache: LRUCache = LRUCache(maxsize=int(os.getenv("CHAT_CHUNK_CACHE_SIZE", "256"))) # text sha256 -> (chunks, vectors, token counts)
+_chat_chunk_lock = threading.Lock()
+
+def chunk_and_embed(text: str) -> Tuple[List[str], np.ndarray, List[int]]:
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _chat_chunk_lock:
+        cached = _chat_chunk_cache.get(key)
+    if cached is not None:
+        return cached
+
+    chunks = chunk_text(text, CHAT_CHUNK_TOKENS, CHAT_CHUNK_OVERLAP_TOKENS)
+    vectors = np.asarray(embedding_model.embed_documents(chunks), dtype=np.float32) if chunks else None
+    entry = (chunks, vectors, [estimate_tokens(chunk) for chunk in chunks])
+    with _chat_chunk_lock:
+        _chat_chunk_cache[key] = entry
+    return entry
+
+def trim_chat_context(question: str, sections: Dict[str, str]) -> Dict[str, str]:
+    """
+    Replaces each context section with its chunks most relevant to the question. The token
+    budget is shared by all sections; if everything already fits, sections are returned as is.
+    """
+    if not CHAT_RETRIEVAL_ENABLED or sum(estimate_tokens(text) for text in sections.values()) <= CHAT_CONTEXT_TOKEN_BUDGET:
+        return dict(sections)
+
+    owners, chunks, vectors, token_counts = [], [], [], []
+    for name, text in sections.items():
+        section_chunks, section_vectors, section_tokens = chunk_and_embed(text)
+        if not section_chunks:
+            continue
+        owners.extend([name] * len(section_chunks))
+        chunks.extend(section_chunks)
+        vectors.append(section_vectors)
+        token_counts.extend(section_tokens)
+    if not chunks:
+        return dict(sections)
+
+    question_vector = embedding_model.embed_query(question)
+    keep = select_chunks(np.vstack(vectors), question_vector, token_counts, CHAT_CONTEXT_TOKEN_BUDGET)
+    kept: Dict[str, List[str]] = {name: [] for name in sections}
+    for index in keep:
+        kept[owners[index]].append(chunks[index])
+    return {
+        name: "\n[...]\n".join(kept[name]) if kept[name] else "(No excerpt relevant to this question.)"
+        for name in sections
+    }
+
+async def build_chat_prompt(request: ChatRequest) -> str:
+    """
+    Builds the Gemini prompt for a chat question about a candidate: resume text, portfolio,
+    analysis scores and the job description. Raises HTTPException if the candidate is unknown.
+    """
+    try:
+        # ResumeID is an integer in the database, but comes as string from request
+        resume_id_int = int(request.resume_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid ResumeID format. Must be a number: '{request.resume_id}'")
+
+    # 1. Fetch application data from Supabase based on ResumeID (integer)
+    db_response = await run_io(
+        supabase.table("job_applications")
+        .select("*")
+        .eq("id", resume_id_int)
+        .maybe_single() # Expects 0 or 1 row
+        .execute
+    )
 
-        print(f"DEBUG: Value of candidate_data['ResumeID'] (used for filename base): {base_resume_id_for_filename}")
-        print(f"DEBUG: Attempting to download '{resume_filename_in_storage}' from bucket '{BUCKET_NAME}'")
+    
 
-        # resume_record = db_response.data
-        # resume_filename = str(resume_record["ResumeID"]) + ".pdf"
-        #     # Download the file from Supabase
-        # file_bytes  = supabase.storage.from_(BUCKET_NAME).download(resume_filename)
-        
-        # pdf_stream = BytesIO(file_bytes)
 
-        # # Extract text using pdfminer.six
-        # text = extract_text(pdf_stream)
+    if not db_response.data:
+        raise HTTPException(status_code=404, detail=f"Candidate data for ResumeID '{request.resume_id}' not found.")
 
-        # text = text.replace("\n"," ")
+    candidate_data = db_response.data # This is a dictionary for the single row
 
-        # print(text)
 
+    portfolio_info = "None"
+    if("folio" in request.input):
         try:
-            # Run the synchronous Supabase download method in a thread pool
-            file_bytes = await run_in_threadpool(
-                supabase.storage.from_(BUCKET_NAME).download,
-                resume_filename_in_storage
-            )
-
-            if file_bytes is None: # Should not happen if download raises error, but good check
-                raise ValueError("Supabase storage download returned None, expected bytes or error.")
-
-            pdf_stream = BytesIO(file_bytes)
-            extracted_pdf_text = extract_text(pdf_stream) # pdfminer.six function
-            resume_text_for_prompt = extracted_pdf_text.replace("\n", " ").strip()
-
-            if not resume_text_for_prompt:
-                resume_text_for_prompt = "Resume text was extracted but appears to be empty."
-            # print(f"DEBUG: Extracted PDF text (first 500 chars): {resume_text_for_prompt[:500]}...")
-
-        except Exception as e_storage: # Catch potential errors from storage download or PDF extraction
-            # This will catch Supabase APIError (e.g., 404 Object Not Found) or pdfminer errors
-            print(f"Error downloading or parsing PDF '{resume_filename_in_storage}': {type(e_storage).__name__} - {e_storage}")
-            resume_text_for_prompt = (
-                f"Full resume text could not be retrieved or parsed. "
-                f"(File sought: '{resume_filename_in_storage}'. Error: {type(e_storage).__name__}). "
-                f"Please ask about the analyzed scores and skills available from the database."
-            )
-
-        # 3. Prepare data for the prompt
-        # Composite Match Score (Average of available similarities)
-        similarity_scores = [
-            candidate_data.get("Experience_Similarity"),
-            candidate_data.get("Education_Similarity"),
-            candidate_data.get("Skill_Similarity"),
-            candidate_data.get("Level_Similarity")
-        ]
-        valid_scores = [s for s in similarity_scores if isinstance(s, (int, float))] # Filter out None or non-numeric
-        overall_match_score_val = (sum(valid_scores) / len(valid_scores) * 100) if valid_scores else 0.0
-        overall_match_score_str = f"{overall_match_score_val:.2f}"
-
-        # AI Generated Content Percentage
-        ai_score_val = candidate_data.get("ai_generated_score")
-        if isinstance(ai_score_val, (int, float)):
-            ai_generated_percentage_str = f"{ai_score_val:.2f}" # Using the direct value
-        elif candidate_data.get("is_analyzed") == False:
-            ai_generated_percentage_str = "Not yet analyzed"
-        else:
-            ai_generated_percentage_str = "N/A"
+            portfolio_info = await portfolio_enricher.get(candidate_data.get("Portfolio_link"))
+        except asyncio.TimeoutError:
+            logger.warning("Portfolio scrape for ResumeID %s timed out", request.resume_id)
+            portfolio_info = "Portfolio could not be retrieved in time."
+        except Exception as e:
+            logger.warning("Portfolio scrape for ResumeID %s failed: %s - %s", request.resume_id, type(e).__name__, e)
+            portfolio_info = "error"
+    # 2. Get full resume text (using the original string resume_id for filename)
+    # full_resume_text = await get_resume_full_text(request.resume_id)
+    # if not full_resume_text: # Add a check here just in case
+    #     full_resume_text = "Resume text could not be extracted."
 
+    # 2. Get full resume text
+    resume_text_for_prompt: str
 
-        # Spam Score (not in CSV, so explicitly state as N/A)
-        spam_score_str = "N/A (not available in current analysis)"
+    # --- Construct filename for Supabase Storage based on SCENARIO A ---
+    # ResumeID column in the database stores a base identifier (e.g., 7, 123).
+    # Files in storage are named like "7.pdf", "123.pdf".
+    if "ResumeID" not in candidate_data or candidate_data["ResumeID"] is None:
+        raise HTTPException(status_code=500, detail=f"ResumeID field is missing or null for candidate {resume_id_int}. Cannot locate PDF.")
 
-        # Extracted Skills
-        extracted_skills_str = candidate_data.get("Skills", "Not specified in the analysis")
-        if not extracted_skills_str: extracted_skills_str = "Not specified in the analysis"
+    # Ensure ResumeID is treated as a string for filename construction
+    base_resume_id_for_filename = str(candidate_data["ResumeID"])
+    resume_filename_in_storage = base_resume_id_for_filename + ".pdf"
+    # --- End Scenario A filename construction ---
 
-        job_role_description = candidate_data.get("Job_Desc", "Not specified in the analysis")
+    logger.debug("Resume file for chat: %s", resume_filename_in_storage)
 
+    try:
+        # Served from the resume text store; the PDF is only parsed if it was never stored
+        resume_text_for_prompt = await load_resume_text(base_resume_id_for_filename)
+
+        if not resume_text_for_prompt:
+            resume_text_for_prompt = "Resume text was extracted but appears to be empty."
+
+    except Exception as e_storage: # Catch potential errors from storage download or PDF extraction
+        # This will catch Supabase APIError (e.g., 404 Object Not Found) or pdfminer errors
+        logger.exception("Error downloading or parsing PDF %r", resume_filename_in_storage)
+        resume_text_for_prompt = (
+            f"Full resume text could not be retrieved or parsed. "
+            f"(File sought: '{resume_filename_in_storage}'. Error: {type(e_storage).__name__}). "
+            f"Please ask about the analyzed scores and skills available from the database."
+        )
 
-        # 4. Construct the prompt for Gemini
-        #    Ensure all placeholders are filled with string values
-        prompt_template = f"""
+    # 3. Prepare data for the prompt
+    # Composite Match Score (Average of available similarities)
+    similarity_scores = [
+        candidate_data.get("Experience_Similarity"),
+        candidate_data.get("Education_Similarity"),
+        candidate_data.get("Skill_Similarity"),
+        candidate_data.get("Level_Similarity")
+    ]
+    valid_scores = [s for s in similarity_scores if isinstance(s, (int, float))] # Filter out None or non-numeric
+    overall_match_score_val = (sum(valid_scores) / len(valid_scores) * 100) if valid_scores else 0.0
+    overall_match_score_str = f"{overall_match_score_val:.2f}"
+
+    # AI Generated Content Percentage
+    ai_score_val = candidate_data.get("ai_generated_score")
+    if isinstance(ai_score_val, (int, float)):
+        ai_generated_percentage_str = f"{ai_score_val:.2f}" # Using the direct value
+    elif candidate_data.get("is_analyzed") == False:
+        ai_generated_percentage_str = "Not yet analyzed"
+    else:
+        ai_generated_percentage_str = "N/A"
+
+
+    # Spam Score (not in CSV, so explicitly state as N/A)
+    spam_score_str = "N/A (not available in current analysis)"
+
+    # Extracted Skills
+    extracted_skills_str = candidate_data.get("Skills", "Not specified in the analysis")
+    if not extracted_skills_str: extracted_skills_str = "Not specified in the analysis"
+
+    job_role_description = candidate_data.get("Job_Desc", "Not specified in the analysis")
+
+
+    # Only the parts of the resume and portfolio relevant to the question go into the prompt
+    context_sections = {"resume": resume_text_for_prompt}
+    if portfolio_info != "None":
+        context_sections["portfolio"] = portfolio_info
+    context_tokens_before = sum(estimate_tokens(text) for text in context_sections.values())
+    context_sections = await run_io(trim_chat_context, request.input, context_sections)
+    context_tokens_after = sum(estimate_tokens(text) for text in context_sections.values())
+    resume_text_for_prompt = context_sections["resume"]
+    portfolio_info = context_sections.get("portfolio", portfolio_info)
+
+    # 4. Construct the prompt for Gemini
+    #    Ensure all placeholders are filled with string values
+    prompt_template = f"""
 You are an expert HR Resume Analysis Assistant.
 Your primary function is to answer questions about a specific candidate's resume and its analysis, based *solely* on the information provided to you below.
 Do not make assumptions, invent information, or use any external knowledge beyond what is given here.
@@ -486,7 +999,7 @@ Be concise and professional in your responses.
 
 Candidate Information (ID: {request.resume_id}):
 ---
-Full Resume Text:
+Resume Text ("[...]" marks parts left out because they are not relevant to the question):
 {resume_text_for_prompt}
 ---
 Portfolio Information:
@@ -512,12 +1025,26 @@ Based on the information provided above, please answer the HR User's question.
 
 Your Answer:
 """
-        # print("---- PROMPT FOR GEMINI ----")
-        # print(prompt_template)
-        # print("--------------------------")
+    prompt_tokens = estimate_tokens(prompt_template)
+    logger.info(
+        "Chat prompt for ResumeID %s: ~%d -> ~%d tokens (resume/portfolio context ~%d -> ~%d)",
+        request.resume_id, prompt_tokens + context_tokens_before - context_tokens_after, prompt_tokens,
+        context_tokens_before, context_tokens_after,
+        extra={"resume_id": request.resume_id, "prompt_tokens": prompt_tokens},
+    )
+    return prompt_template
+
+@app.post("/api/chat", response_model=ChatResponse)
+async def resume_chat(request: ChatRequest):
+    """
+    Handles chat interaction with an AI assistant about a specific resume.
+    """
+    try:
+        prompt_template = await build_chat_prompt(request)
+        logger.debug("Chat prompt for ResumeID %s:\n%s", request.resume_id, prompt_template)
 
         # 5. Send prompt to Gemini API
-        gemini_response = await run_in_threadpool(model.generate_content, prompt_template)
+        gemini_response = await llm.generate(prompt_template)
 
         generated_text = "I am unable to provide a response based on the information." # Default
         if gemini_response.candidates and gemini_response.candidates[0].content.parts:
@@ -534,29 +1061,256 @@ Your Answer:
     except HTTPException as e:
         raise e # Re-raise HTTPExceptions to let FastAPI handle them
     except Exception as e:
-        print(f"Error in /api/chat: {type(e).__name__} - {e}")
-        # Consider logging `e` with `traceback.format_exc()` for full stack trace
+        logger.exception("Error in /api/chat")
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred while processing your chat request: {str(e)}")
 
+@app.post("/api/chat/stream")
+async def resume_chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Streaming variant of /api/chat. Responds with a text/event-stream that relays Gemini's
+    output as it is generated: "token" events with the next piece of text, then a "done" event
+    with the full response (or an "error" event). Generation is cancelled when the client disconnects.
+    Prompt errors (unknown candidate, bad ResumeID) are returned as normal HTTP errors.
+    """
+    prompt_template = await build_chat_prompt(request)
+
+    async def event_stream():
+        generated_parts: List[str] = []
+        last_chunk = None
+        try:
+            # aclosing closes the gateway stream as soon as this block is left (e.g. on disconnect),
+            # which cancels the upstream generation instead of leaving it to garbage collection
+            async with contextlib.aclosing(llm.stream(prompt_template)) as chunks:
+                async for chunk in chunks:
+                    if await http_request.is_disconnected():
+                        logger.info("Chat stream for ResumeID %s cancelled: client disconnected", request.resume_id)
+                        return
+                    last_chunk = chunk
+                    text = response_text(chunk)
+                    if text:
+                        generated_parts.append(text)
+                        yield sse_event("token", {"text": text})
+
+            generated_text = "".join(generated_parts).strip()
+            if not generated_text:
+                generated_text = "The model generated an empty response. Please try rephrasing your question or check the provided candidate data."
+                if getattr(last_chunk, "prompt_feedback", None):
+                    generated_text += f" (Reason: {last_chunk.prompt_feedback})"
+                yield sse_event("token", {"text": generated_text})
+            yield sse_event("done", {"generated_response": generated_text})
+        except Exception as e:
+            logger.exception("Error in /api/chat/stream")
+            yield sse_event("error", {"error": f"An unexpected error occurred while processing your chat request: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/embedding_cache_stats")
+async def get_embedding_cache_stats():
+    """
+    Hit/miss counters of the embedding cache, e.g. to confirm job-side vectors are computed once per role.
+    """
+    return embedding_model.stats()
+
+
+@app.get("/api/embedding_batch_stats")
+async def get_embedding_batch_stats():
+    """
+    Batch-size and queue-latency histograms of the embedding micro-batcher, for tuning
+    EMBEDDING_BATCH_MAX_SIZE and EMBEDDING_BATCH_MAX_WAIT_MS.
+    """
+    return embedding_batcher.stats()
+
+
+@app.get("/api/executor_stats")
+async def get_executor_stats():
+    """
+    Size and queue depth of the CPU process pool and the blocking I/O thread pool.
+    """
+    return executor_stats()
+
+
+@app.get("/api/llm_stats")
+async def get_llm_stats():
+    """
+    Calls, retries, failures and cache hits of the LLM gateway.
+    """
+    return llm.stats()
+
+
+@app.get("/api/portfolio_cache_stats")
+async def get_portfolio_cache_stats():
+    return portfolio_enricher.stats()
+
+# --- Metrics ---
+# Prometheus text format at GET /metrics (see metrics.py). Latency histograms are recorded where
+# the work happens: HTTP endpoints below, Supabase requests (_create_supabase_client), pool tasks
+# such as pdfminer and markitdown (executors.py), embedding passes (embedding_batcher.py) and
+# Gemini calls (llm_gateway.py). The counters behind the /api/*_stats endpoints are exported as-is.
+
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds", "Time until the response headers were sent (streamed bodies are not included)",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started_at = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template (/get_job_application/{resume_id}), not the raw path, keeps series bounded
+        route = request.scope.get("route")
+        labels = {"method": request.method, "route": getattr(route, "path", "unmatched"), "status": status}
+        HTTP_REQUEST_SECONDS.labels(**labels).observe(time.perf_counter() - started_at)
+        HTTP_REQUESTS.labels(**labels).inc()
+
+def _register_stats_collectors():
+    REGISTRY.register_collector(
+        "embedding_cache_lookups_total", "Embedding cache lookups by result", "counter",
+        lambda: [({"result": result}, embedding_model.stats()[key]) for result, key in
+                 (("memory_hit", "memory_hits"), ("disk_hit", "disk_hits"), ("miss", "misses"))],
+    )
+    REGISTRY.register_collector(
+        "embedding_cache_entries", "Vectors held in the in-memory embedding cache", "gauge",
+        lambda: [({}, embedding_model.stats()["entries"])],
+    )
+    REGISTRY.register_collector(
+        "embedding_batch_queued_requests", "Embed requests waiting for a micro-batch", "gauge",
+        lambda: [({}, embedding_batcher.stats()["queued_requests"])],
+    )
+    REGISTRY.register_collector(
+        "executor_in_flight_tasks", "Tasks submitted to a pool and not finished yet", "gauge",
+        lambda: [({"pool": pool}, stats["in_flight"]) for pool, stats in executor_stats().items()],
+    )
+    REGISTRY.register_collector(
+        "executor_queue_depth", "Tasks waiting for a free pool worker", "gauge",
+        lambda: [({"pool": pool}, stats["queue_depth"]) for pool, stats in executor_stats().items()],
+    )
+    REGISTRY.register_collector(
+        "llm_in_flight_calls", "Gemini calls currently holding a concurrency slot", "gauge",
+        lambda: [({}, llm.stats()["in_flight"])],
+    )
+    REGISTRY.register_collector(
+        "llm_cache_hits_total", "LLM responses served from the prompt-hash cache", "counter",
+        lambda: [({}, llm.stats()["cache_hits"])],
+    )
+    REGISTRY.register_collector(
+        "llm_failures_total", "Gemini calls that failed after all retries", "counter",
+        lambda: [({}, llm.stats()["failures"])],
+    )
+    REGISTRY.register_collector(
+        "portfolio_cache_lookups_total", "Portfolio cache lookups by result", "counter",
+        lambda: [({"result": "hit"}, portfolio_enricher.hits), ({"result": "miss"}, portfolio_enricher.misses)],
+    )
+    REGISTRY.register_collector(
+        "portfolio_scrape_timeouts_total", "Portfolio lookups that gave up waiting for the scrape", "counter",
+        lambda: [({}, portfolio_enricher.timeouts)],
+    )
+
+_register_stats_collectors()
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.post("/api/ai_detection/run")
+async def start_ai_detection():
+    """
+    Starts the AI-generated content detection worker in the background, unless it is already running.
+    """
+    if not ai_detection_status["running"]:
+        ai_detection_status["running"] = True
+        spawn_background_task(_run_ai_detection_job())
+    return ai_detection_status
+
+@app.get("/api/ai_detection/status")
+async def get_ai_detection_status():
+    return ai_detection_status
+
+# --- Startup Warmup and Readiness ---
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+def _warm_embedding_model():
+    inner = embedding_batcher.embeddings
+    if isinstance(inner, ProcessPoolEmbeddings):
+        inner.warmup()
+    else:
+        inner.load().embed_documents(["warmup"])
+
+def _import_pandas():
+    importlib.import_module("pandas")
+
+async def warmup():
+    """
+    Loads the heavy dependencies in the background so the first real request doesn't pay for them.
+    """
+    steps = {
+        "supabase": supabase.load,
+        "gemini": model.load,
+        "pandas": _import_pandas,
+        "embedding_model": _warm_embedding_model,
+    }
+
+    async def run_step(name, fn):
+        try:
+            await run_io(fn)
+        except Exception:
+            logger.exception("Warmup of %s failed", name)
+
+    await asyncio.gather(*(run_step(name, fn) for name, fn in steps.items()))
+
+@app.on_event("startup")
+async def start_warmup():
+    if WARMUP_ON_STARTUP:
+        spawn_background_task(warmup())
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once the embedding model is loaded, 503 before that.
+    """
+    components = {
+        "embedding_model": embedding_batcher.loaded,
+        "supabase": supabase.loaded,
+        "gemini": model.loaded,
+    }
+    is_ready = components["embedding_model"]
+    return JSONResponse(content={"ready": is_ready, "components": components}, status_code=200 if is_ready else 503)
+
+@app.on_event("shutdown")
+def stop_executors():
+    embedding_batcher.shutdown()
+    shutdown_executors()
+
 
 @app.get("/get_available_jobs")
 async def get_available_jobs():
     table_name = "job_role"
     table_ref = supabase.table(table_name)
-    response = table_ref.select("*").execute()
+    response = await run_io(table_ref.select("*").execute)
     return response.data
 
 @app.get("/get_all_job_applications")
 async def get_all_job_applications():
     table_name = "job_applications" # Name of your table
     try:
-        response = supabase.table(table_name).select("*").execute()
+        response = await run_io(supabase.table(table_name).select("*").execute)
         if response.data:
             return response.data
         else:
             return []
     except Exception as e:
-        print(f"Error fetching from {table_name}: {e}")
+        logger.exception("Error fetching from %s", table_name)
         raise HTTPException(status_code=500, detail=f"Error fetching job applications: {str(e)}")
     
 @app.get("/get_job_application/{resume_id}")
@@ -564,7 +1318,7 @@ async def get_job_application_by_resume_id(resume_id: int):
     table_name = "job_applications"
     try:
         # .eq() stands for "equals"
-        response = supabase.table(table_name).select("*").eq("id", resume_id).execute()
+        response = await run_io(supabase.table(table_name).select("*").eq("id", resume_id).execute)
         if response.data:
             return response.data[0] # Assuming ResumeID is unique, returns the first match
         else:
@@ -572,139 +1326,111 @@ async def get_job_application_by_resume_id(resume_id: int):
     except HTTPException:
         raise # Re-raise HTTPException
     except Exception as e:
-        print(f"Error fetching application {resume_id}: {e}")
+        logger.exception("Error fetching application %s", resume_id)
         raise HTTPException(status_code=500, detail=str(e))
     
 
-@app.get("/get_job_application_by_role/{job_role_id}")
-async def get_job_application_by_job_role_id(job_role_id: int):
-    table_name = "job_applications"
-    try:
-        table_name = "job_applications"
-        table_ref = supabase.table(table_name)
-        response = table_ref.select("*").execute()
-        df = pd.DataFrame(response.data)
-        df = df[df["job_role_id"]==job_role_id]
-        df.drop(columns=["Job_Desc"],inplace=True)
-        df.fillna(-1,inplace=True)
-        return JSONResponse(content=df.to_dict(orient="records"))
-    except Exception as e:
-        print(f"Error fetching job applicants for {job_role_id}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@app.post("/send_job_application")
-async def send_job_application(selected_job_id: int, file: UploadFile = File(...)):
-    if file.content_type != "application/pdf":
-        return JSONResponse(content={"error": "Only PDF files are allowed."}, status_code=400)
-
-
-    response = supabase.table("job_role").select("*").eq("id", selected_job_id).execute()
-
-    rows = response.data
-    print(rows)
-
-    job_desc = rows[0]["job_description"]
-    job_role = rows[0]["job_role"]
+# Columns returned when listing applications; Job_Desc is deliberately left out
+APPLICATION_LIST_COLUMNS = (
+    "id, ResumeID, job_role_id, Name, Email, Phone_Number, Linkedin_link, Portfolio_link, "
+    "Education, Experience, Skills, Level, Extra, "
+    "Education_Similarity, Experience_Similarity, Skill_Similarity, Level_Similarity, match_score, "
+    "ai_generated_score, is_analyzed, spam_probability, created_at"
+)
+APPLICATION_PAGE_SIZE = 200
 
-    parsed_job_desc = model.generate_content(
-    f"""
-    You are a Job Description parser that will extract information about job description,
-    Job Title : {job_role}
-    Job Description ; {job_desc}
-    
-    Your job is to extract the Education required, What the candidate is expected to do on the job and the education required.
-    Return ONLY a valid JSON object in this exact format, with no additional text or formatting:
-    {{
-        "Education": "string",
-        "Experience": "string",
-        "Skills": "string",
-        "Level": "string"
-    }}
+def fetch_application_page(job_role_id: int, limit: int, cursor: Optional[dict], sort: str) -> List[dict]:
+    """
+    Fetches one page of a role's applications with filtering, projection and keyset
+    pagination done by the database.
     """
+    query = (
+        supabase.table("job_applications")
+        .select(APPLICATION_LIST_COLUMNS)
+        .eq("job_role_id", job_role_id)
     )
-    
-    try:
-        answer_job_desc = parsed_job_desc.text.strip()
-        # Remove any markdown code block indicators
-        answer_job_desc = re.sub(r"^```json\s*", "", answer_job_desc, flags=re.MULTILINE)
-        answer_job_desc = re.sub(r"\s*```$", "", answer_job_desc, flags=re.MULTILINE)
-        answer_job_desc = answer_job_desc.strip()
-        
-        if not answer_job_desc:
-            raise ValueError("Empty response from model")
-            
-        job_desc_json = json.loads(answer_job_desc)
-        
-        # Validate required fields
-        required_fields = ["Education", "Experience", "Skills", "Level"]
-        if not all(field in job_desc_json for field in required_fields):
-            raise ValueError("Missing required fields in model response")
-            
-    except (json.JSONDecodeError, ValueError) as e:
-        print(f"Error parsing model response: {e}")
-        print(f"Raw response: {parsed_job_desc.text}")
-        return JSONResponse(
-            content={"error": "Failed to parse job description"},
-            status_code=500
-        )
-
-    print("-------------------")
-    print(job_desc_json)
-    print("--------------------")
-
-
-    
+    if sort == "match_score":
+        # Keyset on (match_score desc, id desc)
+        if cursor:
+            score, last_id = float(cursor["match_score"]), int(cursor["id"])
+            query = query.or_(f"match_score.lt.{score},and(match_score.eq.{score},id.lt.{last_id})")
+        query = query.order("match_score", desc=True).order("id", desc=True)
+    else:
+        if cursor:
+            query = query.gt("id", int(cursor["id"]))
+        query = query.order("id")
+    return query.limit(limit).execute().data or []
+
+def _application_ndjson_line(row: dict) -> str:
+    # Missing values are sent as -1, which the frontend treats as "not available"
+    return json.dumps({key: (-1 if value is None else value) for key, value in row.items()}) + "\n"
 
+@app.get("/get_job_application_by_role/{job_role_id}")
+async def get_job_application_by_job_role_id(
+    job_role_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size. Omit to stream every application."),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page."),
+    sort: str = Query("id", pattern="^(id|match_score)$"),
+):
+    """
+    Streams a job role's applications as NDJSON, one application per line.
+    With `limit` a single page is returned and the cursor for the next page is sent in the
+    X-Next-Cursor header. Without it every page is streamed as it is fetched; if a later page
+    fails, the stream ends with an {"error": ..., "truncated": true} line.
+    """
     try:
-        # Read the uploaded PDF into a BytesIO buffer
-        '''
-        table_ref = db.reference('job_applications')
-        raw = table_ref.get()
-        if isinstance(raw, dict):
-            records = list(raw.values())
-        elif isinstance(raw, list):
-            records = raw
-        else:
-            records = []
-        # 3) Turn into DataFrame
-        
-        df = pd.DataFrame(records)
-        try:
-            max_number = int(df["ResumeID"].max())
-        except:
-            max_number = -1
-        new_resume_id = max_number + 1
-        '''
-
-        
-        table_ref = supabase.table("job_applications")
-        response = table_ref.select("*").execute()
-        df_temp = pd.DataFrame(response.data)
-
-        try:
-            max_number = int(df_temp["ResumeID"].max())
-        except:
-            max_number = -1
-        new_resume_id = max_number + 1
-
+        cursor = decode_application_cursor(after, sort) if after else None
+    except InvalidCursor:
+        # A 400 rather than a query error further down
+        raise HTTPException(status_code=400, detail="Invalid 'after' cursor.")
+    try:
+        if limit is not None:
+            rows = await run_io(fetch_application_page, job_role_id, limit, cursor, sort)
+            headers = {}
+            if len(rows) == limit:
+                headers["X-Next-Cursor"] = encode_application_cursor(rows[-1], sort)
+            return StreamingResponse(
+                iter([_application_ndjson_line(row) for row in rows]),
+                media_type="application/x-ndjson",
+                headers=headers,
+            )
 
+        # Fetch the first page before starting the response so query errors still return a 500
+        first_page = await run_io(fetch_application_page, job_role_id, APPLICATION_PAGE_SIZE, cursor, sort)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error fetching job applicants for %s", job_role_id)
+        raise HTTPException(status_code=500, detail=str(e))
 
-        file_content = await file.read()
-        pdf_stream = BytesIO(file_content)
+    async def stream_all_pages():
+        page = first_page
+        while page:
+            for row in page:
+                yield _application_ndjson_line(row)
+            if len(page) < APPLICATION_PAGE_SIZE:
+                break
+            next_cursor = application_cursor(page[-1], sort)
+            try:
+                page = await run_io(fetch_application_page, job_role_id, APPLICATION_PAGE_SIZE, next_cursor, sort)
+            except Exception as e:
+                logger.exception("Error fetching job applicants for %s", job_role_id)
+                # The 200 status is already sent; tell the client the list is incomplete
+                yield json.dumps({"error": f"Failed to fetch further applications: {e}", "truncated": True}) + "\n"
+                break
 
-        # Extract text using pdfminer.six
-        text = extract_text(pdf_stream)
+    return StreamingResponse(stream_all_pages(), media_type="application/x-ndjson")
 
-        text = text.replace("\n"," ")
 
-        print(text)
+# --- Ingest Helpers ---
+# Shared by /send_job_application and the bulk ingest pipeline.
 
-        print("-------------------")
-        print(job_desc_json)
-        print("--------------------")
-        # Example prompt
-        response = model.generate_content(f"""
+async def extract_resume_fields(text: str) -> dict:
+    """
+    Uses Gemini to extract the structured fields (Skills, Experience, Education, Name, ...) of a resume.
+    Cached by prompt, so re-uploading the same resume does not call the model again.
+    """
+    return await llm.generate_json(f"""
 
         resume text: {text.strip()}
 
@@ -729,117 +1455,899 @@ async def send_job_application(selected_job_id: int, file: UploadFile = File(...
 
         YOU  SHOULD RETURN A JSON FILE AND NOTHING ELSE
 
-        """)
+        """, cache=True)
 
-        answer = response.text
-        answer = re.sub(r"^```json\s*", "", answer, flags=re.MULTILINE)
-        answer = re.sub(r"\s*```$", "", answer, flags=re.MULTILINE)
-        answer = answer.strip()
-        print(1)
-        
-        answer_json = json.loads(answer)
-        print(2)
-        experience_similarity = float(find_similarity(answer_json["Experience"],job_desc_json["Experience"]))
-        education_similarity = float(find_similarity(answer_json["Education"],job_desc_json["Education"]))
-        skill_similarity = float(find_similarity(answer_json["Skills"], job_desc_json["Skills"]))
-        level_similarity = float(find_similarity(answer_json["Level"],job_desc_json["Level"]))
-
-        answer_json["Experience_Similarity"] = float(experience_similarity)
-        answer_json["Education_Similarity"] = float(education_similarity)
-        answer_json["Skill_Similarity"] = float(skill_similarity)
-        answer_json["Level_Similarity"] = float(level_similarity)
-        answer_json["Job_Desc"] = job_desc
+def upload_resume_pdf(resume_id: int, pdf_bytes: bytes):
+    """
+    Uploads a resume PDF to storage as {resume_id}.pdf straight from memory.
+    """
+    supabase.storage.from_(BUCKET_NAME).upload(
+        file=pdf_bytes,
+        path=f"{resume_id}.pdf",
+        file_options={"cache-control": "3600", "upsert": "true"}
+    )
+    evict_cached_resume_pdf(f"{resume_id}.pdf")
+
+def save_application(application: dict, pdf_bytes: bytes, text: str, resume_vectors: Optional[dict] = None) -> dict:
+    """
+    Inserts a scored application whose PDF is already in storage and returns the inserted row.
+    If the insert fails the uploaded PDF is removed again and the error is re-raised.
+    """
+    resume_id = application["ResumeID"]
+    try:
+        response = supabase.table("job_applications").insert(application).execute()
+        if hasattr(response, '_error') and response._error:
+            raise Exception(f"Database error: {response._error}")
+    except Exception:
+        # Try to delete the uploaded PDF if database insert fails
+        try:
+            supabase.storage.from_(BUCKET_NAME).remove([f"{resume_id}.pdf"])
+            evict_cached_resume_pdf(f"{resume_id}.pdf")
+        except:
+            pass
+        raise
+
+    row = response.data[0] if response.data else application
+    # O(1) update of the role's dashboard totals with the inserted row
+    if response.data:
+        dashboard_aggregates.add_application(row)
+
+    # Keep the text we already extracted so chat never has to parse this PDF again
+    try:
+        store_resume_text(resume_id, pdf_bytes, text)
+    except Exception as store_error:
+        logger.warning("Error saving resume text for %s: %s", resume_id, store_error)
+
+    # Field vectors feed candidate search; they were computed for scoring anyway
+    if resume_vectors:
+        try:
+            store_resume_embeddings(row, resume_vectors)
+        except Exception as store_error:
+            logger.warning("Error saving resume embeddings for %s: %s", resume_id, store_error)
+    return row
+
+
+class IngestStageError(Exception):
+    """
+    A failed send_job_application stage, carrying the HTTP response the endpoint should return.
+    """
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+@app.post("/send_job_application")
+async def send_job_application(selected_job_id: int, file: UploadFile = File(...)):
+    if file.content_type != "application/pdf":
+        return JSONResponse(content={"error": "Only PDF files are allowed."}, status_code=400)
+
+    # The ingest is a small dependency graph rather than a sequence. Two branches start at once:
+    #   requirements: role lookup -> parsed requirements (cached on the role)
+    #   resume:       PDF text extraction -> LLM field extraction
+    # and storage (ResumeID allocation -> PDF upload) starts once the role exists and the PDF
+    # text was extracted, so invalid requests never allocate an ID or upload anything; it
+    # still overlaps with the LLM extraction and scoring.
+    # Scoring waits for requirements + resume, the insert for scoring + storage, so the
+    # end-to-end latency is the critical path (usually the resume branch), not the sum.
+    # Blocking Supabase calls run in the I/O pool and PDF parsing/embedding in the CPU pool.
+    file_content = await file.read()
+    timings: Dict[str, float] = {}
+    started_at = time.perf_counter()
+
+    async def role_lookup():
+        response = await timed("role_lookup", run_io(supabase.table("job_role").select("*").eq("id", selected_job_id).execute), timings)
+        if not response.data:
+            raise IngestStageError(404, f"Job role {selected_job_id} not found.")
+        return response.data[0]
+
+    async def requirements_branch():
+        job_row = await role_task
+        try:
+            # Parsed once per role and reused until the description changes
+            job_desc_json, job_vectors = await timed("job_requirements", get_job_requirements(job_row), timings)
+        except ValueError as e:
+            logger.error("Error parsing model response: %s", e)
+            raise IngestStageError(500, "Failed to parse job description")
+        return job_row, job_desc_json, job_vectors
+
+    async def resume_branch():
+        text = await text_task
+        fields = await timed("llm_extract", extract_resume_fields(text), timings)
+        return text, fields
+
+    async def storage_branch():
+        # Raises (and allocates nothing) if the role does not exist or the PDF cannot be read
+        await asyncio.gather(role_task, text_task)
+        # Atomic and O(1): the ID comes from a database sequence, not a scan of job_applications
+        resume_id = await timed("allocate_resume_id", run_io(allocate_resume_id), timings)
+        try:
+            # Uploaded straight from the received bytes; no temp file on disk
+            await timed("upload", run_io(upload_resume_pdf, resume_id, file_content), timings)
+        except Exception as upload_error:
+            logger.exception("Error uploading PDF")
+            raise IngestStageError(500, f"Failed to upload PDF: {str(upload_error)}")
+        return resume_id
+
+    role_task = asyncio.create_task(role_lookup())
+    text_task = asyncio.create_task(timed("pdf_extract", run_cpu(extract_pdf_text, file_content), timings))
+    requirements_task = asyncio.create_task(requirements_branch())
+    resume_task = asyncio.create_task(resume_branch())
+    storage_task = asyncio.create_task(storage_branch())
+    saved = False
+
+    try:
+        (job_row, job_desc_json, job_vectors), (text, answer_json) = await asyncio.gather(requirements_task, resume_task)
+
+        # All four similarities come from a single batched embedding pass; the upload may still be running
+        similarities, resume_vectors = await timed(
+            "score", run_io(score_resume_against_job, answer_json, job_desc_json, job_vectors), timings
+        )
+        new_resume_id = await storage_task
+        answer_json.update(similarities)
+        answer_json["Job_Desc"] = job_row["job_description"]
         answer_json["ResumeID"] = new_resume_id
         answer_json["job_role_id"] = selected_job_id
-        print(3)
-
-        print("-------------------")
-        print(answer_json)
-        print("-------------------")
 
         try:
-            await upload_pdf_from_bytes(file_content, save_as="temp_file.pdf")
-
-            with open("temp_file.pdf", "rb") as f:
-                try:
-                    response = supabase.storage.from_(BUCKET_NAME).upload(
-                        file=f,
-                        path=f"{new_resume_id}.pdf",
-                        file_options={"cache-control": "3600", "upsert": "true"}
-                    )
-                except Exception as upload_error:
-                    print(f"Error uploading PDF: {str(upload_error)}")
-                    # Try to delete the temporary file
-                    try:
-                        os.remove("temp_file.pdf")
-                    except:
-                        pass
-                    raise HTTPException(status_code=500, detail=f"Failed to upload PDF: {str(upload_error)}")
-
-            # Try to delete the temporary file after successful upload
-            try:
-                os.remove("temp_file.pdf")
-            except:
-                pass
+            await timed("insert", run_io(save_application, answer_json, file_content, text.strip(), resume_vectors), timings)
+            saved = True # save_application removes the uploaded PDF itself if the insert fails
+        except Exception as db_error:
+            logger.exception("Error inserting into database")
+            raise IngestStageError(500, f"Failed to save application: {str(db_error)}")
+
+        # Warm the portfolio cache so the first portfolio question in chat does not wait for a scrape
+        prefetch_portfolio(answer_json)
+        return answer_json
+
+    except IngestStageError as e:
+        return JSONResponse(content={"error": e.message}, status_code=e.status_code)
+    except Exception as e:
+        logger.exception("Error in send_job_application")
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+    finally:
+        # The upload is left to finish (a running upload cannot be stopped), then discarded below;
+        # a storage branch still waiting for the role or the text stops with them
+        for task in (role_task, text_task, requirements_task, resume_task):
+            task.cancel()
+        for task in (role_task, text_task, requirements_task, resume_task, storage_task):
+            # Failures are already reported above; retrieve them so asyncio does not log them again
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        if not saved:
+            spawn_background_task(_discard_uploaded_resume(storage_task))
+        timings["total"] = round((time.perf_counter() - started_at) * 1000, 1)
+        logger.info(
+            "send_job_application timings (ms) for job role %s: %s", selected_job_id, timings,
+            extra={"job_role_id": selected_job_id, "timings_ms": timings},
+        )
 
-            # Insert into job_applications table
-            try:
-                response = supabase.table("job_applications").insert(answer_json).execute()
-                if hasattr(response, '_error') and response._error:
-                    raise Exception(f"Database error: {response._error}")
-                return answer_json
-            except Exception as db_error:
-                print(f"Error inserting into database: {str(db_error)}")
-                # Try to delete the uploaded PDF if database insert fails
-                try:
-                    supabase.storage.from_(BUCKET_NAME).remove([f"{new_resume_id}.pdf"])
-                except:
-                    pass
-                raise HTTPException(status_code=500, detail=f"Failed to save application: {str(db_error)}")
+async def _discard_uploaded_resume(storage_task: asyncio.Task):
+    """
+    Removes the PDF of an ingest that failed after (or while) its upload went through.
+    """
+    try:
+        resume_id = await storage_task
+    except BaseException:
+        return # Upload failed or was cancelled before it finished
+    try:
+        await run_io(supabase.storage.from_(BUCKET_NAME).remove, [f"{resume_id}.pdf"])
+        evict_cached_resume_pdf(f"{resume_id}.pdf")
+    except Exception as e:
+        logger.warning("Error removing orphaned PDF %s.pdf: %s", resume_id, e)
+
+
+# --- Bulk Ingest ---
+# Many resumes for one role go through a pipeline: text extraction -> LLM field extraction ->
+# scoring -> storage upload -> DB insert. Each stage has its own concurrency limit and the
+# stages overlap, so throughput is set by the slowest stage. Progress is sent as Server-Sent Events.
+
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "500"))
+BULK_MAX_PDF_BYTES = int(os.getenv("BULK_MAX_PDF_BYTES", str(20 * 1024 * 1024)))
+BULK_STAGE_CONCURRENCY = {
+    "extract": int(os.getenv("BULK_EXTRACT_CONCURRENCY", str(cpu_pool.max_workers))),
+    "llm": int(os.getenv("BULK_LLM_CONCURRENCY", "4")),
+    "score": int(os.getenv("BULK_SCORE_CONCURRENCY", "2")),
+    "upload": int(os.getenv("BULK_UPLOAD_CONCURRENCY", "4")),
+    "insert": int(os.getenv("BULK_INSERT_CONCURRENCY", "4")),
+}
 
-        except Exception as e:
-            print(f"Error in application process: {str(e)}")
-            # Clean up any temporary files
+# Keeps references to fire-and-forget tasks so they are not garbage collected mid-run
+_background_tasks: set = set()
+
+def spawn_background_task(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+@dataclass
+class BulkIngestItem:
+    filename: str
+    pdf_bytes: bytes
+    text: str = ""
+    fields: dict = field(default_factory=dict)
+    vectors: dict = field(default_factory=dict)
+    resume_id: Optional[int] = None
+    application_id: Optional[int] = None
+
+def collect_bulk_pdfs(uploads: List[Tuple[str, Optional[str], bytes]]) -> Tuple[List[BulkIngestItem], List[dict]]:
+    """
+    Turns uploaded (filename, content type, bytes) into PDF items, expanding zip archives.
+    Returns the items and a list of rejected entries with the reason.
+    Inflating archives is blocking work; call it through run_io.
+    """
+    items: List[BulkIngestItem] = []
+    rejected: List[dict] = []
+    too_many = {"reason": f"More than {BULK_MAX_FILES} files in one request."}
+
+    def add_pdf(name: str, data: bytes):
+        if len(items) >= BULK_MAX_FILES:
+            rejected.append({"file": name, **too_many})
+        elif not data.startswith(b"%PDF"):
+            rejected.append({"file": name, "reason": "Not a PDF file."})
+        else:
+            items.append(BulkIngestItem(filename=name, pdf_bytes=data))
+
+    for filename, content_type, data in uploads:
+        if content_type in ("application/zip", "application/x-zip-compressed") or filename.lower().endswith(".zip"):
             try:
-                os.remove("temp_file.pdf")
-            except:
-                pass
-            raise HTTPException(status_code=500, detail=str(e))
-    
+                with zipfile.ZipFile(BytesIO(data)) as archive:
+                    for member in archive.infolist():
+                        member_name = f"{filename}/{member.filename}"
+                        if member.is_dir() or not member.filename.lower().endswith(".pdf"):
+                            continue
+                        if len(items) >= BULK_MAX_FILES:
+                            # Listed but not inflated: the request is already full
+                            rejected.append({"file": member_name, **too_many})
+                            continue
+                        if member.file_size > BULK_MAX_PDF_BYTES:
+                            rejected.append({"file": member_name, "reason": "PDF is too large."})
+                            continue
+                        if member.flag_bits & 0x1:
+                            rejected.append({"file": member_name, "reason": "Encrypted zip entries are not supported."})
+                            continue
+                        try:
+                            data = archive.read(member)
+                        except NotImplementedError:
+                            rejected.append({"file": member_name, "reason": "Unsupported zip compression method."})
+                            continue
+                        except (RuntimeError, zipfile.BadZipFile, zlib.error) as e:
+                            rejected.append({"file": member_name, "reason": f"Could not read zip entry: {e}"})
+                            continue
+                        add_pdf(member_name, data)
+            except zipfile.BadZipFile:
+                rejected.append({"file": filename, "reason": "Invalid zip archive."})
+        elif content_type == "application/pdf" or filename.lower().endswith(".pdf"):
+            if len(data) > BULK_MAX_PDF_BYTES:
+                rejected.append({"file": filename, "reason": "PDF is too large."})
+            else:
+                add_pdf(filename, data)
+        else:
+            rejected.append({"file": filename, "reason": "Only PDF or zip files are allowed."})
+    return items, rejected
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/send_job_applications_bulk")
+async def send_job_applications_bulk(selected_job_id: int, files: List[UploadFile] = File(...)):
+    """
+    Ingests many resumes (PDFs and/or zip archives of PDFs) for one job role.
+    Responds with a text/event-stream of per-file progress: an "accepted" event, then a
+    "progress" event per file and stage, and a final "done" event with the totals.
+    Ingest continues even if the client disconnects.
+    """
+    # The request body is already spooled locally, so reading it here is cheap
+    uploads = [(upload.filename or f"file_{i}", upload.content_type, await upload.read()) for i, upload in enumerate(files)]
+    items, rejected = await run_io(collect_bulk_pdfs, uploads)
+    if not items:
+        return JSONResponse(content={"error": "No valid PDF files were uploaded.", "rejected": rejected}, status_code=400)
+
+    response = await run_io(supabase.table("job_role").select("*").eq("id", selected_job_id).execute)
+    if not response.data:
+        return JSONResponse(content={"error": f"Job role {selected_job_id} not found."}, status_code=404)
+    job_row = response.data[0]
+    try:
+        job_desc_json, job_vectors = await get_job_requirements(job_row)
+    except ValueError as e:
+        logger.error("Error parsing model response: %s", e)
+        return JSONResponse(content={"error": "Failed to parse job description"}, status_code=500)
+
+    async def extract_stage(item: BulkIngestItem):
+        item.text = (await run_cpu(extract_pdf_text, item.pdf_bytes)).strip()
+        if not item.text:
+            raise ValueError("No text could be extracted from the PDF.")
+
+    async def llm_stage(item: BulkIngestItem):
+        item.fields = await extract_resume_fields(item.text)
+
+    async def score_stage(item: BulkIngestItem):
+        similarities, item.vectors = await run_io(score_resume_against_job, item.fields, job_desc_json, job_vectors)
+        item.fields.update(similarities)
+        item.fields["Job_Desc"] = job_row["job_description"]
+        item.fields["job_role_id"] = selected_job_id
+
+    async def upload_stage(item: BulkIngestItem):
+        item.resume_id = await run_io(allocate_resume_id)
+        item.fields["ResumeID"] = item.resume_id
+        await run_io(upload_resume_pdf, item.resume_id, item.pdf_bytes)
+
+    async def insert_stage(item: BulkIngestItem):
+        row = await run_io(save_application, item.fields, item.pdf_bytes, item.text, item.vectors)
+        item.application_id = row.get("id")
+        prefetch_portfolio(item.fields)
+
+    stages = [
+        Stage("extract", extract_stage, BULK_STAGE_CONCURRENCY["extract"]),
+        Stage("llm", llm_stage, BULK_STAGE_CONCURRENCY["llm"]),
+        Stage("score", score_stage, BULK_STAGE_CONCURRENCY["score"]),
+        Stage("upload", upload_stage, BULK_STAGE_CONCURRENCY["upload"]),
+        Stage("insert", insert_stage, BULK_STAGE_CONCURRENCY["insert"]),
+    ]
+
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_event(item: BulkIngestItem, stage: str, status: str, error: Optional[str]):
+        payload = {"file": item.filename, "stage": stage, "status": status}
+        if error:
+            payload["error"] = error
+        if stage == "insert" and status == "done":
+            payload["application_id"] = item.application_id
+            payload["resume_id"] = item.resume_id
+        events.put_nowait(sse_event("progress", payload))
+
+    async def run_ingest():
+        completed: List[BulkIngestItem] = []
+        try:
+            completed = await run_pipeline(items, stages, on_event)
+        except Exception:
+            logger.exception("Error in bulk ingest for job role %s", selected_job_id)
+        finally:
+            events.put_nowait(sse_event("done", {
+                "total": len(items),
+                "succeeded": len(completed),
+                "failed": len(items) - len(completed),
+                "rejected": len(rejected),
+            }))
+            events.put_nowait(None)
+
+    spawn_background_task(run_ingest())
+
+    async def stream_progress():
+        yield sse_event("accepted", {"files": [item.filename for item in items], "rejected": rejected})
+        while True:
+            event = await events.get()
+            if event is None:
+                return
+            yield event
+
+    return StreamingResponse(
+        stream_progress(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# --- Candidate Search ---
+# The per-field resume vectors computed for scoring are stored in resume_embeddings (see
+# schema.sql) and kept in an in-memory CandidateVectorIndex (see vector_index.py), which is
+# filled from the table on first search. The index lives in process memory.
+
+CANDIDATE_SEARCH_FIELDS = [resume_field for resume_field, _, _ in SIMILARITY_FIELDS]
+CANDIDATE_INDEX_PAGE_SIZE = int(os.getenv("CANDIDATE_INDEX_PAGE_SIZE", "1000"))
+candidate_index = CandidateVectorIndex(CANDIDATE_SEARCH_FIELDS)
+_candidate_index_load_lock = threading.Lock()
+
+def store_resume_embeddings(application_row: dict, resume_vectors: dict):
+    """
+    Saves the field vectors of an inserted application and adds them to the candidate index.
+    """
+    supabase.table("resume_embeddings").upsert({
+        "ResumeID": application_row["ResumeID"],
+        "application_id": application_row.get("id"),
+        "job_role_id": application_row.get("job_role_id"),
+        "model": EMBEDDING_MODEL_ID,
+        "vectors": resume_vectors,
+    }, on_conflict="ResumeID").execute()
+    if candidate_index.loaded:
+        candidate_index.add(application_row["ResumeID"], application_row.get("job_role_id"), resume_vectors)
+
+def load_candidate_index():
+    """
+    Fills the candidate index from resume_embeddings (vectors of the current model only), once.
+    """
+    if candidate_index.loaded:
+        return
+    with _candidate_index_load_lock:
+        if candidate_index.loaded:
+            return
+        last_resume_id = None
+        while True:
+            query = (
+                supabase.table("resume_embeddings")
+                .select('"ResumeID", job_role_id, vectors')
+                .eq("model", EMBEDDING_MODEL_ID)
+                .order("ResumeID")
+                .limit(CANDIDATE_INDEX_PAGE_SIZE)
+            )
+            if last_resume_id is not None:
+                query = query.gt("ResumeID", last_resume_id)
+            rows = query.execute().data or []
+            candidate_index.add_many((row["ResumeID"], row.get("job_role_id"), row["vectors"] or {}) for row in rows)
+            if len(rows) < CANDIDATE_INDEX_PAGE_SIZE:
+                break
+            last_resume_id = rows[-1]["ResumeID"]
+        candidate_index.loaded = True
+        logger.info("Candidate index loaded with %d applicants", len(candidate_index))
+
+# Applications ingested before embeddings were stored are embedded from their extracted
+# fields (no LLM calls). The job resumes from last_id when restarted with resume=true.
+candidate_backfill_status = {
+    "running": False,
+    "started_at": None,
+    "finished_at": None,
+    "embedded": 0,
+    "skipped": 0,
+    "last_id": None,
+    "error": None,
+}
+
+def backfill_candidate_embeddings(after_id: Optional[int], batch_size: int = 64):
+    load_candidate_index()
+    last_id = after_id
+    while True:
+        query = (
+            supabase.table("job_applications")
+            .select('id, "ResumeID", job_role_id, ' + ", ".join(CANDIDATE_SEARCH_FIELDS))
+            .order("id")
+            .limit(batch_size)
+        )
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+        if not rows:
+            break
+
+        missing = [row for row in rows if row.get("ResumeID") is not None and row["ResumeID"] not in candidate_index]
+        candidate_backfill_status["skipped"] += len(rows) - len(missing)
+        if missing:
+            texts = [str(row.get(field) or "") for row in missing for field in CANDIDATE_SEARCH_FIELDS]
+            vectors = embedding_model.embed_documents(texts)
+            per_field = len(CANDIDATE_SEARCH_FIELDS)
+            records = [
+                {
+                    "ResumeID": row["ResumeID"],
+                    "application_id": row["id"],
+                    "job_role_id": row.get("job_role_id"),
+                    "model": EMBEDDING_MODEL_ID,
+                    "vectors": dict(zip(CANDIDATE_SEARCH_FIELDS, vectors[i * per_field:(i + 1) * per_field])),
+                }
+                for i, row in enumerate(missing)
+            ]
+            supabase.table("resume_embeddings").upsert(records, on_conflict="ResumeID").execute()
+            candidate_index.add_many((r["ResumeID"], r["job_role_id"], r["vectors"]) for r in records)
+            candidate_backfill_status["embedded"] += len(records)
+
+        last_id = rows[-1]["id"]
+        candidate_backfill_status["last_id"] = last_id
+
+async def _run_candidate_backfill_job(after_id: Optional[int]):
+    candidate_backfill_status.update({
+        "running": True, "started_at": datetime.now(timezone.utc).isoformat(), "finished_at": None,
+        "embedded": 0, "skipped": 0, "last_id": after_id, "error": None,
+    })
+    try:
+        await run_io(backfill_candidate_embeddings, after_id)
     except Exception as e:
-        print(f"Error in main process: {str(e)}")
-        if 'response' in locals() and hasattr(response, '_error'):
-            print(f"Database error: {response._error}")
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        logger.exception("Error in candidate embedding backfill")
+        candidate_backfill_status["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        candidate_backfill_status["running"] = False
+        candidate_backfill_status["finished_at"] = datetime.now(timezone.utc).isoformat()
+
+@app.post("/api/candidate_index/backfill")
+async def start_candidate_backfill(resume: bool = False):
+    """
+    Embeds the fields of applications that have no stored vectors yet, in the background.
+    With resume=true it continues after the last application the previous run reached.
+    """
+    if not candidate_backfill_status["running"]:
+        after_id = candidate_backfill_status["last_id"] if resume else None
+        candidate_backfill_status["running"] = True
+        spawn_background_task(_run_candidate_backfill_job(after_id))
+    return candidate_backfill_status
+
+@app.get("/api/candidate_index/backfill")
+async def get_candidate_backfill_status():
+    return {**candidate_backfill_status, "indexed": len(candidate_index)}
+
+@app.get("/api/candidate_search")
+async def candidate_search(
+    job_role_id: Optional[int] = None,
+    q: Optional[str] = None,
+    k: int = Query(20, ge=1, le=500),
+    applied_only: bool = False,
+    w_skills: float = Query(1.0, ge=0),
+    w_experience: float = Query(1.0, ge=0),
+    w_education: float = Query(1.0, ge=0),
+    w_level: float = Query(1.0, ge=0),
+):
+    """
+    Top-k applicants across the talent pool by weighted similarity, either to the requirements
+    of a job role (job_role_id) or to free text (q, compared with every field). With
+    applied_only=true only applicants of job_role_id are ranked.
+    """
+    if (job_role_id is None) == (not q):
+        raise HTTPException(status_code=400, detail="Pass exactly one of job_role_id or q.")
+    if applied_only and job_role_id is None:
+        raise HTTPException(status_code=400, detail="applied_only requires job_role_id.")
+    weights = {"Skills": w_skills, "Experience": w_experience, "Education": w_education, "Level": w_level}
+
+    if job_role_id is not None:
+        response = await run_io(supabase.table("job_role").select("*").eq("id", job_role_id).execute)
+        if not response.data:
+            raise HTTPException(status_code=404, detail=f"Job role {job_role_id} not found.")
+        try:
+            _, job_vectors = await get_job_requirements(response.data[0])
+        except ValueError as e:
+            logger.error("Error parsing model response: %s", e)
+            raise HTTPException(status_code=500, detail="Failed to parse job description")
+        query_vectors = {resume_field: job_vectors[job_field] for resume_field, job_field, _ in SIMILARITY_FIELDS}
+    else:
+        query_vector = await run_io(embedding_model.embed_query, q)
+        query_vectors = {field: query_vector for field in CANDIDATE_SEARCH_FIELDS}
+
+    await run_io(load_candidate_index)
+    try:
+        # One matrix-vector product over the whole index; numpy releases the GIL, so a thread is enough
+        results = await run_io(candidate_index.search, query_vectors, weights, k, job_role_id if applied_only else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Display columns for the k hits only
+    if results:
+        rows = (await run_io(
+            supabase.table("job_applications")
+            .select('id, "ResumeID", job_role_id, Name, Email, match_score')
+            .in_("ResumeID", [result["ResumeID"] for result in results])
+            .execute
+        )).data or []
+        by_resume_id = {row["ResumeID"]: row for row in rows}
+        for result in results:
+            row = by_resume_id.get(result["ResumeID"], {})
+            result.update({
+                "application_id": row.get("id"),
+                "Name": row.get("Name"),
+                "Email": row.get("Email"),
+                "match_score": row.get("match_score"),
+            })
+    return {"indexed": len(candidate_index), "results": results}
+
+
+# --- Batch Re-scoring ---
+# Re-scores applicants against a role's current requirement vectors from their stored field
+# vectors (the candidate index), as one matrix product: no resume is re-parsed and nothing is
+# sent to the LLM per applicant. scope=applicants rewrites the *_Similarity columns of the
+# role's own applications (e.g. after its description was edited); scope=pool scores every
+# indexed resume into role_candidate_scores (see schema.sql) to screen the talent pool for
+# a new opening. Runs in the background; progress and the cursor of the last written batch are
+# stored in rescore_jobs (see schema.sql), so a run interrupted by a crash or restart can be
+# resumed from any worker.
+
+RESCORE_WRITE_BATCH_SIZE = int(os.getenv("RESCORE_WRITE_BATCH_SIZE", "500"))
+# A "running" job whose progress has not been saved for this long is treated as interrupted
+RESCORE_STALE_SECONDS = int(os.getenv("RESCORE_STALE_SECONDS", "600"))
+RESCORE_COLUMNS = [column for _, _, column in SIMILARITY_FIELDS] # same order as CANDIDATE_SEARCH_FIELDS
+RESCORE_JOB_COLUMNS = (
+    "job_role_id", "scope", "state", "job_description_hash", "model", "started_at", "finished_at",
+    "indexed", "processed", "written", "missing_embeddings", "resumed_after", "cursor", "error",
+)
+rescore_status: Dict[Tuple[int, str], dict] = {} # (job_role_id, scope) -> progress of a run in this process
+
+def save_rescore_progress(status: dict):
+    """
+    Writes the progress of a re-score run to its rescore_jobs row.
+    """
+    record = {column: status[column] for column in RESCORE_JOB_COLUMNS}
+    record["updated_at"] = datetime.now(timezone.utc).isoformat()
+    supabase.table("rescore_jobs").upsert(record, on_conflict="job_role_id,scope").execute()
+    status["updated_at"] = record["updated_at"]
+
+def load_rescore_job(job_role_id: int, scope: str) -> Optional[dict]:
+    response = (
+        supabase.table("rescore_jobs").select("*")
+        .eq("job_role_id", job_role_id).eq("scope", scope).limit(1).execute()
+    )
+    return response.data[0] if response.data else None
+
+def rescore_job_is_live(job: dict) -> bool:
+    """
+    True if the job is running here, or is running elsewhere and has saved progress recently.
+    """
+    local = rescore_status.get((job["job_role_id"], job["scope"]))
+    if local is not None and local["state"] == "running":
+        return True
+    if job["state"] != "running" or not job.get("updated_at"):
+        return False
+    updated_at = datetime.fromisoformat(str(job["updated_at"]).replace("Z", "+00:00"))
+    return (datetime.now(timezone.utc) - updated_at).total_seconds() < RESCORE_STALE_SECONDS
+
+def compute_role_similarities(job_vectors: dict):
+    """
+    (ResumeIDs, similarities of shape (applicants, fields)) of every indexed resume against
+    the role's requirement vectors.
+    """
+    load_candidate_index()
+    query_vectors = {resume_field: job_vectors[job_field] for resume_field, job_field, _ in SIMILARITY_FIELDS}
+    resume_ids, _, similarities = candidate_index.field_similarities(query_vectors)
+    return resume_ids, similarities
 
+def rescore_role_applicants(job_row: dict, resume_ids: np.ndarray, similarities: np.ndarray, status: dict, after_id: Optional[int]):
+    """
+    Bulk-updates the similarity columns of the role's applications, page by page in id order.
+    Job_Desc is rewritten too, so chat about a re-scored application sees the description it was scored against.
+    """
+    job_role_id = job_row["id"]
+    positions = {int(resume_id): i for i, resume_id in enumerate(resume_ids)}
+    last_id = after_id
+    while True:
+        query = (
+            supabase.table("job_applications")
+            .select('id, "ResumeID"')
+            .eq("job_role_id", job_role_id)
+            .order("id")
+            .limit(RESCORE_WRITE_BATCH_SIZE)
+        )
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            i = positions.get(row["ResumeID"])
+            if i is None:
+                status["missing_embeddings"] += 1
+                continue
+            updates.append({
+                "id": row["id"],
+                **{column: float(similarities[i, j]) for j, column in enumerate(RESCORE_COLUMNS)},
+                "Job_Desc": job_row["job_description"],
+            })
+        if updates:
+            supabase.table("job_applications").upsert(updates, on_conflict="id", default_to_null=False).execute()
+            dashboard_aggregates.update_applications(
+                (job_role_id, update_data["id"], {column: update_data[column] for column in RESCORE_COLUMNS})
+                for update_data in updates
+            )
+
+        last_id = rows[-1]["id"]
+        status["processed"] += len(rows)
+        status["written"] += len(updates)
+        status["cursor"] = last_id
+        save_rescore_progress(status)
+
+def rescore_talent_pool(job_role_id: int, resume_ids: np.ndarray, similarities: np.ndarray, status: dict, after_resume_id: Optional[int]):
+    """
+    Writes the role's scores for every indexed resume to role_candidate_scores, in ResumeID order.
+    """
+    order = np.argsort(resume_ids, kind="stable")
+    if after_resume_id is not None:
+        order = order[resume_ids[order] > after_resume_id]
+    match_scores = similarities.mean(axis=1) * 100 if len(resume_ids) else np.zeros(0)
+    scored_at = datetime.now(timezone.utc).isoformat()
+
+    for start in range(0, len(order), RESCORE_WRITE_BATCH_SIZE):
+        chunk = order[start:start + RESCORE_WRITE_BATCH_SIZE]
+        records = [
+            {
+                "job_role_id": job_role_id,
+                "ResumeID": int(resume_ids[i]),
+                **{column: float(similarities[i, j]) for j, column in enumerate(RESCORE_COLUMNS)},
+                "match_score": float(match_scores[i]),
+                "model": EMBEDDING_MODEL_ID,
+                "scored_at": scored_at,
+            }
+            for i in chunk
+        ]
+        supabase.table("role_candidate_scores").upsert(records, on_conflict="job_role_id,ResumeID").execute()
+        status["processed"] += len(records)
+        status["written"] += len(records)
+        status["cursor"] = int(resume_ids[chunk[-1]])
+        save_rescore_progress(status)
+
+async def _run_rescore_job(job_row: dict, status: dict, job_vectors: dict):
+    try:
+        resume_ids, similarities = await run_io(compute_role_similarities, job_vectors)
+        status["indexed"] = len(resume_ids)
+        if status["scope"] == "applicants":
+            await run_io(rescore_role_applicants, job_row, resume_ids, similarities, status, status["resumed_after"])
+        else:
+            await run_io(rescore_talent_pool, job_row["id"], resume_ids, similarities, status, status["resumed_after"])
+        status["state"] = "done"
+    except Exception as e:
+        logger.exception("Error re-scoring job role %s", job_row["id"])
+        status["state"] = "failed"
+        status["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        status["finished_at"] = datetime.now(timezone.utc).isoformat()
+        try:
+            await run_io(save_rescore_progress, status)
+        except Exception:
+            logger.exception("Could not save the final state of the re-score of job role %s", job_row["id"])
+
+@app.post("/api/job_roles/{job_role_id}/rescore")
+async def start_rescore(
+    job_role_id: int,
+    scope: str = Query("applicants", pattern="^(applicants|pool)$"),
+    resume: bool = False,
+):
+    """
+    Starts re-scoring applicants against the role's current requirements in the background.
+    With resume=true a run that failed or was interrupted (also by a restart) continues after
+    its last written batch, as long as the role's description and the embedding model are unchanged.
+    Poll GET on the same path for progress.
+    """
+    previous = await run_io(load_rescore_job, job_role_id, scope)
+    if previous and rescore_job_is_live(previous):
+        return rescore_status.get((job_role_id, scope), previous)
+
+    response = await run_io(supabase.table("job_role").select("*").eq("id", job_role_id).execute)
+    if not response.data:
+        raise HTTPException(status_code=404, detail=f"Job role {job_role_id} not found.")
+    job_row = response.data[0]
+    try:
+        _, job_vectors = await get_job_requirements(job_row)
+    except ValueError as e:
+        logger.error("Error parsing model response: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to parse job description")
+    desc_hash = job_description_hash(job_row.get("job_role", ""), job_row.get("job_description", ""))
+
+    # Rows before the cursor were scored against the stored description and model, so only
+    # continue from it if both are still the same
+    resumable = (
+        resume and previous is not None and previous["state"] != "done" and previous.get("cursor") is not None
+        and previous.get("job_description_hash") == desc_hash and previous.get("model") == EMBEDDING_MODEL_ID
+    )
+    status = {
+        "job_role_id": job_role_id,
+        "scope": scope,
+        "state": "running",
+        "job_description_hash": desc_hash,
+        "model": EMBEDDING_MODEL_ID,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "finished_at": None,
+        "indexed": None,
+        "processed": previous["processed"] if resumable else 0,
+        "written": previous["written"] if resumable else 0,
+        "missing_embeddings": previous["missing_embeddings"] if resumable else 0,
+        "resumed_after": previous["cursor"] if resumable else None,
+        "cursor": previous["cursor"] if resumable else None,
+        "error": None,
+    }
+    await run_io(save_rescore_progress, status)
+    rescore_status[(job_role_id, scope)] = status
+    spawn_background_task(_run_rescore_job(job_row, status, job_vectors))
+    return status
+
+@app.get("/api/job_roles/{job_role_id}/rescore")
+async def get_rescore_status(job_role_id: int, scope: str = Query("applicants", pattern="^(applicants|pool)$")):
+    status = rescore_status.get((job_role_id, scope))
+    if status is not None and status["state"] == "running":
+        return status
+    job = await run_io(load_rescore_job, job_role_id, scope)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No {scope} re-score has been started for job role {job_role_id}.")
+    if job["state"] == "running" and not rescore_job_is_live(job):
+        job["state"] = "interrupted" # Resume it with POST ...?resume=true
+    return job
+
+
+# --- Resume PDF Download ---
+# PDFs are served from memory with an ETag and single-range HTTP Range support (see byte_ranges.py), so the
+# browser's PDF viewer can start rendering (and fetch ranges) before the whole file arrives.
+# Recently served PDFs are kept in a byte-bounded LRU so range requests don't re-download them.
+# Uploads and removals through this process evict the file's entry.
+
+PDF_CACHE_BYTES = int(os.getenv("PDF_CACHE_BYTES", str(64 * 1024 * 1024)))
+PDF_STREAM_CHUNK_SIZE = 64 * 1024
+_pdf_cache: LRUCache = LRUCache(maxsize=PDF_CACHE_BYTES, getsizeof=lambda entry: len(entry[0]))
+_pdf_cache_lock = threading.Lock()
+# Bumped by every eviction; a download that overlapped one may hold the old bytes and is not cached
+_pdf_cache_generation = 0
+
+def evict_cached_resume_pdf(resume_filename: str):
+    """
+    Drops a resume PDF from the local cache after it was replaced or removed in storage.
+    """
+    global _pdf_cache_generation
+    with _pdf_cache_lock:
+        _pdf_cache.pop(resume_filename, None)
+        _pdf_cache_generation += 1
+
+def fetch_resume_pdf(resume_filename: str) -> Tuple[bytes, str]:
+    """
+    Returns (PDF bytes, sha256) of a resume in storage, using the local PDF cache.
+    """
+    with _pdf_cache_lock:
+        cached = _pdf_cache.get(resume_filename)
+        generation = _pdf_cache_generation
+    if cached is not None:
+        return cached
+
+    file_bytes = supabase.storage.from_(BUCKET_NAME).download(resume_filename)
+    entry = (file_bytes, pdf_content_hash(file_bytes))
+    try:
+        invalidate_stale_resume_text(resume_filename.removesuffix(".pdf"), entry[1])
+    except Exception as e:
+        logger.warning("Could not verify stored text of %s: %s - %s", resume_filename, type(e).__name__, e)
+    if len(file_bytes) <= PDF_CACHE_BYTES:
+        with _pdf_cache_lock:
+            if generation == _pdf_cache_generation:
+                _pdf_cache[resume_filename] = entry
+    return entry
+
+def iter_byte_chunks(data: bytes, start: int, end: int):
+    view = memoryview(data)
+    for offset in range(start, end + 1, PDF_STREAM_CHUNK_SIZE):
+        yield bytes(view[offset:min(offset + PDF_STREAM_CHUNK_SIZE, end + 1)])
 
 @app.get("/get_resume_pdf")
-def download_pdf(resume_ID: int):
+async def download_pdf(resume_ID: int, request: Request):
     table_name = "job_applications"
     try:
         # .eq() stands for "equals"
-        response = supabase.table(table_name).select("ResumeID").eq("id", resume_ID).execute()
-        
-        if response.data:
-            resume_record = response.data[0]
-            resume_filename = str(resume_record["ResumeID"]) + ".pdf"
-            # Download the file from Supabase
-            file_bytes  = supabase.storage.from_(BUCKET_NAME).download(resume_filename)
-
-            # Save it using the original filename
-            with open(resume_filename, "wb") as f:
-                f.write(file_bytes)
+        response = await run_io(
+            supabase.table(table_name).select("ResumeID").eq("id", resume_ID).execute
+        )
 
-            # Return the file to the client
-            return FileResponse(path=resume_filename, filename=resume_filename, media_type='application/pdf')
-        else:
+        if not response.data:
             raise HTTPException(status_code=404, detail=f"Application with ResumeID {resume_ID} not found")
+
+        resume_filename = str(response.data[0]["ResumeID"]) + ".pdf"
+        file_bytes, content_hash = await run_io(fetch_resume_pdf, resume_filename)
     except HTTPException:
         raise # Re-raise HTTPException
     except Exception as e:
-        print(f"Error fetching application {resume_ID}: {e}")
+        logger.exception("Error fetching application %s", resume_ID)
         raise HTTPException(status_code=500, detail=str(e))
 
+    size = len(file_bytes)
+    etag = f'"{content_hash}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=3600",
+        "Content-Disposition": f'inline; filename="{resume_filename}"',
+    }
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return StreamingResponse(
+                iter_byte_chunks(file_bytes, start, end),
+                status_code=206,
+                media_type="application/pdf",
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)},
+            )
+        # Invalid or multi-range headers are ignored: the whole file is sent below
+
+    return StreamingResponse(
+        iter_byte_chunks(file_bytes, 0, size - 1),
+        media_type="application/pdf",
+        headers={**headers, "Content-Length": str(size)},
+    )
+
 
 class MatchScoreDistributionItem(BaseModel):
     range: str  # e.g., "0-20%", "81-100%"
@@ -867,156 +2375,111 @@ class DashboardDataResponse(BaseModel):
     applications_over_time: List[ApplicationsOverTimeItem] # This will be tricky without timestamps
     top_10_applicants: List[TopApplicantItem]
 
-# --- Education Classification Logic ---
+# --- Match Scores ---
+# Education categories are in education.py
 
-# Predefined keywords for education categories. More sophisticated NLP could be used.
-EDUCATION_CATEGORIES = {
-    "Computer Science": ["computer science", "informatics", "software engineering", "artificial intelligence", "data science", "information system"],
-    "Engineering": ["engineering", "electrical", "network", "telecommunications", "mechanical", "civil"], # Add more engineering fields
-    "Business": ["business", "management", "mba", "marketing", "finance", "accounting"],
-    "Mathematics & Statistics": ["mathematics", "statistics", "actuarial"],
-    # Add more categories as needed
-}
+def calculate_match_score(row: dict) -> float:
+    """
+    Match score of an application: average of the available similarities, scaled to 0-100.
+    """
+    sim_scores = [
+        row.get("Education_Similarity", 0),
+        row.get("Experience_Similarity", 0),
+        row.get("Skill_Similarity", 0),
+        row.get("Level_Similarity", 0)
+    ]
+    valid_sim_scores = [s for s in sim_scores if isinstance(s, (int, float)) and s is not None]
+    if not valid_sim_scores:
+        return 0.0
+    return (sum(valid_sim_scores) / len(valid_sim_scores)) * 100
+
+SIMILARITY_COLUMNS = ["Education_Similarity", "Experience_Similarity", "Skill_Similarity", "Level_Similarity"]
+
+def calculate_match_scores(applications_df: "pd.DataFrame") -> np.ndarray:
+    """
+    Columnar calculate_match_score: NaN-aware mean of the similarity columns, scaled to 0-100,
+    with 0 for applications that have no similarity at all.
+    """
+    import pandas as pd
+    sims = np.column_stack([
+        pd.to_numeric(applications_df[column], errors="coerce").to_numpy(dtype=np.float64)
+        if column in applications_df.columns else np.full(len(applications_df), np.nan)
+        for column in SIMILARITY_COLUMNS
+    ])
+    valid = ~np.isnan(sims)
+    counts = valid.sum(axis=1)
+    totals = np.where(valid, sims, 0.0).sum(axis=1)
+    return np.divide(totals, counts, out=np.zeros(len(sims)), where=counts > 0) * 100
+
+# Dashboard totals per job role, updated by send_job_application and ai_detection as rows are written
+dashboard_aggregates = DashboardAggregates(calculate_match_score, classify_education)
+
+def fetch_applications_version(job_role_id: int) -> int:
+    """
+    Current job_role.applications_version, bumped by a trigger on every write to the role's applications.
+    """
+    response = supabase.table("job_role").select("applications_version").eq("id", job_role_id).limit(1).execute()
+    return int((response.data[0].get("applications_version") or 0) if response.data else 0)
 
-def classify_education(education_text: str) -> str:
-    if not education_text or not isinstance(education_text, str):
-        return "Other / Not Specified"
-    
-    education_text_lower = education_text.lower()
-    for category, keywords in EDUCATION_CATEGORIES.items():
-        if any(keyword in education_text_lower for keyword in keywords):
-            return category
-    return "Other / Not Specified"
+def rebuild_dashboard_aggregate(job_role_id: int, force: bool = False) -> RoleDashboardAggregate:
+    """
+    Rebuilds a role's dashboard aggregate from the job_applications table. Rebuilds of a role
+    are serialized; unless force is set, a rebuild that finds the aggregate already current
+    (because another request just rebuilt it) is skipped.
+    """
+    with dashboard_aggregates.rebuild_lock(job_role_id):
+        # Read before the rows: writes that land during the fetch leave the aggregate behind this version
+        version = fetch_applications_version(job_role_id)
+        current = dashboard_aggregates.get(job_role_id)
+        if not force and current is not None and current.version == version:
+            return current
+
+        dashboard_aggregates.begin_rebuild(job_role_id)
+        try:
+            response = (
+                supabase.table("job_applications")
+                .select(", ".join(DASHBOARD_COLUMNS))
+                .eq("job_role_id", job_role_id)
+                .execute()
+            )
+            rows = response.data or []
+            aggregate = dashboard_aggregates.new_aggregate()
+            if rows:
+                import pandas as pd
+                # Match scores and education categories are computed columnar for the whole role
+                applications_df = pd.DataFrame(rows, columns=list(DASHBOARD_COLUMNS))
+                aggregate.load(
+                    rows,
+                    applications_df,
+                    calculate_match_scores(applications_df),
+                    classify_education_series(applications_df["Education"]),
+                )
+        except Exception:
+            dashboard_aggregates.cancel_rebuild(job_role_id)
+            raise
+        dashboard_aggregates.finish_rebuild(job_role_id, aggregate, version)
+        return aggregate
 
 # --- New Dashboard Endpoint ---
 
 @app.get("/api/dashboard_data/{job_role_id}", response_model=DashboardDataResponse)
-async def get_dashboard_data(job_role_id: int):
+async def get_dashboard_data(job_role_id: int, rebuild: bool = False):
+    """
+    Dashboard statistics for a job role, served from its incrementally maintained aggregate.
+    The aggregate is rebuilt from the database on first use, when the role's applications were
+    written by another worker or directly in the database (applications_version changed), or
+    when rebuild=true.
+    """
     try:
-        # Fetch relevant job applications for the given job_role_id
-        # Using your existing logic but ensuring it's efficient
-        response = await run_in_threadpool(
-            supabase.table("job_applications")
-            .select("id, Name, Education, Education_Similarity, Experience_Similarity, Skill_Similarity, Level_Similarity, spam_probability, created_at") # Select only needed fields + created_at
-            .eq("job_role_id", job_role_id)
-            .execute
-        )
-
-        if not response.data:
-            # Return empty/default dashboard data if no applications
-            return DashboardDataResponse(
-                total_applicants=0,
-                average_match_score=0.0,
-                potential_spam_count=0,
-                match_score_distribution=[],
-                education_breakdown=[],
-                applications_over_time=[],
-                top_10_applicants=[]
-            )
-
-        applications_df = pd.DataFrame(response.data)
-
-        # --- Calculate Basic Stats ---
-        total_applicants = len(applications_df)
-        
-        # Calculate individual match scores (average of similarities, scaled to 0-100)
-        def calculate_match_score(row):
-            sim_scores = [
-                row.get("Education_Similarity", 0), 
-                row.get("Experience_Similarity", 0),
-                row.get("Skill_Similarity", 0),
-                row.get("Level_Similarity", 0)
-            ]
-            valid_sim_scores = [s for s in sim_scores if isinstance(s, (int, float)) and s is not None]
-            if not valid_sim_scores:
-                return 0.0
-            return (sum(valid_sim_scores) / len(valid_sim_scores)) * 100
-        
-        applications_df["match_score"] = applications_df.apply(calculate_match_score, axis=1)
-        
-        average_match_score = applications_df["match_score"].mean() if total_applicants > 0 else 0.0
-        
-        # Convert spam_probability (0-1) to spam_score (0-100)
-        applications_df["spam_score"] = applications_df["spam_probability"].fillna(0).apply(lambda x: x * 100)
-        potential_spam_count = int(applications_df[applications_df["spam_score"] > 70].shape[0])
-
-
-        # --- 1. Match Score Distribution ---
-        bins = [0, 20, 40, 60, 80, 101]  # Bins up to 101 to include 100
-        labels = ["0-20%", "21-40%", "41-60%", "61-80%", "81-100%"]
-        applications_df["match_score_range"] = pd.cut(applications_df["match_score"], bins=bins, labels=labels, right=False) # right=False means [0, 20), [20, 40) ...
-        
-        distribution_counts = applications_df["match_score_range"].value_counts().sort_index()
-        match_score_distribution_data = [
-            MatchScoreDistributionItem(range=str(idx), count=int(val)) for idx, val in distribution_counts.items()
-        ]
-        # Ensure all labels are present, even if count is 0
-        all_ranges_distribution = []
-        for label in labels:
-            item = next((d for d in match_score_distribution_data if d.range == label), None)
-            if item:
-                all_ranges_distribution.append(item)
-            else:
-                all_ranges_distribution.append(MatchScoreDistributionItem(range=label, count=0))
-        match_score_distribution_data = all_ranges_distribution
-
-
-        # --- 2. Education Breakdown ---
-        applications_df["education_category"] = applications_df["Education"].apply(classify_education)
-        education_counts = applications_df["education_category"].value_counts()
-        education_breakdown_data = [
-            EducationBreakdownItem(category=str(idx), count=int(val)) for idx, val in education_counts.items()
-        ]
-
-        # --- 3. Number of Applications Over Time ---
-        # IMPORTANT: This requires a 'created_at' (or similar timestamp) column in your 'job_applications' table.
-        # If you don't have it, this part will not work accurately.
-        applications_over_time_data: List[ApplicationsOverTimeItem] = []
-        if "created_at" in applications_df.columns and not applications_df["created_at"].isnull().all():
-            try:
-                applications_df["created_at_dt"] = pd.to_datetime(applications_df["created_at"])
-                # Example: Group by day for the last 30 days
-                # You might want more sophisticated grouping (week, month) or date range
-                time_counts = applications_df.groupby(applications_df["created_at_dt"].dt.date)['id'].count()
-                
-                # If you want to ensure a continuous range of dates even with 0 applications:
-                # date_range = pd.date_range(end=datetime.now().date(), periods=30, freq='D').date
-                # time_counts = time_counts.reindex(date_range, fill_value=0)
-
-                applications_over_time_data = [
-                    ApplicationsOverTimeItem(date=str(date_val), count=int(count_val))
-                    for date_val, count_val in time_counts.items()
-                ]
-                applications_over_time_data.sort(key=lambda x: x.date) # Ensure chronological order
-            except Exception as e_time:
-                print(f"Error processing 'created_at' for applications over time: {e_time}")
-                # Fallback to empty or error indicator if processing fails
-        else:
-            print("Warning: 'created_at' column missing or all null. Cannot generate applications over time data.")
-
-
-        # --- 4. Top 10 Applicants (by Match Score) ---
-        top_10_df = applications_df.sort_values(by="match_score", ascending=False).head(10)
-        top_10_applicants_data = [
-            TopApplicantItem(
-                id=int(row["id"]), 
-                name=str(row["Name"]), 
-                match_score=float(row["match_score"])
-            ) for _, row in top_10_df.iterrows()
-        ]
-
-        return DashboardDataResponse(
-            total_applicants=total_applicants,
-            average_match_score=round(average_match_score, 2),
-            potential_spam_count=potential_spam_count,
-            match_score_distribution=match_score_distribution_data,
-            education_breakdown=education_breakdown_data,
-            applications_over_time=applications_over_time_data,
-            top_10_applicants=top_10_applicants_data,
-        )
+        snapshot = None
+        if not rebuild:
+            version = await run_io(fetch_applications_version, job_role_id)
+            snapshot = dashboard_aggregates.snapshot(job_role_id, version)
+        if snapshot is None:
+            await run_io(rebuild_dashboard_aggregate, job_role_id, rebuild)
+            snapshot = dashboard_aggregates.snapshot(job_role_id)
+        return DashboardDataResponse(**snapshot)
 
     except Exception as e:
-        import traceback
-        print(f"Error generating dashboard data for job_role_id {job_role_id}: {type(e).__name__} - {e}")
-        print(traceback.format_exc())
+        logger.exception("Error generating dashboard data for job_role_id %s", job_role_id)
         raise HTTPException(status_code=500, detail=f"Failed to generate dashboard data: {str(e)}")
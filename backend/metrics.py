@@ -0,0 +1,165 @@
+"""
+Minimal Prometheus instrumentation: counters and histograms with labels, rendered in the
+Prometheus text exposition format for GET /metrics.
+
+Metrics are registered once at import time in the module that records them, through
+counter() / histogram() below. Values that already live elsewhere (cache hit counters, pool
+sizes) are exported with collectors that are read at scrape time instead of being copied.
+Metrics are per process, like the rest of the in-memory state.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; from a cached lookup up to a slow LLM call
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with cumulative counts, in the same shape as a Prometheus histogram.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1) # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, running = [], 0
+            for bound, count in zip(list(self.buckets) + ["+Inf"], self._counts):
+                running += count
+                cumulative.append({"le": bound, "count": running})
+            return {
+                "buckets": cumulative,
+                "count": self.count,
+                "sum": self.sum,
+                "mean": (self.sum / self.count) if self.count else 0.0,
+            }
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class MetricFamily:
+    """
+    A named metric with a fixed set of label names; labels(...) returns the child for one label set.
+    """
+
+    def __init__(self, name: str, documentation: str, metric_type: str, label_names: Sequence[str], factory: Callable):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.label_names = tuple(label_names)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            labels = dict(zip(self.label_names, key))
+            if isinstance(child, Histogram):
+                snapshot = child.snapshot()
+                for bucket in snapshot["buckets"]:
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bucket['le']})} {bucket['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {snapshot['count']}")
+            else:
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(child.value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        # name -> (help, type, fn returning [(labels, value)]) read at scrape time
+        self._collectors: Dict[str, Tuple[str, str, Callable[[], Iterable[Tuple[Dict[str, str], float]]]]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, family: MetricFamily) -> MetricFamily:
+        with self._lock:
+            return self._families.setdefault(family.name, family)
+
+    def register_collector(self, name: str, documentation: str, metric_type: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]]):
+        with self._lock:
+            self._collectors[name] = (documentation, metric_type, collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in list(self._families.values()):
+            lines.extend(family.render())
+        for name, (documentation, metric_type, collect) in list(self._collectors.items()):
+            try:
+                samples = list(collect())
+            except Exception:
+                continue # A failing collector must not break the scrape
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name: str, documentation: str, label_names: Sequence[str] = ()) -> MetricFamily:
+    return REGISTRY.register(MetricFamily(name, documentation, "counter", label_names, Counter))
+
+
+def histogram(name: str, documentation: str, label_names: Sequence[str] = (), buckets: Optional[Sequence[float]] = None) -> MetricFamily:
+    buckets = tuple(buckets or DEFAULT_LATENCY_BUCKETS)
+    return REGISTRY.register(MetricFamily(name, documentation, "histogram", label_names, lambda: Histogram(buckets)))
@@ -0,0 +1,78 @@
+"""
+Minimal asyncio pipeline.
+
+Items flow through a list of stages. Every stage has its own pool of workers and an input
+queue, so different items can be in different stages at the same time and throughput is
+bounded by the slowest stage rather than the sum of all stages.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+# on_event(item, stage name, status, error message or None); status is "started", "done" or "failed"
+PipelineEventCallback = Callable[[Any, str, str, Optional[str]], None]
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[Any], Awaitable[None]] # mutates the item in place
+    concurrency: int = 1
+
+
+async def run_pipeline(items: Iterable[Any], stages: List[Stage], on_event: Optional[PipelineEventCallback] = None) -> List[Any]:
+    """
+    Runs every item through the stages in order and returns the items that completed all of them.
+    An item whose stage raises is reported as failed and not passed to later stages.
+    """
+    def emit(item, stage: Stage, status: str, error: Optional[str] = None):
+        if on_event is not None:
+            on_event(item, stage.name, status, error)
+
+    queues: List[asyncio.Queue] = [asyncio.Queue() for _ in stages]
+    completed: List[Any] = []
+
+    async def worker(index: int):
+        stage = stages[index]
+        while True:
+            item = await queues[index].get()
+            if item is None:
+                return
+            emit(item, stage, "started")
+            try:
+                await stage.fn(item)
+            except Exception as e:
+                emit(item, stage, "failed", f"{type(e).__name__}: {e}")
+                continue
+            emit(item, stage, "done")
+            if index + 1 < len(stages):
+                queues[index + 1].put_nowait(item)
+            else:
+                completed.append(item)
+
+    async def run_stage(index: int):
+        await asyncio.gather(*(worker(index) for _ in range(max(1, stages[index].concurrency))))
+        # Every item has left this stage; tell the next stage's workers to stop once drained
+        if index + 1 < len(stages):
+            for _ in range(max(1, stages[index + 1].concurrency)):
+                queues[index + 1].put_nowait(None)
+
+    for item in items:
+        queues[0].put_nowait(item)
+    for _ in range(max(1, stages[0].concurrency)):
+        queues[0].put_nowait(None)
+
+    await asyncio.gather(*(run_stage(i) for i in range(len(stages))))
+    return completed
+
+
+async def timed(name: str, awaitable: Awaitable[Any], timings: Dict[str, float]) -> Any:
+    """
+    Awaits one step and records its wall time in milliseconds as timings[name], even if it raises.
+    """
+    started_at = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[name] = round((time.perf_counter() - started_at) * 1000, 1)
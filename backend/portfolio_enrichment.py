@@ -0,0 +1,121 @@
+"""
+Async portfolio enrichment with a TTL cache, single-flight scraping and a hard timeout.
+
+Scraping a portfolio site takes seconds and the result rarely changes, so results are cached
+per normalized Portfolio_link for a TTL. Concurrent requests for the same link share one
+scrape instead of starting their own. A caller never waits longer than the timeout; the scrape
+itself keeps running in the background and fills the cache for the next question.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from cachetools import TTLCache
+
+
+def normalize_portfolio_link(link: Optional[str]) -> Optional[str]:
+    """
+    Cache key for a link, or None if the value is not a usable link (e.g. "Not Specified").
+    """
+    if not link:
+        return None
+    link = str(link).strip()
+    if " " in link or "." not in link:
+        return None
+    if not link.lower().startswith(("http://", "https://")):
+        link = "https://" + link
+    return link.rstrip("/").lower()
+
+
+class PortfolioEnricher:
+    def __init__(
+        self,
+        scrape: Callable[[str], Awaitable[str]],
+        ttl_seconds: float = 24 * 3600,
+        error_ttl_seconds: float = 300,
+        timeout_seconds: float = 30,
+        max_entries: int = 1024,
+    ):
+        self.scrape = scrape
+        self.timeout_seconds = timeout_seconds
+        self._results: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        # Failures are remembered briefly so a broken site is not re-scraped on every question
+        self._errors: TTLCache = TTLCache(maxsize=max_entries, ttl=error_ttl_seconds)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.scrape_seconds = 0.0
+
+    async def _scrape(self, key: str, link: str) -> str:
+        started_at = time.monotonic()
+        try:
+            result = await self.scrape(link)
+        except Exception as e:
+            self.failures += 1
+            self._errors[key] = e
+            raise
+        finally:
+            self.scrape_seconds += time.monotonic() - started_at
+            self._inflight.pop(key, None)
+        self._results[key] = result
+        return result
+
+    def _start(self, link: str) -> Optional[asyncio.Task]:
+        """
+        Returns the in-flight scrape for the link, starting one if needed.
+        None means the link is unusable or its result/failure is already cached.
+        """
+        key = normalize_portfolio_link(link)
+        if key is None or key in self._results or key in self._errors:
+            return None
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._scrape(key, str(link).strip()))
+            # Retrieve the exception so an unawaited prefetch failure is not reported as unhandled
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return task
+
+    async def get(self, link: str) -> str:
+        """
+        Scraped portfolio data for the link. Raises ValueError for unusable links,
+        asyncio.TimeoutError after the timeout, and the scraper's error if it failed.
+        """
+        key = normalize_portfolio_link(link)
+        if key is None:
+            raise ValueError(f"Not a portfolio link: {link!r}")
+        if key in self._results:
+            self.hits += 1
+            return self._results[key]
+        if key in self._errors:
+            self.hits += 1
+            raise self._errors[key]
+
+        self.misses += 1
+        task = self._start(link)
+        try:
+            # shield: a caller timing out must not cancel the scrape other callers share
+            return await asyncio.wait_for(asyncio.shield(task), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def prefetch(self, link: str) -> bool:
+        """
+        Starts scraping the link in the background if it is not cached. Returns True if a scrape was started or joined.
+        """
+        return self._start(link) is not None
+
+    def stats(self) -> dict:
+        return {
+            "cached": len(self._results),
+            "cached_errors": len(self._errors),
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "scrape_seconds": round(self.scrape_seconds, 3),
+        }
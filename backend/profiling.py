@@ -0,0 +1,172 @@
+"""
+Opt-in per-request profiling.
+
+ProfilingMiddleware profiles a single request when it carries an `X-Profile` header or a
+`profile` query parameter, and writes the profile to a local directory. The file name is
+returned in the `X-Profile-File` response header. Two profilers are available:
+
+- cprofile: deterministic cProfile of the event loop thread, saved as .pstats
+  (open with snakeviz, or `flameprof` / `gprof2dot` for a flamegraph).
+- sample: a background thread samples the stacks of all threads, including the I/O pool,
+  every few milliseconds and saves them as collapsed stacks (.folded) for flamegraph.pl
+  or speedscope.
+
+The header or parameter value picks the profiler ("cprofile" or "sample"); any other truthy
+value uses the default. Profiles cover the whole response, streamed bodies included. Work in
+the CPU process pool (pdfminer, embedding passes) runs in other processes and shows up as
+waiting on the pool. Other requests served at the same time appear in the profile too, and
+only one request is profiled at a time.
+
+The middleware is only installed when profiling is enabled in config, so it costs nothing otherwise.
+"""
+import asyncio
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sample")
+_FALSE_VALUES = {"", "0", "false", "no", "off"}
+
+
+class DeterministicProfile:
+    suffix = ".pstats"
+
+    def __init__(self):
+        self._profiler = cProfile.Profile()
+
+    def start(self):
+        self._profiler.enable()
+
+    def stop(self):
+        self._profiler.disable()
+
+    def save(self, path: str):
+        self._profiler.dump_stats(path)
+
+
+class SamplingProfile:
+    """
+    Samples the Python stacks of every thread at a fixed interval and counts identical stacks.
+    """
+
+    suffix = ".folded"
+
+    def __init__(self, interval_seconds: float = 0.005):
+        self.interval_seconds = interval_seconds
+        self._samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval_seconds):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                self._samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self._samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware; see the module docstring. Requests without the flag are passed straight through.
+    """
+
+    def __init__(self, app, output_dir: str = "profiles", default_mode: str = "cprofile", sample_interval_ms: float = 5.0):
+        if default_mode not in PROFILE_MODES:
+            raise ValueError(f"default_mode must be one of {PROFILE_MODES}, got '{default_mode}'")
+        self.app = app
+        self.output_dir = output_dir
+        self.default_mode = default_mode
+        self.sample_interval_seconds = sample_interval_ms / 1000
+        self._busy = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def requested_mode(self, scope) -> Optional[str]:
+        """
+        Profiler asked for by the request, or None if it did not ask to be profiled.
+        """
+        value = None
+        for name, header_value in scope.get("headers", []):
+            if name == b"x-profile":
+                value = header_value.decode("latin-1")
+                break
+        if value is None:
+            values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile")
+            value = values[0] if values else None
+        if value is None or value.strip().lower() in _FALSE_VALUES:
+            return None
+        value = value.strip().lower()
+        return value if value in PROFILE_MODES else self.default_mode
+
+    def _file_name(self, scope, suffix: str) -> str:
+        route = re.sub(r"[^A-Za-z0-9]+", "_", scope.get("path", "")).strip("_") or "root"
+        return f"{time.strftime('%Y%m%dT%H%M%S')}-{scope.get('method', 'GET')}-{route[:60]}-{uuid.uuid4().hex[:8]}{suffix}"
+
+    async def __call__(self, scope, receive, send):
+        mode = self.requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            # cProfile cannot run twice at once, and overlapping profiles would mix up the requests anyway
+            await self.app(scope, receive, self._with_header(send, b"x-profile-skipped", b"another request is being profiled"))
+            return
+
+        profile = DeterministicProfile() if mode == "cprofile" else SamplingProfile(self.sample_interval_seconds)
+        file_name = self._file_name(scope, profile.suffix)
+        started_at = time.perf_counter()
+        try:
+            profile.start()
+            try:
+                await self.app(scope, receive, self._with_header(send, b"x-profile-file", file_name.encode("latin-1")))
+            finally:
+                profile.stop()
+            elapsed = time.perf_counter() - started_at
+            path = os.path.join(self.output_dir, file_name)
+            try:
+                await asyncio.to_thread(profile.save, path)
+                logger.info(
+                    "Saved %s profile of %s %s (%.1f ms) to %s", mode, scope.get("method"), scope.get("path"), elapsed * 1000, path,
+                    extra={"profile_file": file_name, "profile_mode": mode, "duration_ms": round(elapsed * 1000, 1)},
+                )
+            except Exception:
+                logger.exception("Could not save profile %s", path)
+        finally:
+            self._busy.release()
+
+    @staticmethod
+    def _with_header(send, name: bytes, value: bytes):
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (name, value)]}
+            await send(message)
+        return send_with_header
@@ -0,0 +1,162 @@
+-- Schema additions the backend expects on top of the base job_role / job_applications tables.
+-- Run these in the Supabase SQL editor; every statement is safe to re-run.
+
+-- Parsed job requirements and their embeddings, cached against each role.
+-- Recomputed by get_job_requirements() when job_description_hash no longer matches.
+alter table job_role add column if not exists job_description_hash text;
+alter table job_role add column if not exists parsed_job_desc jsonb;
+alter table job_role add column if not exists requirement_embeddings jsonb;
+
+-- Extracted resume text, written at ingest and read by /api/chat (see load_resume_text()).
+create table if not exists resume_texts (
+    "ResumeID" bigint primary key,
+    pdf_sha256 text not null,
+    full_text text not null,
+    updated_at timestamptz not null default now()
+);
+
+-- ResumeID allocation (see allocate_resume_id()). The sequence starts after the current maximum
+-- (and never moves backwards when this is re-run), and the unique index guarantees two
+-- applications can never share a ResumeID.
+create sequence if not exists resume_id_seq minvalue 0 start 0;
+select setval('resume_id_seq', greatest(
+    coalesce((select max("ResumeID") from job_applications), -1) + 1,
+    (select case when is_called then last_value + 1 else last_value end from resume_id_seq)
+), false);
+
+-- The old max()+1 allocator could give concurrent uploads the same ResumeID, which would make
+-- the unique index fail. To list them first:
+--   select "ResumeID", array_agg(id order by id) from job_applications group by "ResumeID" having count(*) > 1;
+-- Every duplicate except the earliest application gets a new ResumeID from the sequence.
+-- Those uploads shared one <ResumeID>.pdf (the last upload overwrote it), so the moved
+-- applications are recorded in resume_id_reassignments to re-upload their PDFs under the new ID.
+create table if not exists resume_id_reassignments (
+    application_id bigint primary key,
+    old_resume_id bigint not null,
+    new_resume_id bigint not null,
+    reassigned_at timestamptz not null default now()
+);
+with duplicates as (
+    select id, "ResumeID", row_number() over (partition by "ResumeID" order by id) as copy_number
+    from job_applications
+    where "ResumeID" is not null
+), moved as (
+    update job_applications a
+    set "ResumeID" = nextval('resume_id_seq')
+    from duplicates d
+    where a.id = d.id and d.copy_number > 1
+    returning a.id, d."ResumeID" as old_resume_id, a."ResumeID" as new_resume_id
+)
+insert into resume_id_reassignments (application_id, old_resume_id, new_resume_id)
+select id, old_resume_id, new_resume_id from moved;
+
+create unique index if not exists job_applications_resume_id_key on job_applications ("ResumeID");
+
+create or replace function next_resume_id() returns bigint
+language sql volatile as $$
+    select nextval('resume_id_seq');
+$$;
+
+-- Composite match score (average of the available similarities, 0-100) so listings can be
+-- sorted and paginated by it in the database, plus indexes for the keyset pagination.
+alter table job_applications add column if not exists match_score double precision
+    generated always as (
+        coalesce(
+            (coalesce("Education_Similarity", 0) + coalesce("Experience_Similarity", 0)
+             + coalesce("Skill_Similarity", 0) + coalesce("Level_Similarity", 0))
+            / nullif(("Education_Similarity" is not null)::int + ("Experience_Similarity" is not null)::int
+                     + ("Skill_Similarity" is not null)::int + ("Level_Similarity" is not null)::int, 0)
+            * 100,
+            0
+        )
+    ) stored;
+create index if not exists job_applications_role_id_idx on job_applications (job_role_id, id);
+create index if not exists job_applications_role_match_score_idx on job_applications (job_role_id, match_score desc, id desc);
+
+-- Per-field resume embeddings (Skills/Experience/Education/Level), written at ingest and loaded
+-- into the in-memory candidate index for /api/candidate_search (see store_resume_embeddings()).
+create table if not exists resume_embeddings (
+    "ResumeID" bigint primary key,
+    application_id bigint,
+    job_role_id bigint,
+    model text not null,
+    vectors jsonb not null,
+    updated_at timestamptz not null default now()
+);
+create index if not exists resume_embeddings_model_idx on resume_embeddings (model, "ResumeID");
+
+-- Scores of the whole talent pool against a role, written by the batch re-score job with
+-- scope=pool (see rescore_talent_pool()). match_score is on the same 0-100 scale as job_applications.
+create table if not exists role_candidate_scores (
+    job_role_id bigint not null,
+    "ResumeID" bigint not null,
+    "Education_Similarity" double precision,
+    "Experience_Similarity" double precision,
+    "Skill_Similarity" double precision,
+    "Level_Similarity" double precision,
+    match_score double precision,
+    model text not null,
+    scored_at timestamptz not null default now(),
+    primary key (job_role_id, "ResumeID")
+);
+create index if not exists role_candidate_scores_rank_idx on role_candidate_scores (job_role_id, match_score desc);
+
+-- Progress of batch re-score jobs, one row per role and scope, saved after every written batch
+-- (see save_rescore_progress()). state is running, done or failed; cursor is the last written
+-- job_applications.id (scope=applicants) or ResumeID (scope=pool), so an interrupted run can resume.
+create table if not exists rescore_jobs (
+    job_role_id bigint not null,
+    scope text not null,
+    state text not null,
+    job_description_hash text,
+    model text,
+    started_at timestamptz,
+    finished_at timestamptz,
+    indexed integer,
+    processed integer not null default 0,
+    written integer not null default 0,
+    missing_embeddings integer not null default 0,
+    resumed_after bigint,
+    cursor bigint,
+    error text,
+    updated_at timestamptz not null default now(),
+    primary key (job_role_id, scope)
+);
+
+-- Dashboard aggregate versioning (see dashboard_aggregates.py). Every statement that inserts,
+-- updates or deletes a role's applications bumps that role's applications_version once, so a
+-- worker can tell whether its in-memory aggregate missed writes made elsewhere.
+-- (Moving an application to another role only bumps the new role.)
+alter table job_role add column if not exists applications_version bigint not null default 0;
+
+create or replace function bump_applications_version() returns trigger
+language plpgsql as $$
+begin
+    update job_role set applications_version = applications_version + 1
+    where id in (select distinct job_role_id from changed_rows);
+    return null;
+end;
+$$;
+
+drop trigger if exists job_applications_version_insert on job_applications;
+create trigger job_applications_version_insert after insert on job_applications
+    referencing new table as changed_rows for each statement execute function bump_applications_version();
+drop trigger if exists job_applications_version_update on job_applications;
+create trigger job_applications_version_update after update on job_applications
+    referencing new table as changed_rows for each statement execute function bump_applications_version();
+drop trigger if exists job_applications_version_delete on job_applications;
+create trigger job_applications_version_delete after delete on job_applications
+    referencing old table as changed_rows for each statement execute function bump_applications_version();
+
+-- Writes a batch of AI detection scores (see write_ai_detection_results()) in one UPDATE, so the
+-- batch bumps applications_version once per role. Applications deleted while they were being
+-- scored are skipped instead of re-inserted as partial rows. Returns the ids that were updated.
+create or replace function set_ai_detection_scores(ids bigint[], scores double precision[])
+returns table (id bigint)
+language sql volatile as $$
+    update job_applications a
+    set is_analyzed = true, ai_generated_score = u.score
+    from unnest(ids, scores) as u(id, score)
+    where a.id = u.id
+    returning a.id;
+$$;
@@ -0,0 +1,37 @@
+import pytest
+
+from byte_ranges import RangeNotSatisfiable, parse_byte_range
+
+SIZE = 1000
+
+
+def test_single_ranges():
+    assert parse_byte_range("bytes=0-0", SIZE) == (0, 0)
+    assert parse_byte_range("bytes=100-199", SIZE) == (100, 199)
+    assert parse_byte_range("bytes=900-", SIZE) == (900, 999)
+    assert parse_byte_range("bytes=900-5000", SIZE) == (900, 999) # clamped to the end
+    assert parse_byte_range("bytes=-100", SIZE) == (900, 999)
+    assert parse_byte_range("bytes=-5000", SIZE) == (0, 999)
+    assert parse_byte_range(" Bytes = 10-20 ", SIZE) == (10, 20)
+    assert parse_byte_range("bytes=10-20,", SIZE) == (10, 20) # empty list elements are allowed
+
+
+def test_headers_that_are_ignored():
+    for header in [
+        "bytes=0-99,200-299", # multi-range would need multipart/byteranges
+        "bytes=0-99, -10",
+        "items=0-9",
+        "bytes 0-99",
+        "bytes=",
+        "bytes=-",
+        "bytes=abc-def",
+        "bytes=1-2-3",
+        "bytes=200-100", # last-pos before first-pos is invalid, not unsatisfiable
+    ]:
+        assert parse_byte_range(header, SIZE) is None, header
+
+
+def test_unsatisfiable_ranges():
+    for header, size in [("bytes=1000-", SIZE), ("bytes=1000-2000", SIZE), ("bytes=-0", SIZE), ("bytes=0-", 0), ("bytes=-10", 0)]:
+        with pytest.raises(RangeNotSatisfiable):
+            parse_byte_range(header, size)
@@ -0,0 +1,41 @@
+import base64
+import json
+
+import pytest
+
+from cursors import InvalidCursor, decode_application_cursor, encode_application_cursor
+
+
+def encode_raw(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+
+def test_round_trip():
+    row = {"id": 42, "match_score": 87.5, "Name": "Ada"}
+    assert decode_application_cursor(encode_application_cursor(row, "id"), "id") == {"id": 42}
+    assert decode_application_cursor(encode_application_cursor(row, "match_score"), "match_score") == {"id": 42, "match_score": 87.5}
+    # Rows without a score sort as 0
+    assert decode_application_cursor(encode_application_cursor({"id": 7, "match_score": None}, "match_score"), "match_score") == {"id": 7, "match_score": 0.0}
+
+
+def test_tampered_cursors_are_rejected():
+    valid = encode_application_cursor({"id": 42, "match_score": 87.5}, "match_score")
+    for after, sort in [
+        ("", "id"),
+        ("not base64!", "id"),
+        (valid[:-4], "match_score"), # truncated
+        (base64.urlsafe_b64encode(b"{not json").decode("ascii"), "id"),
+        (encode_raw([42]), "id"),
+        (encode_raw({}), "id"),
+        (encode_raw({"id": "42; drop table"}), "id"),
+        (encode_raw({"id": 42.5}), "id"),
+        (encode_raw({"id": True}), "id"),
+        (encode_application_cursor({"id": 42}, "id"), "match_score"), # cursor of the other sort
+        (encode_raw({"id": 42, "match_score": "87.5"}), "match_score"),
+        (encode_raw({"id": 42, "match_score": None}), "match_score"),
+        ('eyJpZCI6IDQyLCAibWF0Y2hfc2NvcmUiOiBOYU59', "match_score"), # {"id": 42, "match_score": NaN}
+        (encode_raw({"id": 42, "match_score": 1e400}), "match_score"), # inf
+        ("ünïcode", "id"),
+    ]:
+        with pytest.raises(InvalidCursor):
+            decode_application_cursor(after, sort)
@@ -0,0 +1,147 @@
+import random
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from dashboard_aggregates import (
+    DASHBOARD_COLUMNS, MATCH_SCORE_BINS, MATCH_SCORE_LABELS, SPAM_SCORE_THRESHOLD, TOP_APPLICANTS,
+    DashboardAggregates, RoleDashboardAggregate,
+)
+from education import classify_education
+
+SIMILARITIES = ["Education_Similarity", "Experience_Similarity", "Skill_Similarity", "Level_Similarity"]
+EDUCATION = ["BSc Computer Science", "MBA", "Civil Engineering", "History", None]
+
+
+def match_score(row: dict) -> float:
+    values = [row[name] for name in SIMILARITIES if row.get(name) is not None]
+    return sum(values) / len(values) * 100 if values else 0.0
+
+
+def make_row(row_id: int, rng: random.Random) -> dict:
+    row = {
+        "id": row_id,
+        "job_role_id": 1,
+        "Name": f"Applicant {row_id}",
+        "Education": rng.choice(EDUCATION),
+        "spam_probability": rng.choice([None, 0.1, 0.69, 0.71, 0.95]),
+        "created_at": rng.choice([None, "2024-05-01T10:00:00+00:00", "2024-05-02T09:30:00+00:00", "2024-05-03T23:59:59+00:00"]),
+    }
+    for name in SIMILARITIES:
+        row[name] = rng.choice([None, round(rng.random(), 3)])
+    return row
+
+
+def full_recompute(rows: list) -> dict:
+    """
+    The dashboard computed from scratch, independently of the aggregate classes.
+    """
+    scores = {row["id"]: match_score(row) for row in rows}
+    buckets = [0] * len(MATCH_SCORE_LABELS)
+    for score in scores.values():
+        for i in range(len(MATCH_SCORE_LABELS)):
+            if MATCH_SCORE_BINS[i] <= score < MATCH_SCORE_BINS[i + 1]:
+                buckets[i] += 1
+    education = Counter(classify_education(row["Education"]) for row in rows)
+    days = Counter(row["created_at"][:10] for row in rows if row["created_at"])
+    top = sorted(((score, row_id) for row_id, score in scores.items()), reverse=True)[:TOP_APPLICANTS]
+    return {
+        "total_applicants": len(rows),
+        "average_match_score": round(sum(scores.values()) / len(rows), 2),
+        "potential_spam_count": sum((row["spam_probability"] or 0) * 100 > SPAM_SCORE_THRESHOLD for row in rows),
+        "match_score_distribution": [{"range": label, "count": count} for label, count in zip(MATCH_SCORE_LABELS, buckets)],
+        "education_breakdown": dict(education),
+        "applications_over_time": [{"date": day, "count": count} for day, count in sorted(days.items())],
+        "top_10_applicants": [{"id": row_id, "name": f"Applicant {row_id}", "match_score": score} for score, row_id in top],
+    }
+
+
+def comparable(snapshot: dict) -> dict:
+    # most_common() order between equal counts is arbitrary
+    breakdown = {item["category"]: item["count"] for item in snapshot["education_breakdown"]}
+    return {**snapshot, "education_breakdown": breakdown}
+
+
+def loaded_aggregate(rows: list) -> RoleDashboardAggregate:
+    aggregate = RoleDashboardAggregate(match_score, classify_education)
+    applications_df = pd.DataFrame(rows)
+    aggregate.load(
+        [{column: row.get(column) for column in DASHBOARD_COLUMNS} for row in rows],
+        applications_df,
+        np.array([match_score(row) for row in rows]),
+        np.array([classify_education(value) for value in applications_df["Education"]], dtype=object),
+    )
+    return aggregate
+
+
+def test_add_update_snapshot_match_full_recompute():
+    rng = random.Random(7)
+    rows = {row_id: make_row(row_id, rng) for row_id in range(1, 61)}
+    aggregate = RoleDashboardAggregate(match_score, classify_education)
+    for row in rows.values():
+        aggregate.add(row)
+    assert comparable(aggregate.snapshot()) == full_recompute(list(rows.values()))
+
+    # Updates move applications between buckets, categories and days, in and out of the top 10
+    top_ids = [item["id"] for item in aggregate.snapshot()["top_10_applicants"]]
+    for row_id in top_ids[:3] + rng.sample(sorted(rows), 20):
+        changes = {name: rng.choice([None, round(rng.random(), 3)]) for name in SIMILARITIES}
+        changes.update({"Education": rng.choice(EDUCATION), "spam_probability": rng.choice([None, 0.9]), "is_analyzed": True})
+        rows[row_id] = {**rows[row_id], **changes}
+        aggregate.update(row_id, changes)
+        assert comparable(aggregate.snapshot()) == full_recompute(list(rows.values()))
+
+    # Adding an id that is already counted updates it
+    rows[5] = {**rows[5], "Education_Similarity": 1.0, "Experience_Similarity": 1.0}
+    aggregate.add(rows[5])
+    assert comparable(aggregate.snapshot()) == full_recompute(list(rows.values()))
+
+
+def test_bulk_load_matches_incremental_adds():
+    rng = random.Random(11)
+    rows = [make_row(row_id, rng) for row_id in range(1, 41)]
+    aggregate = loaded_aggregate(rows)
+    assert comparable(aggregate.snapshot()) == full_recompute(rows)
+
+    # Rows counted by load() can be updated like added ones
+    changes = {name: 0.0 for name in SIMILARITIES}
+    top_id = aggregate.snapshot()["top_10_applicants"][0]["id"]
+    aggregate.update(top_id, changes)
+    rows = [{**row, **changes} if row["id"] == top_id else row for row in rows]
+    assert comparable(aggregate.snapshot()) == full_recompute(rows)
+
+
+def test_versioned_replay_of_writes_during_rebuild():
+    rng = random.Random(3)
+    rows = [make_row(row_id, rng) for row_id in range(1, 21)]
+    aggregates = DashboardAggregates(match_score, classify_education)
+
+    # Writes for a role without an aggregate are ignored; the first read builds it
+    aggregates.add_application(rows[0])
+    assert aggregates.snapshot(1) is None
+
+    # A write lands after the rows were fetched but before the rebuilt aggregate is installed
+    aggregates.begin_rebuild(1)
+    aggregate = loaded_aggregate(rows[:-1])
+    aggregates.add_application(rows[-1])
+    aggregates.update_application(1, rows[0]["id"], {"Education": "MBA"})
+    aggregates.finish_rebuild(1, aggregate, version=5)
+    rows[0] = {**rows[0], "Education": "MBA"}
+    assert aggregates.get(1).version == 5 # replayed writes may already be in the fetched rows
+    assert comparable(aggregates.snapshot(1, version=5)) == full_recompute(rows)
+
+    # Each later write statement advances the version once, like the database trigger
+    new_rows = [make_row(row_id, rng) for row_id in (21, 22)]
+    aggregates.add_application(new_rows[0])
+    aggregates.update_applications([(1, 1, {"spam_probability": 0.99}), (1, 2, {"spam_probability": 0.99})])
+    assert aggregates.snapshot(1, version=6) is None
+    assert aggregates.get(1).version == 7
+    rows = [{**row, "spam_probability": 0.99} if row["id"] in (1, 2) else row for row in rows] + new_rows[:1]
+    assert comparable(aggregates.snapshot(1, version=7)) == full_recompute(rows)
+
+    # A cancelled rebuild drops its pending writes
+    aggregates.begin_rebuild(1)
+    aggregates.cancel_rebuild(1)
+    aggregates.add_application(new_rows[1])
+    assert aggregates.get(1).version == 8
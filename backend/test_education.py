@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from education import OTHER_EDUCATION_CATEGORY, classify_education, classify_education_series
+
+CASES = {
+    "BSc Computer Science": "Computer Science",
+    "Software Engineering": "Computer Science",
+    "M.S. in Data Science": "Computer Science",
+    "Electrical Engineering": "Engineering",
+    "Civil engineer": "Engineering",
+    "MBA": "Business",
+    "Bachelor of Accounting": "Business",
+    "Mathematics": "Mathematics & Statistics",
+    "Actuarial studies": "Mathematics & Statistics",
+    "History": OTHER_EDUCATION_CATEGORY,
+    "": OTHER_EDUCATION_CATEGORY,
+    # Several categories mentioned: the first in EDUCATION_CATEGORIES order wins, not the first in the text
+    "Business Management and Computer Science": "Computer Science",
+    "Statistics, minor in Finance": "Business",
+    "Mathematics and Mechanical Engineering": "Engineering",
+    "Finance\nInformation Systems": "Computer Science",
+    # A higher-priority keyword overlapping the end of the first keyword found still counts
+    "statisticsoftware engineering": "Computer Science",
+}
+
+
+def test_classify_education_mapping_and_precedence():
+    for text, category in CASES.items():
+        assert classify_education(text) == category, text
+    assert classify_education(None) == OTHER_EDUCATION_CATEGORY
+
+
+def test_classify_education_series_matches_scalar():
+    values = list(CASES) + [None, np.nan, 3, "MBA", "History"]
+    result = classify_education_series(pd.Series(values, dtype=object))
+    assert list(result) == [classify_education(value) for value in values]
+    assert len(classify_education_series(pd.Series([], dtype=object))) == 0
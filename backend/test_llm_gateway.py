@@ -0,0 +1,56 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from llm_gateway import LLMGateway
+
+CALL_SECONDS = 0.2
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(CALL_SECONDS)
+        part = SimpleNamespace(text='{"prompt": "%s", "call": %d}' % (prompt, self.calls))
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+def test_concurrent_calls_under_quota_are_not_spaced_out():
+    async def run():
+        gateway = LLMGateway(FakeModel(), max_concurrency=8, requests_per_minute=60)
+        started_at = time.perf_counter()
+        results = await asyncio.gather(*(gateway.generate_json(f"prompt {i}") for i in range(8)))
+        return results, time.perf_counter() - started_at
+
+    results, elapsed = asyncio.run(run())
+    assert [result["prompt"] for result in results] == [f"prompt {i}" for i in range(8)]
+    assert elapsed < CALL_SECONDS * 2
+
+
+def test_rate_applies_once_the_burst_is_spent():
+    async def run():
+        gateway = LLMGateway(FakeModel(), max_concurrency=8, requests_per_minute=600, burst=2)
+        started_at = time.perf_counter()
+        await asyncio.gather(*(gateway.generate_json(f"prompt {i}") for i in range(4)))
+        return time.perf_counter() - started_at
+
+    # Two calls start at once, the other two wait 0.1s each for a token
+    assert asyncio.run(run()) >= CALL_SECONDS + 0.2 - 0.02
+
+
+def test_json_cache_is_opt_in():
+    async def run():
+        model = FakeModel()
+        gateway = LLMGateway(model, requests_per_minute=0)
+        first = await gateway.generate_json("same", cache=True)
+        cached = await gateway.generate_json("same", cache=True)
+        fresh = await gateway.generate_json("same")
+        return model.calls, first, cached, fresh
+
+    calls, first, cached, fresh = asyncio.run(run())
+    assert calls == 2
+    assert cached == first
+    assert fresh["call"] == 2
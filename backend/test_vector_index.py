@@ -0,0 +1,25 @@
+from vector_index import CandidateVectorIndex
+
+FIELDS = ("Skills", "Experience")
+
+
+def test_add_to_empty_index_then_search():
+    index = CandidateVectorIndex(FIELDS, initial_capacity=2)
+    index.add(1, 10, {"Skills": [1.0, 0.0], "Experience": [0.0, 1.0]})
+    index.add_many([
+        (2, 10, {"Skills": [0.0, 1.0], "Experience": [1.0, 0.0]}),
+        (3, 20, {"Skills": [1.0, 0.1], "Experience": None}),
+    ])
+
+    assert len(index) == 3
+    results = index.search({"Skills": [1.0, 0.0], "Experience": [0.0, 1.0]}, {"Skills": 1.0, "Experience": 1.0}, k=2)
+    assert [r["ResumeID"] for r in results] == [1, 3]
+    assert abs(results[0]["score"] - 1.0) < 1e-6
+
+    role_results = index.search({"Skills": [1.0, 0.0]}, {"Skills": 1.0}, k=5, job_role_id=10)
+    assert [r["ResumeID"] for r in role_results] == [1, 2]
+
+
+def test_search_empty_index():
+    index = CandidateVectorIndex(FIELDS)
+    assert index.search({"Skills": [1.0, 0.0]}, {"Skills": 1.0}) == []
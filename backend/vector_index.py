@@ -0,0 +1,175 @@
+"""
+In-memory vector index of applicant field embeddings for top-k candidate search.
+
+Every applicant is one row of a float32 matrix holding its field vectors (Skills, Experience,
+Education, Level) side by side, each L2-normalized. A weighted query is the concatenation of
+the per-field query vectors scaled by their weights, so scoring the whole talent pool is a
+single matrix-vector product and top-k is an argpartition. Exact search keeps up well past
+100k applicants: 100k rows of 4 x 384 dimensions is ~600 MB and scores in tens of milliseconds.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+def _normalized(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class CandidateVectorIndex:
+    """
+    Exact (brute force) weighted cosine search over per-field applicant embeddings.
+    Rows are keyed by ResumeID; adding an existing ResumeID replaces its vectors.
+    """
+
+    def __init__(self, fields: Sequence[str], initial_capacity: int = 1024):
+        self.fields = tuple(fields)
+        self.dim: Optional[int] = None
+        self.loaded = False # Set once the index has been filled from the database
+        self._initial_capacity = initial_capacity
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._resume_ids = np.zeros(0, dtype=np.int64)
+        self._job_role_ids = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._positions: Dict[int, int] = {} # ResumeID -> row
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, resume_id) -> bool:
+        return int(resume_id) in self._positions
+
+    def _row(self, vectors: Dict[str, Sequence[float]]) -> np.ndarray:
+        # Missing fields stay zero, so they add nothing to the score
+        row = np.zeros(len(self.fields) * self.dim, dtype=np.float32)
+        for i, field in enumerate(self.fields):
+            vector = vectors.get(field)
+            if vector is not None:
+                row[i * self.dim:(i + 1) * self.dim] = _normalized(vector)
+        return row
+
+    def _grow(self, needed: int):
+        # Callers hold self._lock. A new array is allocated, so searches holding the old one stay valid.
+        capacity = max(self._initial_capacity, len(self._matrix))
+        while capacity < needed:
+            capacity *= 2
+        if capacity == len(self._matrix):
+            return
+        matrix = np.zeros((capacity, len(self.fields) * self.dim), dtype=np.float32)
+        resume_ids = np.zeros(capacity, dtype=np.int64)
+        job_role_ids = np.full(capacity, -1, dtype=np.int64)
+        if self._size:
+            # The initial (0, 0) matrix has no row width yet, so there is nothing to copy from it
+            matrix[:self._size] = self._matrix[:self._size]
+            resume_ids[:self._size] = self._resume_ids[:self._size]
+            job_role_ids[:self._size] = self._job_role_ids[:self._size]
+        self._matrix, self._resume_ids, self._job_role_ids = matrix, resume_ids, job_role_ids
+
+    def add_many(self, entries: Iterable[tuple]):
+        """
+        Adds (resume_id, job_role_id, {field: vector}) entries.
+        """
+        with self._lock:
+            for resume_id, job_role_id, vectors in entries:
+                if self.dim is None:
+                    first = next((v for v in vectors.values() if v is not None), None)
+                    if first is None:
+                        continue
+                    self.dim = len(first)
+                resume_id = int(resume_id)
+                position = self._positions.get(resume_id)
+                if position is None:
+                    self._grow(self._size + 1)
+                    position = self._size
+                    self._size += 1
+                    self._positions[resume_id] = position
+                self._matrix[position] = self._row(vectors)
+                self._resume_ids[position] = resume_id
+                self._job_role_ids[position] = -1 if job_role_id is None else int(job_role_id)
+
+    def add(self, resume_id, job_role_id, vectors: Dict[str, Sequence[float]]):
+        self.add_many([(resume_id, job_role_id, vectors)])
+
+    def query_vector(self, query_vectors: Dict[str, Sequence[float]], weights: Dict[str, float]) -> np.ndarray:
+        """
+        Concatenated query with every field scaled by its share of the total weight,
+        so scores are weighted averages of per-field cosine similarities.
+        """
+        total = sum(weights.get(field, 0.0) for field in self.fields if query_vectors.get(field) is not None)
+        if total <= 0:
+            raise ValueError("At least one field needs a query vector and a positive weight")
+        return np.concatenate([
+            _normalized(query_vectors[field]) * (weights.get(field, 0.0) / total)
+            if query_vectors.get(field) is not None else np.zeros(self.dim, dtype=np.float32)
+            for field in self.fields
+        ])
+
+    def field_similarities(self, query_vectors: Dict[str, Sequence[float]]):
+        """
+        Cosine similarity of every indexed applicant to the query, per field, in one product.
+        Returns (resume_ids, job_role_ids, similarities of shape (applicants, fields)).
+        Fields without a query vector score 0.
+        """
+        with self._lock:
+            size = self._size
+            matrix = self._matrix[:size]
+            resume_ids = self._resume_ids[:size].copy()
+            job_role_ids = self._job_role_ids[:size].copy()
+        if size == 0:
+            return resume_ids, job_role_ids, np.zeros((0, len(self.fields)), dtype=np.float32)
+
+        queries = np.stack([
+            _normalized(query_vectors[field]) if query_vectors.get(field) is not None
+            else np.zeros(self.dim, dtype=np.float32)
+            for field in self.fields
+        ])
+        similarities = np.einsum("nfd,fd->nf", matrix.reshape(size, len(self.fields), self.dim), queries)
+        return resume_ids, job_role_ids, similarities
+
+    def search(
+        self,
+        query_vectors: Dict[str, Sequence[float]],
+        weights: Dict[str, float],
+        k: int = 20,
+        job_role_id: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Returns the k best applicants as dicts of ResumeID, job_role_id, score and per-field scores.
+        With job_role_id only applicants of that role are considered.
+        """
+        with self._lock:
+            size = self._size
+            matrix = self._matrix[:size]
+            resume_ids = self._resume_ids[:size].copy()
+            job_role_ids = self._job_role_ids[:size].copy()
+        if size == 0 or k <= 0:
+            return []
+
+        scores = matrix @ self.query_vector(query_vectors, weights)
+        if job_role_id is not None:
+            scores = np.where(job_role_ids == int(job_role_id), scores, -np.inf)
+        k = min(k, size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for position in top:
+            if not np.isfinite(scores[position]):
+                break
+            field_scores = {}
+            for i, field in enumerate(self.fields):
+                query = query_vectors.get(field)
+                if query is not None:
+                    block = matrix[position, i * self.dim:(i + 1) * self.dim]
+                    field_scores[field] = float(block @ _normalized(query))
+            results.append({
+                "ResumeID": int(resume_ids[position]),
+                "job_role_id": int(job_role_ids[position]) if job_role_ids[position] >= 0 else None,
+                "score": float(scores[position]),
+                "field_scores": field_scores,
+            })
+        return results
@@ -67,15 +67,21 @@ export default function UserAnalysisPage() {
         const data: DetailedAnalyzedResume = await response.json();
         setResumeData(data);
 
-        // Simulate fetching PDF URL or use a hardcoded one
-        // If you have an endpoint like /get_resume_pdf/{resume_id}
-        const pdfResponse = await fetch(`http://127.0.0.1:8000/get_resume_pdf?resume_ID=${resumeId}`);
-        if (pdfResponse.ok) {
-          const blob = await pdfResponse.blob();
-          setPdfUrl(URL.createObjectURL(blob));
-        } else {
-          console.warn("Could not fetch PDF.");
-          setPdfUrl(MOCK_PDF_URL); // Fallback to mock
+        // Point the viewer straight at the endpoint: it streams the PDF and supports Range
+        // requests, so the viewer can render the first pages before the whole file arrives.
+        // A one-byte range request checks the PDF exists first; an iframe can't report a failed load.
+        const resumePdfUrl = `http://127.0.0.1:8000/get_resume_pdf?resume_ID=${resumeId}`;
+        try {
+          const probe = await fetch(resumePdfUrl, { headers: { Range: 'bytes=0-0' } });
+          if (probe.ok) {
+            setPdfUrl(resumePdfUrl);
+          } else {
+            console.warn(`Could not fetch PDF. Status: ${probe.status}`);
+            setPdfUrl(null); // Shows "PDF could not be loaded."
+          }
+        } catch (pdfError) {
+          console.warn("Could not fetch PDF.", pdfError);
+          setPdfUrl(null);
         }
         // setPdfUrl(MOCK_PDF_URL); // Using mock for now
 
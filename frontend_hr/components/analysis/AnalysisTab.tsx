@@ -31,6 +31,7 @@ export interface ApiAnalyzedResume {
   is_analyzed: boolean;
   job_role_id: number;
   spam_probability?: number; // Added: Make it optional if not all records might have it
+  match_score?: number; // Composite score (0-100) computed by the database
 }
 
 // This is the structure expected by ResumeList, ResumeStats
@@ -92,6 +93,65 @@ function estimateExperienceYears(experienceText: string): number {
 }
 
 
+// Maps one item of /get_job_application_by_role/{job_role_id} to the shape used by ResumeList
+function mapApiResume(apiResume: ApiAnalyzedResume): MappedAnalyzedResume {
+  const similarities = [
+    apiResume.Education_Similarity,
+    apiResume.Experience_Similarity,
+    apiResume.Skill_Similarity,
+    apiResume.Level_Similarity,
+  ].filter(s => typeof s === 'number') as number[];
+
+  const matchScore = similarities.length > 0
+    ? (similarities.reduce((sum, val) => sum + val, 0) / similarities.length) * 100
+    : 0;
+
+  // API's ai_generated_score might be -1 if not analyzed, or a percentage like 34.3409
+  // The mock data used a 0-100 scale. Adjust if your API provides 0-1 for ai_generated_score
+  // If ai_generated_score is already 0-100 (like 34.3409), use it directly.
+  // If it's 0-1 (like 0.313314), multiply by 100.
+  // For now, assuming it's a percentage if > 1, else needs scaling if it's 0-1.
+  // --- AI Generated Score Processing ---
+  let aiScore: number;
+  if (apiResume.ai_generated_score === -1) {
+    aiScore = 0; // Not analyzed or explicitly marked as -1
+  } else if (apiResume.ai_generated_score > 0 && apiResume.ai_generated_score < 1) {
+    // If score is like 0.313314, treat as 0 as per new requirement
+    aiScore = 0;
+  } else {
+    // If score is like 34.3409 or 70, round it
+    aiScore = Math.round(apiResume.ai_generated_score);
+  }
+  // Clamp AI score to 0-100 (though rounding should keep it reasonable if input is)
+  aiScore = Math.max(0, Math.min(100, aiScore));  
+
+
+  const spamScore = apiResume.spam_probability !== undefined
+    ? Math.round(apiResume.spam_probability * 100)
+    : 0; // Default to 0 if spam_probability is missing
+
+  const status = determineResumeStatus(
+    aiScore,
+    spamScore,
+    matchScore,
+    apiResume.is_analyzed
+  );
+
+  return {
+    id: apiResume.id.toString(),
+    candidateName: apiResume.Name,
+    aiGeneratedScore: aiScore, // Already rounded or set
+    spamScore: spamScore,     // Processed spam score
+    matchScore: Math.round(matchScore),
+    keywords: apiResume.Skills ? apiResume.Skills.split(',').map(s => s.trim()).slice(0, 5) : [],
+    status: status,
+    education: apiResume.Education,
+    experienceYears: estimateExperienceYears(apiResume.Experience),
+    lastPosition: apiResume.Level,
+    originalApiData: apiResume,
+  };
+}
+
 interface AnalysisTabProps {
   jobId: string; // This is the job_role_id
 }
@@ -127,68 +187,37 @@ export const AnalysisTab: React.FC<AnalysisTabProps> = ({ jobId }) => {
           }
           throw new Error(`HTTP error! status: ${response.status}`);
         }
-        const data: ApiAnalyzedResume[] = await response.json();
-
-        // Map API data to MappedAnalyzedResume
-        const mappedData = data.map((apiResume): MappedAnalyzedResume => {
-          const similarities = [
-            apiResume.Education_Similarity,
-            apiResume.Experience_Similarity,
-            apiResume.Skill_Similarity,
-            apiResume.Level_Similarity,
-          ].filter(s => typeof s === 'number') as number[];
-
-          const matchScore = similarities.length > 0
-            ? (similarities.reduce((sum, val) => sum + val, 0) / similarities.length) * 100
-            : 0;
+        // The endpoint streams NDJSON (one application per line), so render rows as they arrive
+        const reader = response.body!.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+        let received: MappedAnalyzedResume[] = [];
 
-          // API's ai_generated_score might be -1 if not analyzed, or a percentage like 34.3409
-          // The mock data used a 0-100 scale. Adjust if your API provides 0-1 for ai_generated_score
-          // If ai_generated_score is already 0-100 (like 34.3409), use it directly.
-          // If it's 0-1 (like 0.313314), multiply by 100.
-          // For now, assuming it's a percentage if > 1, else needs scaling if it's 0-1.
-          // --- AI Generated Score Processing ---
-          let aiScore: number;
-          if (apiResume.ai_generated_score === -1) {
-            aiScore = 0; // Not analyzed or explicitly marked as -1
-          } else if (apiResume.ai_generated_score > 0 && apiResume.ai_generated_score < 1) {
-            // If score is like 0.313314, treat as 0 as per new requirement
-            aiScore = 0;
-          } else {
-            // If score is like 34.3409 or 70, round it
-            aiScore = Math.round(apiResume.ai_generated_score);
+        const appendLines = (lines: string[]) => {
+          const records = lines.filter(line => line.trim()).map(line => JSON.parse(line));
+          // A failed page ends the stream with an error record instead of more applications
+          const failure = records.find(record => record.truncated);
+          if (failure) {
+            throw new Error(failure.error || "The list of applications is incomplete.");
           }
-          // Clamp AI score to 0-100 (though rounding should keep it reasonable if input is)
-          aiScore = Math.max(0, Math.min(100, aiScore));  
-
-
-          const spamScore = apiResume.spam_probability !== undefined
-            ? Math.round(apiResume.spam_probability * 100)
-            : 0; // Default to 0 if spam_probability is missing
-
-          const status = determineResumeStatus(
-            aiScore,
-            spamScore,
-            matchScore,
-            apiResume.is_analyzed
-          );
-
-          return {
-            id: apiResume.id.toString(),
-            candidateName: apiResume.Name,
-            aiGeneratedScore: aiScore, // Already rounded or set
-            spamScore: spamScore,     // Processed spam score
-            matchScore: Math.round(matchScore),
-            keywords: apiResume.Skills ? apiResume.Skills.split(',').map(s => s.trim()).slice(0, 5) : [],
-            status: status,
-            education: apiResume.Education,
-            experienceYears: estimateExperienceYears(apiResume.Experience),
-            lastPosition: apiResume.Level,
-            originalApiData: apiResume,
-          };
-        });
+          const batch = records.map(record => mapApiResume(record as ApiAnalyzedResume));
+          if (batch.length > 0) {
+            received = received.concat(batch);
+            setAnalyzedResumes(received);
+            setIsLoading(false); // Show the first page while the rest loads
+          }
+        };
 
-        setAnalyzedResumes(mappedData);
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffered += decoder.decode(value, { stream: true });
+          const lines = buffered.split('\n');
+          buffered = lines.pop() ?? '';
+          appendLines(lines);
+        }
+        appendLines([buffered + decoder.decode()]);
+        setAnalyzedResumes(received);
 
       } catch (err) {
         console.error(`Failed to fetch analyzed resumes for job ID ${jobId}:`, err);
@@ -78,8 +78,19 @@ export const ChatInterface = ({
     setInput('');
     setIsAiResponding(true);
 
+    const aiMessageId = `ai-${Date.now()}`;
+    let streamedContent = '';
+    const showStreamedContent = (content: string) => {
+      streamedContent = content;
+      setIsAiResponding(false); // The streamed message replaces the typing indicator
+      setMessages(prev => prev.some(m => m.id === aiMessageId)
+        ? prev.map(m => m.id === aiMessageId ? { ...m, content } : m)
+        : [...prev, { id: aiMessageId, content, sender: 'ai', timestamp: new Date() }]);
+    };
+
     try {
-      const response = await fetch('http://127.0.0.1:8000/api/chat', { // Your backend API endpoint for chat
+      // Streaming endpoint: Server-Sent Events with "token", then "done" or "error"
+      const response = await fetch('http://127.0.0.1:8000/api/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -95,14 +106,37 @@ export const ChatInterface = ({
         throw new Error(errorData.detail || errorData.generated_response || `API error: ${response.status}`);
       }
 
-      const data = await response.json();
-      const aiResponseMessage: ChatMessage = {
-        id: `ai-${Date.now()}`,
-        content: data.generated_response || "I'm not sure how to respond to that.",
-        sender: 'ai',
-        timestamp: new Date()
+      const reader = response.body!.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+
+      const handleEvent = (rawEvent: string) => {
+        let eventName = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event:')) eventName = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        }
+        if (!data) return;
+        const payload = JSON.parse(data);
+        if (eventName === 'token') {
+          showStreamedContent(streamedContent + payload.text);
+        } else if (eventName === 'done') {
+          showStreamedContent(payload.generated_response || streamedContent || "I'm not sure how to respond to that.");
+        } else if (eventName === 'error') {
+          throw new Error(payload.error);
+        }
       };
-      setMessages(prev => [...prev, aiResponseMessage]);
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const events = buffered.split('\n\n');
+        buffered = events.pop() ?? '';
+        events.forEach(handleEvent);
+      }
+      if (buffered.trim()) handleEvent(buffered + decoder.decode());
 
     } catch (error) {
       console.error("Chat API error:", error);